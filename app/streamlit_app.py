@@ -3,12 +3,16 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import hashlib
 import io
-import joblib
 import numpy as np
 import pandas as pd
 import streamlit as st
-from src.config import CFG
+from src import registry
+from src.features import TEXT_DTYPES
+from src.inference import load_version, score_proba
+from src.metrics import ThresholdCurve
+from src.topk import top_k
 
 # =========================
 # CONFIGURACIÓN DE PÁGINA
@@ -177,12 +181,22 @@ st.markdown(
 # =========================
 # CARGA DE ARTEFACTOS
 # =========================
+def load_model(version: str = None):
+    # cargo la versión activa del registro (o la pedida) con sus columnas base y el plan de columnas.
+    # load_version lee el puntero CURRENT en cada rerun: si train publica una versión nueva, la app la
+    # usa en el siguiente rerun sin reiniciar; las ya cargadas quedan en un LRU (REGISTRY_CACHE_SIZE).
+    # Si la versión trae el artefacto liviano (booster UBJSON + JSON) lo prefiero: carga sin unpickle de sklearn
+    return load_version(version)
+
 @st.cache_resource
-def load_model():
-    # cargo el pipeline ya entrenado (pre + modelo)
-    return joblib.load(CFG.model_path)
+def load_curve(version: str):
+    # curva de métricas por umbral sobre validación (la guarda train); None si el modelo no la trae.
+    # Las versiones del registro no cambian, así que la versión alcanza como clave
+    path = registry.artifact_paths(version)["curve_path"]
+    return ThresholdCurve.load(path) if os.path.exists(path) else None
 
-pipe = load_model()
+model_version, pipe, base_cols, plan = load_model()
+curve = load_curve(model_version)
 
 # =========================
 # HEADER
@@ -214,7 +228,6 @@ with st.sidebar:
     )
     st.markdown("---")
     st.markdown("### Requisitos del CSV")
-    base_cols = list(getattr(pipe.named_steps["pre"], "feature_names_in_", []))
     if base_cols:
         st.markdown("**Columnas esperadas (input):**")
         st.code(", ".join(base_cols), language="text")
@@ -231,6 +244,12 @@ with st.sidebar:
             type="primary",
         )
     st.caption("Tip: valida tipos numéricos como `tenure`, `MonthlyCharges`, `TotalCharges`.")
+    st.markdown("---")
+    # versión del registro en uso y, opcional, otra para puntuar el mismo archivo lado a lado
+    st.markdown("### Versión del modelo")
+    st.caption(f"En uso: `{model_version}`")
+    other_versions = [v for v in reversed(registry.versions()) if v != model_version]
+    compare_version = st.selectbox("Comparar con", ["(ninguna)"] + other_versions, index=0)
 
 # =========================
 # CUERPO
@@ -257,6 +276,17 @@ with c1:
             )
         threshold = st.slider("Umbral de riesgo", 0.05, 0.95, 0.50, 0.01)
 
+    # Métricas del umbral elegido sobre validación: búsqueda binaria en la curva precalculada
+    if curve is not None:
+        m = curve.at(threshold)
+        st.caption(
+            f"En validación con este umbral: precision {m['precision']:.1%} · recall {m['recall']:.1%} · "
+            f"F1 {m['f1']:.3f} · lift {m['lift']:.2f}x · marcados {m['flagged_share']:.1%} · "
+            f"costo esperado {m['expected_cost']:,.0f}"
+        )
+        best_f1, min_cost = curve.best("f1"), curve.best("expected_cost")
+        st.caption(f"Sugeridos: mejor F1 en {best_f1['threshold']:.2f} · menor costo en {min_cost['threshold']:.2f}")
+
 with c2:
     st.markdown("#### Vista previa y KPIs")
     kpi = st.container()
@@ -287,22 +317,69 @@ st.markdown("---")
 # =========================
 # PROCESAMIENTO
 # =========================
-def to_numeric_safe(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
-    # convierto columnas candidatas a numérico sin romper si hay strings raros
-    for col in cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    return df
-
 def safe_preview(df: pd.DataFrame, n: int = 25) -> pd.DataFrame:
     # ordeno preview poniendo primero las columnas esperadas por el pre
     cols = [c for c in base_cols if c in df.columns] + [c for c in df.columns if c not in base_cols]
     return df[cols].head(n)
 
+# Caches por contenido del archivo: mover el slider (o cualquier widget) re-ejecuta el script, pero el
+# CSV no se vuelve a parsear ni a puntuar mientras el archivo sea el mismo. Los parámetros con "_"
+# no entran en la clave de streamlit: la clave es el hash del contenido.
+@st.cache_resource(max_entries=4, show_spinner="Leyendo el archivo...")
+def parse_upload(file_hash: str, _data: bytes) -> pd.DataFrame:
+    # el DataFrame se comparte entre reruns (cache_resource no copia): no se modifica después
+    df = pd.read_csv(io.BytesIO(_data))
+    df.columns = df.columns.str.strip()
+    return df
+
+@st.cache_resource(max_entries=8, show_spinner="Calculando probabilidades...")
+def score_upload_cached(file_hash: str, version: str, _df: pd.DataFrame) -> np.ndarray:
+    # probabilidades del archivo con una versión del modelo (la versión entra en la clave: al publicarse
+    # una nueva se vuelve a puntuar); el umbral se aplica después, sobre este array
+    _, model, cols, model_plan = load_model(version)
+    return score_proba(_df, model, cols, model_plan)
+
+@st.cache_data(max_entries=8, show_spinner="Preparando descarga...")
+def build_download(file_hash: str, version: str, threshold: float, fmt: str, _df: pd.DataFrame,
+                   _proba: np.ndarray) -> bytes:
+    # el archivo de salida se arma solo cuando se pide, una vez por archivo/versión/umbral/formato
+    df_out = _df.assign(churn_proba=_proba, churn_pred=(_proba >= threshold).astype(int))
+    if fmt == "csv":
+        return df_out.to_csv(index=False).encode("utf-8")
+    buf = io.BytesIO()
+    df_out.to_parquet(buf, index=False)
+    return buf.getvalue()
+
+def download_section(file_hash: str, version: str, threshold: float, df_in: pd.DataFrame, proba: np.ndarray):
+    # Descargas bajo demanda: primero "Preparar", y el botón de descarga aparece con el archivo listo
+    col_dl1, col_dl2 = st.columns([1,1])
+    for col, fmt, label, file_name, mime in (
+        (col_dl1, "csv", "CSV", "predicciones_churn.csv", "text/csv"),
+        (col_dl2, "parquet", "Parquet", "predicciones_churn.parquet", "application/octet-stream"),
+    ):
+        with col:
+            if fmt == "parquet":
+                try:
+                    import pyarrow as _  # si no existe, muestro hint abajo
+                except ImportError:
+                    st.caption("Para exportar Parquet instala `pyarrow`.")
+                    continue
+            state_key = f"download_{fmt}"
+            if st.button(f"Preparar descarga ({label})", key=f"prepare_{fmt}"):
+                st.session_state[state_key] = (file_hash, version, threshold)
+            if st.session_state.get(state_key) == (file_hash, version, threshold):
+                st.download_button(
+                    f"Descargar predicciones ({label})",
+                    build_download(file_hash, version, threshold, fmt, df_in, proba),
+                    file_name,
+                    mime=mime,
+                )
+
 if uploaded is not None:
     try:
-        df_in = pd.read_csv(uploaded)
-        df_in.columns = df_in.columns.str.strip()
+        data = uploaded.getvalue()
+        file_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+        df_in = parse_upload(file_hash, data)
 
         # Valido columnas contra lo que espera el preprocesador
         expected = set(base_cols)
@@ -321,21 +398,15 @@ if uploaded is not None:
                 with st.expander("Columnas adicionales detectadas"):
                     st.code(", ".join(sorted(extra)), language="text")
         else:
-            # columnas que normalmente son numéricas en el Telco
-            numeric_candidates = ["SeniorCitizen", "tenure", "MonthlyCharges", "TotalCharges"]
-            df_in = to_numeric_safe(df_in, numeric_candidates)
-
-            # Predicción
-            X = df_in[base_cols].copy()
-            proba = pipe.predict_proba(X)[:, 1]
+            # Predicción (cacheada por archivo); el umbral solo recalcula la clase y los KPIs
+            proba = score_upload_cached(file_hash, model_version, df_in)
             pred = (proba >= threshold).astype(int)
-
-            df_out = df_in.copy()
-            df_out["churn_proba"] = proba
-            df_out["churn_pred"] = pred
+            proba_cmp = None
+            if compare_version != "(ninguna)":
+                proba_cmp = score_upload_cached(file_hash, compare_version, df_in)
 
             # KPIs rápidos para revisar la corrida
-            total_rows = len(df_out)
+            total_rows = len(df_in)
             avg_proba = float(np.mean(proba)) if total_rows else 0.0
             risk_count = int(pred.sum())
 
@@ -351,40 +422,32 @@ if uploaded is not None:
                         st.markdown(f'<div class="metric-kpi"><h4>Clientes en riesgo</h4><p>{risk_count:,}</p></div>', unsafe_allow_html=True)
 
             st.success("✅ Predicciones generadas correctamente.")
+            if proba_cmp is not None:
+                pred_cmp = proba_cmp >= threshold
+                st.caption(
+                    f"`{compare_version}`: prom. prob. baja {float(np.mean(proba_cmp)):.2%} · "
+                    f"en riesgo {int(pred_cmp.sum()):,} · misma clase que `{model_version}` en "
+                    f"{float(np.mean(pred_cmp == pred.astype(bool))):.1%} de las filas"
+                )
 
-            # Vista previa ordenada (para no saturar, limito a 25)
+            # Vista previa ordenada (para no saturar, limito a 25); solo esas filas llevan las columnas nuevas
             st.markdown("### Vista previa de resultados")
-            st.dataframe(
-                safe_preview(df_out),
-                use_container_width=True,
-            )
+            preview = safe_preview(df_in)
+            preview = preview.assign(churn_proba=proba[:len(preview)], churn_pred=pred[:len(preview)])
+            if proba_cmp is not None:
+                preview[f"churn_proba_{compare_version}"] = proba_cmp[:len(preview)]
+            st.dataframe(preview, use_container_width=True)
 
-            # Descargas (CSV y Parquet si está pyarrow)
-            col_dl1, col_dl2 = st.columns([1,1])
-            with col_dl1:
-                st.download_button(
-                    "Descargar predicciones (CSV)",
-                    df_out.to_csv(index=False).encode("utf-8"),
-                    "predicciones_churn.csv",
-                    mime="text/csv",
-                )
-            with col_dl2:
-                try:
-                    import pyarrow as _  # si no existe, muestro hint abajo
-                    buf = io.BytesIO()
-                    df_out.to_parquet(buf, index=False)
-                    st.download_button(
-                        "Descargar predicciones (Parquet)",
-                        data=buf.getvalue(),
-                        file_name="predicciones_churn.parquet",
-                        mime="application/octet-stream",
-                    )
-                except Exception:
-                    st.caption("Para exportar Parquet instala `pyarrow`.")
+            # Descargas (CSV y Parquet si está pyarrow), construidas solo al pedirlas
+            download_section(file_hash, model_version, threshold, df_in, proba)
 
-            # Top 20 clientes más en riesgo (útil para screenshot y demo)
+            # Top 20 clientes más en riesgo (útil para screenshot y demo), global o por segmento.
+            # Selección parcial sobre las probabilidades (src.topk): no se ordena la tabla completa
             st.markdown("### Top 20 clientes con mayor probabilidad de baja")
-            top20 = df_out.sort_values("churn_proba", ascending=False).head(20)
+            segments = [c for c in base_cols if plan is None or plan.get(c) in TEXT_DTYPES]
+            segment = st.selectbox("Segmentar por", ["(ninguno)"] + segments, index=0)
+            top20 = top_k(df_in, proba, 20, None if segment == "(ninguno)" else segment)
+            top20["churn_pred"] = (top20["churn_proba"] >= threshold).astype(int)
             st.dataframe(top20, use_container_width=True)
 
     except Exception as e:
@@ -0,0 +1,281 @@
+# Benchmarks de rendimiento sobre datasets sintéticos con la forma del Telco.
+# Mide tiempo (wall y CPU) y memoria de cada etapa del proyecto a distintos tamaños y guarda
+# el resultado en JSON; con --compare contrasta contra una corrida guardada y marca regresiones.
+#
+# Etapas:
+#   prep      data_prep.basic_clean sobre el crudo (tipos de load_raw)
+#   features  features.split_cols + build_preprocessor (fit_transform)
+#   train     train.main completo (sin caché de matrices) sobre parquet temporales
+#   infer     inference.align_columns + predict_proba
+#   app       scoring de un archivo subido a la app (inference.score_proba + umbral)
+#
+# Uso:
+#   python -m src.bench --sizes 10000,100000,1000000 --output data/bench/results.json
+#   python -m src.bench --sizes 10000,100000 --compare data/bench/baseline.json
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+from src.config import CFG
+from src.instrument import rss_peak_mb
+from src.utils_io import ensure_parents, save_json, to_parquet
+
+STAGES = ["prep", "features", "train", "infer", "app"]
+# Métricas que se comparan contra la línea base (más alto = peor)
+COMPARE_METRICS = ["wall_s", "peak_mb"]
+# Filas del modelo de referencia que usan las etapas infer/app (fijo, así el costo no depende del tamaño)
+REF_ROWS = 10_000
+
+def synth_telco(n: int, seed: int = 0, raw_path: str = None) -> pd.DataFrame:
+    """
+    Dataset sintético de `n` filas con el esquema de data/raw/telco_churn.csv: re-muestrea filas
+    completas del crudo (conserva la relación entre columnas y con Churn) y agrega ruido chico a
+    MonthlyCharges para que no sean copias exactas. Los tipos son los de data_prep.load_raw
+    (`category`, int8/int16, float32), así 10M de filas entran en memoria.
+    """
+    from src.data_prep import load_raw
+
+    template = load_raw(raw_path or CFG.data_raw)
+    rng = np.random.default_rng(seed)
+    df = template.iloc[rng.integers(0, len(template), n)].reset_index(drop=True)
+    if "MonthlyCharges" in df.columns:
+        noise = rng.normal(0.0, 1.0, n).astype(np.float32)
+        df["MonthlyCharges"] = (df["MonthlyCharges"] + noise).clip(lower=0).round(2).astype(np.float32)
+    return df
+
+def measure(fn, trace_memory: bool = True) -> dict:
+    """
+    Ejecuta fn() y devuelve wall/CPU (s), pico de memoria de Python/NumPy vía tracemalloc (MB) y
+    cuánto subió el pico de RSS (MB; incluye memoria nativa como la de XGBoost, pero solo crece
+    si la etapa supera el pico previo del proceso). fn devuelve el nº de filas procesadas.
+    """
+    gc.collect()
+    rss0 = rss_peak_mb()
+    if trace_memory:
+        tracemalloc.start()
+    t0, c0 = time.perf_counter(), time.process_time()
+    rows = fn()
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+    peak = tracemalloc.get_traced_memory()[1] / 1024**2 if trace_memory else float("nan")
+    if trace_memory:
+        tracemalloc.stop()
+    return {
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_mb": peak,
+        "rss_delta_mb": rss_peak_mb() - rss0,
+        "rows_per_s": rows / wall if wall > 0 else float("nan"),
+    }
+
+@contextlib.contextmanager
+def patched_cfg(**fields):
+    # Cambia campos de CFG dentro del bloque (rutas temporales) y los restaura al salir
+    old = {k: getattr(CFG, k) for k in fields}
+    for k, v in fields.items():
+        setattr(CFG, k, v)
+    try:
+        yield CFG
+    finally:
+        for k, v in old.items():
+            setattr(CFG, k, v)
+
+def _train_in(workdir: Path, clean: pd.DataFrame, quiet: bool = True):
+    """
+    Escribe train/valid (80/20, las filas sintéticas ya vienen en orden aleatorio) en `workdir` y
+    corre train.main con todas las rutas de CFG apuntando ahí. Devuelve la función que entrena,
+    para poder medirla sin incluir la escritura de los parquet.
+    """
+    from src import train
+
+    cut = int(len(clean) * (1 - CFG.test_size))
+    paths = {
+        "data_train_out": str(workdir / "train.parquet"),
+        "data_valid_out": str(workdir / "valid.parquet"),
+        "model_path": str(workdir / "model.joblib"),
+        "cols_path": str(workdir / "columns.joblib"),
+        "feats_path": str(workdir / "feature_names.joblib"),
+        "meta_path": str(workdir / "metadata.json"),
+        "lean_dir": str(workdir / "lean"),
+        "curve_path": str(workdir / "threshold_curve.json"),
+        "drift_ref_path": str(workdir / "drift_reference.json"),
+        "registry_dir": str(workdir / "registry"),
+    }
+    to_parquet(clean.iloc[:cut], paths["data_train_out"])
+    to_parquet(clean.iloc[cut:], paths["data_valid_out"])
+
+    def run():
+        with patched_cfg(**paths), contextlib.redirect_stdout(io.StringIO() if quiet else sys.stdout):
+            train.main(use_cache=False)
+        return len(clean)
+
+    return run, paths
+
+def reference_model(workdir: Path, seed: int = 0, rows: int = REF_ROWS):
+    # Modelo fijo (train.main sobre `rows` filas sintéticas) para medir infer/app con el mismo costo por fila
+    from src.data_prep import basic_clean
+    from src.inference import load_column_plan
+
+    clean = basic_clean(synth_telco(rows, seed=seed + 1), CFG.target)
+    run, paths = _train_in(workdir, clean)
+    run()
+    return joblib.load(paths["model_path"]), joblib.load(paths["cols_path"]), load_column_plan(paths["meta_path"])
+
+def run_size(n: int, stages: list, workdir: Path, ref=None, seed: int = 0, trace_memory: bool = True) -> list:
+    """
+    Corre las etapas pedidas sobre un dataset sintético de `n` filas. `ref` es (pipeline, columnas
+    base, plan de columnas) del modelo de referencia para infer/app. Devuelve una fila de resultados por etapa.
+    """
+    from src.data_prep import basic_clean
+    from src.features import build_preprocessor, split_cols
+    from src.inference import align_columns, score_proba
+
+    raw = synth_telco(n, seed=seed)
+    results = []
+
+    def record(stage, fn):
+        res = measure(fn, trace_memory)
+        results.append({"stage": stage, "rows": n, **res})
+        print(f"  {stage:<9} rows={n:>10,} wall={res['wall_s']:8.3f}s cpu={res['cpu_s']:8.3f}s "
+              f"peak={res['peak_mb']:9.1f}MB rss+={res['rss_delta_mb']:8.1f}MB")
+
+    # La prep se mide siempre que haga falta el dataset limpio, pero solo se reporta si se pidió
+    clean = {}
+
+    def prep():
+        clean["df"] = basic_clean(raw.copy(), CFG.target)
+        return n
+
+    if "prep" in stages:
+        record("prep", prep)
+    elif {"features", "train"} & set(stages):
+        prep()
+
+    if "features" in stages:
+        def fit_features():
+            df = clean["df"]
+            cat_cols, num_cols = split_cols(df, CFG.target)
+            build_preprocessor(cat_cols, num_cols, sparse=CFG.sparse_onehot).fit_transform(df.drop(columns=[CFG.target]))
+            return n
+        record("features", fit_features)
+
+    if "train" in stages:
+        train_dir = workdir / f"train_{n}"
+        train_dir.mkdir(parents=True, exist_ok=True)
+        run, _ = _train_in(train_dir, clean["df"])
+        record("train", run)
+
+    if {"infer", "app"} & set(stages):
+        pipe, base_cols, plan = ref
+        X_in = raw.drop(columns=[CFG.target], errors="ignore")
+        if "infer" in stages:
+            record("infer", lambda: len(pipe.predict_proba(align_columns(X_in, base_cols, plan))))
+        if "app" in stages:
+            upload = X_in.copy()
+            record("app", lambda: int((score_proba(upload, pipe, base_cols, plan) >= 0.5).size))
+    return results
+
+def run(sizes: list, stages: list, seed: int = 0, trace_memory: bool = True, ref_rows: int = REF_ROWS) -> dict:
+    # Corre todos los tamaños y arma el documento JSON (metadatos del entorno + resultados)
+    import sklearn
+    import xgboost
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="churn-bench-") as tmp:
+        workdir = Path(tmp)
+        ref = reference_model(workdir / "ref", seed=seed, rows=ref_rows) if {"infer", "app"} & set(stages) else None
+        for n in sizes:
+            print(f"[BENCH] {n:,} filas")
+            results.extend(run_size(n, stages, workdir, ref=ref, seed=seed, trace_memory=trace_memory))
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "xgboost": xgboost.__version__,
+            "sizes": sizes,
+            "stages": stages,
+            "seed": seed,
+            "ref_rows": ref_rows,
+            "trace_memory": trace_memory,
+        },
+        "results": results,
+    }
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.2, metrics: list = None) -> list:
+    """
+    Compara cada (etapa, filas) presente en ambas corridas. Una métrica es regresión si supera
+    a la base en más de `tolerance` (0.2 = 20%). Devuelve una fila por comparación con el flag.
+    """
+    metrics = metrics or COMPARE_METRICS
+    base = {(r["stage"], r["rows"]): r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        b = base.get((r["stage"], r["rows"]))
+        if b is None:
+            continue
+        for m in metrics:
+            old, new = b.get(m), r.get(m)
+            if old is None or new is None or not np.isfinite(old) or not np.isfinite(new) or old <= 0:
+                continue
+            ratio = new / old
+            rows.append({"stage": r["stage"], "rows": r["rows"], "metric": m, "baseline": old,
+                         "current": new, "ratio": ratio, "regression": ratio > 1 + tolerance})
+    return rows
+
+def print_comparison(rows: list, tolerance: float):
+    print(f"[COMPARE] tolerancia {tolerance:.0%}")
+    for r in rows:
+        flag = "REGRESIÓN" if r["regression"] else "ok"
+        print(f"  {r['stage']:<9} rows={r['rows']:>10,} {r['metric']:<8} "
+              f"{r['baseline']:10.3f} → {r['current']:10.3f} ({r['ratio']:5.2f}x) {flag}")
+
+def main(sizes: list, stages: list, output: str, baseline: str = None, tolerance: float = 0.2,
+         seed: int = 0, trace_memory: bool = True) -> int:
+    # Devuelve el código de salida: 1 si hubo regresiones contra la base (útil en CI)
+    report = run(sizes, stages, seed=seed, trace_memory=trace_memory)
+    ensure_parents(output)
+    save_json(report, output)
+    print(f"[OK] resultados → {output}")
+    if baseline is None:
+        return 0
+    with open(baseline, encoding="utf-8") as f:
+        rows = compare(report, json.load(f), tolerance)
+    print_comparison(rows, tolerance)
+    regressions = [r for r in rows if r["regression"]]
+    if regressions:
+        print(f"[FAIL] {len(regressions)} regresiones sobre {baseline}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000", help="filas por dataset, separadas por coma")
+    ap.add_argument("--stages", default=",".join(STAGES), help=f"etapas a medir ({','.join(STAGES)})")
+    ap.add_argument("--output", default="data/bench/results.json", help="JSON de resultados")
+    ap.add_argument("--compare", default=None, help="JSON de una corrida anterior (línea base)")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="aumento relativo tolerado antes de marcar regresión")
+    ap.add_argument("--seed", type=int, default=0, help="semilla del dataset sintético")
+    ap.add_argument("--no-memory", action="store_true", help="sin tracemalloc (menos overhead, solo RSS)")
+    args = ap.parse_args()
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        ap.error(f"etapas desconocidas: {sorted(unknown)}")
+    sys.exit(main([int(s) for s in args.sizes.split(",")], stages, args.output, args.compare,
+                  args.tolerance, args.seed, not args.no_memory))
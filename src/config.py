@@ -19,6 +19,16 @@ class Config:
     test_size: float = float(os.getenv("TEST_SIZE", 0.2))
     # Semilla para reproducibilidad
     seed: int = int(os.getenv("SEED", 42))
+    # Prep por chunks (data_prep --chunksize): tamaño de la muestra (reservoir) para estimar medianas
+    prep_sketch_size: int = int(os.getenv("PREP_SKETCH_SIZE", 200_000))
+
+    # Caché de la prep: si el crudo, la config y el código de limpieza no cambiaron, se reusan los parquet
+    prep_cache: bool = os.getenv("PREP_CACHE", "1").lower() in ("1", "true", "yes")
+    prep_cache_dir: str = os.getenv("PREP_CACHE_DIR", "data/cache/prep")
+    # Máximo de entradas guardadas (se desalojan las menos usadas); 0 apaga las cachés de prep y de matrices
+    cache_max_entries: int = int(os.getenv("CACHE_MAX_ENTRIES", 5))
+    # Además de tamaño/mtime, incluir el hash del contenido del crudo en la clave (más lento, más seguro)
+    cache_hash_content: bool = os.getenv("CACHE_HASH_CONTENT", "0").lower() in ("1", "true", "yes")
 
     # Ruta donde se guarda el modelo entrenado
     model_path: str = "models/model.joblib"
@@ -26,6 +36,102 @@ class Config:
     cols_path: str = "models/columns.joblib"
     # Ruta donde se guardan los nombres de las features expandidas (después de OneHot, opcional)
     feats_path: str = "models/feature_names.joblib"
+    # Caché de matrices transformadas (preprocesador ajustado + arrays + DMatrix binaria de XGBoost)
+    matrix_cache: bool = os.getenv("MATRIX_CACHE", "1").lower() in ("1", "true", "yes")
+    matrix_cache_dir: str = os.getenv("MATRIX_CACHE_DIR", "data/cache/matrix")
+
+    # Búsqueda de hiperparámetros (python -m src.train --tune)
+    tune_results_path: str = "models/tuning_results.csv"
+    # Candidatos iniciales, procesos, presupuesto (árboles) mínimo/máximo y factor de descarte por ronda
+    tune_trials: int = int(os.getenv("TUNE_TRIALS", 18))
+    tune_workers: int = int(os.getenv("TUNE_WORKERS", os.cpu_count() or 1))
+    tune_min_budget: int = int(os.getenv("TUNE_MIN_BUDGET", 50))
+    tune_max_budget: int = int(os.getenv("TUNE_MAX_BUDGET", 1000))
+    tune_eta: int = int(os.getenv("TUNE_ETA", 3))
+    # Fracción de train que se aparta para elegir el ganador (no se usa para ajustar ni para el early stopping)
+    tune_holdout: float = float(os.getenv("TUNE_HOLDOUT", 0.2))
+    # Rondas sin mejora en logloss de validación antes de cortar el boosting
+    early_stopping_rounds: int = int(os.getenv("EARLY_STOPPING_ROUNDS", 30))
+    # Validación cruzada (python -m src.train --cv): folds estratificados sobre train, procesos en paralelo
+    cv_folds: int = int(os.getenv("CV_FOLDS", 5))
+    cv_workers: int = int(os.getenv("CV_WORKERS", os.cpu_count() or 1))
+    cv_results_path: str = "models/cv_results.csv"
+    # Reentrenamiento incremental (python -m src.train --incremental <parquet>): árboles que se agregan
+    incremental_rounds: int = int(os.getenv("INCREMENTAL_ROUNDS", 100))
+    # Ruta de los metadatos del modelo (modo del preprocesador, nº de features, etc.)
+    meta_path: str = "models/metadata.json"
+    # Registro de versiones (src.registry): cada train publica una copia inmutable de los artefactos y
+    # mueve el puntero CURRENT; la app y la inferencia cargan la versión activa. Modelos cargados en el LRU.
+    # Con REGISTRY=0 todo usa las rutas planas de arriba (se ignora CURRENT)
+    registry: bool = os.getenv("REGISTRY", "1").lower() in ("1", "true", "yes")
+    registry_dir: str = os.getenv("REGISTRY_DIR", "models/registry")
+    registry_cache_size: int = int(os.getenv("REGISTRY_CACHE_SIZE", 3))
+    # Versiones que se conservan: cada publicación borra las más viejas (nunca la activa). 0 = todas
+    registry_keep: int = int(os.getenv("REGISTRY_KEEP", 10))
+    # Curva de métricas por umbral sobre validación (src.metrics), la usa la app para el slider
+    curve_path: str = "models/threshold_curve.json"
+    # Costo esperado de retención: costo por cliente contactado, pérdida por cliente que se da de baja
+    # y proporción de los contactados que iban a irse que la campaña logra retener
+    retention_contact_cost: float = float(os.getenv("RETENTION_CONTACT_COST", 10))
+    retention_churn_loss: float = float(os.getenv("RETENTION_CHURN_LOSS", 200))
+    retention_success_rate: float = float(os.getenv("RETENTION_SUCCESS_RATE", 0.3))
+    # Monitor de drift (src.drift): referencia de train guardada junto al modelo (bins por cuantiles),
+    # y reporte PSI/KS que escribe la inferencia al terminar (apagado por defecto, inference --drift).
+    # El reporte va junto a la salida (<salida>.drift.json) salvo que se fije DRIFT_REPORT
+    drift_monitor: bool = os.getenv("DRIFT_MONITOR", "0").lower() in ("1", "true", "yes")
+    drift_bins: int = int(os.getenv("DRIFT_BINS", 10))
+    drift_ref_path: str = "models/drift_reference.json"
+    drift_report_path: str = os.getenv("DRIFT_REPORT", "")
+    # Artefacto liviano (booster UBJSON + parámetros del preprocesamiento en JSON, ver src.fastpath):
+    # train lo escribe junto al joblib; se carga en milisegundos sin des-serializar sklearn
+    lean_artifact: bool = os.getenv("LEAN_ARTIFACT", "1").lower() in ("1", "true", "yes")
+    lean_dir: str = os.getenv("LEAN_DIR", "models/lean")
+    # Motor del artefacto liviano: "xgboost" (booster nativo), "numpy" (árboles como arrays, src.forest,
+    # sin importar xgboost ni sklearn) o "auto" (numpy si xgboost no está instalado). Filas por bloque
+    # del evaluador de numpy (el array de nodos es filas × árboles)
+    lean_engine: str = os.getenv("LEAN_ENGINE", "auto")
+    forest_block_rows: int = int(os.getenv("FOREST_BLOCK_ROWS", 256))
+
+    # OneHot disperso (CSR) de punta a punta: útil con categóricas de alta cardinalidad
+    sparse_onehot: bool = os.getenv("SPARSE_ONEHOT", "0").lower() in ("1", "true", "yes")
+
+    # Instrumentación por etapa (src.instrument): apagada por defecto. Log JSON-lines con una línea por
+    # etapa y corrida, y archivo de texto de Prometheus opcional ("" = no se escribe)
+    instrument: bool = os.getenv("INSTRUMENT", "0").lower() in ("1", "true", "yes")
+    instrument_log: str = os.getenv("INSTRUMENT_LOG", "logs/stages.jsonl")
+    instrument_prom: str = os.getenv("INSTRUMENT_PROM", "")
+
+    # Capa de I/O Arrow (src.utils_io): lectura con memory map de Parquet/Feather/Arrow IPC, y compresión
+    # y filas por row group al escribir Parquet (0 = valor por defecto de pyarrow)
+    io_memory_map: bool = os.getenv("IO_MEMORY_MAP", "1").lower() in ("1", "true", "yes")
+    parquet_compression: str = os.getenv("PARQUET_COMPRESSION", "snappy")
+    parquet_row_group_size: int = int(os.getenv("PARQUET_ROW_GROUP_SIZE", 0))
+
+    # Columnas que la inferencia lee además de las del modelo, para llevarlas a la salida (IDs);
+    # separadas por coma. El target también se conserva si viene en el archivo
+    infer_keep_cols: str = os.getenv("INFER_KEEP_COLS", "customerID")
+    # Motivos de riesgo (inference --reasons): contribuciones aproximadas de Saabas (un recorrido por
+    # árbol, ~3x una predicción) en vez de TreeSHAP exacto (cientos de veces más lento con 300 árboles)
+    reason_approx: bool = os.getenv("REASON_APPROX", "1").lower() in ("1", "true", "yes")
+    # Filas por lote en inferencia por lotes/paralela (cuando no se pasa --chunksize)
+    infer_chunksize: int = int(os.getenv("INFER_CHUNKSIZE", 100_000))
+
+    # Scoring por eventos (src.stream): máximo de eventos por lote y espera máxima (ms) para llenarlo,
+    # eventos en cola antes de frenar a la fuente (backpressure) y lotes a la vez en el executor
+    stream_max_batch: int = int(os.getenv("STREAM_MAX_BATCH", 256))
+    stream_max_wait_ms: float = float(os.getenv("STREAM_MAX_WAIT_MS", 50))
+    stream_max_queue: int = int(os.getenv("STREAM_MAX_QUEUE", 10_000))
+    stream_max_inflight: int = int(os.getenv("STREAM_MAX_INFLIGHT", 2))
+    # Filas por part file del sink Parquet y log JSON-lines por lote (tamaño, cola, espera, latencia)
+    stream_part_rows: int = int(os.getenv("STREAM_PART_ROWS", 100_000))
+    stream_log: str = os.getenv("STREAM_LOG", "logs/stream.jsonl")
+
+    # Servidor de scoring (src.server): dirección y límites del micro-batching
+    server_host: str = os.getenv("SERVER_HOST", "127.0.0.1")
+    server_port: int = int(os.getenv("SERVER_PORT", 8000))
+    # Máximo de registros por lote y espera máxima (ms) antes de llamar a predict_proba
+    server_max_batch: int = int(os.getenv("SERVER_MAX_BATCH", 64))
+    server_max_wait_ms: float = float(os.getenv("SERVER_MAX_WAIT_MS", 2))
 
 # Instancia global de la configuración, para importar como CFG en el resto del código
 CFG = Config()
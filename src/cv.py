@@ -0,0 +1,154 @@
+# Validación cruzada estratificada en paralelo (python -m src.train --cv).
+# El holdout de validación da un solo ROC-AUC, ruidoso; acá se reporta media y desvío sobre k folds
+# de train.parquet, con el tiempo de cada fold.
+#
+# El ColumnTransformer se ajusta una sola vez (o sale de la caché de matrices de src.train) y la matriz
+# transformada se escribe como .npy en /dev/shm (memoria compartida; en otro disco si no existe). Cada
+# worker la abre con mmap: todos leen las mismas páginas y no se serializa la matriz para cada proceso.
+# Los índices de los folds tampoco viajan: cada worker rehace el mismo StratifiedKFold (misma semilla).
+#
+# Escalado por fold: el OneHot no usa la etiqueta (solo fija el vocabulario), pero el StandardScaler
+# tiene que ajustarse con las filas de train de cada fold. Re-estandarizar el bloque numérico ya
+# escalado con la media/desvío del fold da lo mismo que ajustar el scaler sobre los valores crudos del
+# fold (la estandarización de una transformación afín es la misma), así que no hace falta re-transformar.
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.metrics import log_loss
+from sklearn.model_selection import StratifiedKFold
+from src import instrument
+from src.config import CFG
+from src.instrument import stage
+from src.metrics import summary
+from src.train import _load_matrix, _save_matrix, build_matrices, default_model, load_or_build_matrices
+from src.utils_io import cache_enabled, ensure_parents
+
+# Matriz compartida del proceso worker (ver _init_worker)
+_X = None
+_Y = None
+_FOLDS = None
+_N_NUM = 0
+
+def make_folds(y, k: int, seed: int) -> list:
+    # (train_idx, test_idx) por fold; determinístico para que el padre y los workers vean los mismos
+    return list(StratifiedKFold(n_splits=k, shuffle=True, random_state=seed).split(np.zeros(len(y)), y))
+
+def _init_worker(matrix_dir: str, n_num: int, k: int, seed: int):
+    # Abre la matriz compartida con mmap (solo lectura) y arma los folds una vez por proceso
+    global _X, _Y, _FOLDS, _N_NUM
+    _X = _load_matrix(Path(matrix_dir) / "X")
+    _Y = np.load(Path(matrix_dir) / "y.npy", mmap_mode="r")
+    _FOLDS = make_folds(_Y, k, seed)
+    _N_NUM = n_num
+
+def scale_fold(X_tr, X_te, n_num: int) -> tuple:
+    """
+    StandardScaler ajustado en X_tr sobre las `n_num` primeras columnas (el bloque numérico del
+    ColumnTransformer), aplicado a X_tr y X_te. Mismo criterio que sklearn: desvío poblacional y
+    1 donde el desvío es 0. Devuelve copias; con CSR el resultado también es CSR.
+    """
+    if not n_num:
+        return X_tr, X_te
+    num_tr = X_tr[:, :n_num].toarray() if sp.issparse(X_tr) else np.asarray(X_tr[:, :n_num], dtype=np.float64)
+    mean, std = num_tr.mean(axis=0), num_tr.std(axis=0)
+    std[std == 0] = 1.0
+
+    def apply(X):
+        if sp.issparse(X):
+            num = (X[:, :n_num].toarray() - mean) / std
+            return sp.hstack([sp.csr_matrix(num.astype(X.dtype)), X[:, n_num:]], format="csr")
+        X = np.array(X)  # copia: la matriz compartida es de solo lectura
+        X[:, :n_num] = (X[:, :n_num] - mean) / std
+        return X
+
+    return apply(X_tr), apply(X_te)
+
+def fit_fold(fold: int, params: dict = None, threads: int = 1) -> dict:
+    # Entrena y evalúa un fold sobre la matriz compartida; devuelve métricas y tiempos
+    start = time.perf_counter()
+    tr, te = _FOLDS[fold]
+    X_tr, X_te = scale_fold(_X[tr], _X[te], _N_NUM)
+    y_tr, y_te = np.asarray(_Y[tr]), np.asarray(_Y[te])
+    prep_s = time.perf_counter() - start
+    model = default_model(n_jobs=threads, **(params or {}))
+    t = time.perf_counter()
+    model.fit(X_tr, y_tr)
+    fit_s = time.perf_counter() - t
+    t = time.perf_counter()
+    proba = model.predict_proba(X_te)[:, 1]
+    predict_s = time.perf_counter() - t
+    return {
+        "fold": fold,
+        "n_train": len(tr),
+        "n_test": len(te),
+        **summary(y_te, proba),
+        "logloss": log_loss(y_te, proba, labels=[0, 1]),
+        "prep_s": prep_s,
+        "fit_s": fit_s,
+        "predict_s": predict_s,
+        "wall_s": time.perf_counter() - start,
+        "pid": os.getpid(),
+    }
+
+def _shared_dir() -> str:
+    # /dev/shm es memoria compartida en Linux: los .npy no tocan disco
+    return "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+@instrument.run("cv")
+def main(folds: int = None, workers: int = None, params: dict = None, use_cache: bool = None) -> pd.DataFrame:
+    """
+    Corre `folds` folds estratificados de train.parquet en `workers` procesos (XGBoost de train, con
+    `params` pisando sus hiperparámetros) y devuelve una fila por fold más las filas "mean" y "std".
+    Guarda la tabla en CFG.cv_results_path.
+    """
+    start = time.perf_counter()
+    folds = folds or CFG.cv_folds
+    workers = min(workers or CFG.cv_workers, folds)
+    # Hilos de XGBoost por worker: la CPU se reparte entre los procesos
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    use_cache = cache_enabled(CFG.matrix_cache if use_cache is None else use_cache)
+    m = load_or_build_matrices()[0] if use_cache else build_matrices()
+    n_num = len(m["num_cols"])
+
+    with tempfile.TemporaryDirectory(prefix="cv-", dir=_shared_dir()) as tmp:
+        with stage("share", rows=len(m["y_train"])):
+            _save_matrix(m["X_train"], Path(tmp) / "X")
+            np.save(Path(tmp) / "y.npy", np.asarray(m["y_train"]))
+        del m
+        with stage("folds"), ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(tmp, n_num, folds, CFG.seed)
+        ) as ex:
+            futures = [ex.submit(fit_fold, i, params, threads) for i in range(folds)]
+            rows = [f.result() for f in futures]
+
+    res = pd.DataFrame(rows)
+    metrics = ["auc", "f1", "precision", "recall", "logloss", "prep_s", "fit_s", "predict_s", "wall_s"]
+    agg = res[metrics].agg(["mean", "std"]).reset_index(names="fold")
+    out = pd.concat([res, agg], ignore_index=True)
+    ensure_parents(CFG.cv_results_path)
+    out.to_csv(CFG.cv_results_path, index=False)
+
+    wall = time.perf_counter() - start
+    print(res[["fold", "n_test", "auc", "f1", "logloss", "fit_s", "wall_s"]].to_string(
+        index=False, float_format=lambda x: f"{x:.4f}"))
+    mean, std = agg.set_index("fold").loc["mean"], agg.set_index("fold").loc["std"]
+    print(f"ROC-AUC: {mean['auc']:.4f} ± {std['auc']:.4f} | F1: {mean['f1']:.4f} ± {std['f1']:.4f} | "
+          f"logloss: {mean['logloss']:.4f} ± {std['logloss']:.4f}")
+    print(f"[OK] {folds} folds en {workers} procesos × {threads} hilos: {wall:.1f}s de reloj "
+          f"(fold más lento {res['wall_s'].max():.1f}s, suma {res['wall_s'].sum():.1f}s) → {CFG.cv_results_path}")
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--folds", type=int, default=None, help="folds estratificados (CV_FOLDS)")
+    ap.add_argument("--workers", type=int, default=None, help="procesos (CV_WORKERS)")
+    ap.add_argument("--no-cache", action="store_true", help="no usa la caché de matrices transformadas")
+    args = ap.parse_args()
+    main(args.folds, args.workers, use_cache=False if args.no_cache else None)
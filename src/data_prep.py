@@ -1,14 +1,85 @@
+import argparse
+import hashlib
+import shutil
+from pathlib import Path
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from src import instrument
 from src.config import CFG
-from src.utils_io import read_csv, to_parquet
+from src.instrument import stage, timed_iter
+from src.utils_io import (arrow_format, cache_enabled, cache_get, cache_key, cache_put, cache_restore, dataset_columns,
+                          file_fingerprint, iter_frames, read_csv, read_frame, to_parquet)
 
 # Lista de columnas que identifican al cliente (IDs), para eliminarlas si existen
 ID_COLS = ["customerID", "CustomerID", "id"]
 
+# Esquema de tipos compactos para el CSV de Telco: las categóricas se leen directo como `category`
+# (un código entero por fila en vez de un string de Python) y las numéricas con el menor tipo que alcanza.
+# Columnas que no estén aquí se leen con la inferencia normal y se compactan en compact_dtypes.
+RAW_SCHEMA = {
+    "gender": "category",
+    "SeniorCitizen": "int8",
+    "Partner": "category",
+    "Dependents": "category",
+    "tenure": "int16",
+    "PhoneService": "category",
+    "MultipleLines": "category",
+    "InternetService": "category",
+    "OnlineSecurity": "category",
+    "OnlineBackup": "category",
+    "DeviceProtection": "category",
+    "TechSupport": "category",
+    "StreamingTV": "category",
+    "StreamingMovies": "category",
+    "Contract": "category",
+    "PaperlessBilling": "category",
+    "PaymentMethod": "category",
+    "MonthlyCharges": "float32",
+    "TotalCharges": "float32",
+    "Churn": "category",
+}
+# En Telco, TotalCharges trae strings en blanco para clientes nuevos: se leen directo como NaN
+RAW_NA_VALUES = {"TotalCharges": [" ", ""]}
+
+def compact_dtypes(df: pd.DataFrame, max_cat_ratio: float = 0.5) -> pd.DataFrame:
+    # Baja numéricas al tipo más chico posible y pasa a `category` el texto con pocos valores distintos
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_integer_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+            df[c] = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s.dtype):
+            df[c] = pd.to_numeric(s, downcast="float")
+        elif s.dtype == "O" and len(s) and s.nunique(dropna=True) <= max_cat_ratio * len(s):
+            df[c] = s.astype("category")
+    return df
+
+def load_raw(path: str) -> pd.DataFrame:
+    """
+    Lee el CSV crudo con el esquema compacto (RAW_SCHEMA), sin cargar las columnas de ID.
+    Si el archivo no respeta el esquema (p. ej. un dataset propio), cae a la lectura normal
+    y compacta los tipos después. Un crudo en Parquet/Feather/Arrow IPC (archivo o carpeta
+    particionada) se lee con la capa Arrow de utils_io, proyectando también sin los IDs.
+    """
+    if arrow_format(path):
+        return compact_dtypes(read_frame(path, [c for c in dataset_columns(path) if c not in ID_COLS]))
+    usecols = lambda c: c not in ID_COLS  # noqa: E731 — los IDs se descartan igual en basic_clean
+    try:
+        df = read_csv(path, usecols=usecols, dtype=RAW_SCHEMA, na_values=RAW_NA_VALUES)
+    except (ValueError, TypeError):
+        df = read_csv(path, usecols=usecols)
+    return compact_dtypes(df)
+
+def _is_categorical(s: pd.Series) -> bool:
+    return isinstance(s.dtype, pd.CategoricalDtype)
+
 def normalize_target(s: pd.Series) -> pd.Series:
     # Esta función convierte la columna objetivo (target) a 1/0, sin importar el formato original
     # Soporta "yes"/"no", "1"/"0", "true"/"false", etc.
+    if _is_categorical(s):
+        # Con `category` basta normalizar las categorías (unas pocas) y luego indexar por código
+        mapped = normalize_target(pd.Series(s.cat.categories, dtype=object)).to_numpy()
+        codes = s.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, mapped[codes], 0), index=s.index).astype(int)
     return (
         s.astype(str)
         .str.strip()
@@ -18,23 +89,41 @@ def normalize_target(s: pd.Series) -> pd.Series:
         .astype(int)
     )
 
-def basic_clean(df: pd.DataFrame, target: str) -> pd.DataFrame:
+def strip_categories(s: pd.Series) -> pd.Series:
+    # Aplica strip a las categorías (no a cada fila). Si al hacer strip dos categorías quedan
+    # iguales (" DSL" y "DSL"), se recodifica por valor para unirlas.
+    cats = s.cat.categories
+    if cats.dtype != "O":
+        return s
+    stripped = cats.astype(str).str.strip()
+    if stripped.equals(cats):
+        return s
+    if stripped.is_unique:
+        return s.cat.rename_categories(stripped)
+    return s.astype(str).str.strip().where(s.notna()).astype("category")
+
+def basic_clean(df: pd.DataFrame, target: str, medians: dict = None) -> pd.DataFrame:
+    # `medians`: medianas ya calculadas (prep por chunks). Si es None se calculan sobre df;
+    # si es {} no se imputa nada (primera pasada del modo streaming).
     # Elimina columnas de ID si existen en el DataFrame
     for c in ID_COLS:
         if c in df.columns:
             df = df.drop(columns=[c])
 
     # Convierte TotalCharges a numérico (en Telco a veces hay strings vacíos)
-    if "TotalCharges" in df.columns:
-        df["TotalCharges"] = pd.to_numeric(df["TotalCharges"], errors="coerce")
+    if "TotalCharges" in df.columns and not pd.api.types.is_numeric_dtype(df["TotalCharges"]):
+        df["TotalCharges"] = pd.to_numeric(df["TotalCharges"].astype(str), errors="coerce")
 
-    # Asegura que SeniorCitizen sea int (puede venir como string o float)
+    # Asegura que SeniorCitizen sea un entero chico (es un flag 0/1, puede venir como string o float)
     if "SeniorCitizen" in df.columns:
-        df["SeniorCitizen"] = pd.to_numeric(df["SeniorCitizen"], errors="coerce").fillna(0).astype(int)
+        df["SeniorCitizen"] = pd.to_numeric(df["SeniorCitizen"], errors="coerce").fillna(0).astype("int8")
 
-    # Aplica strip (quita espacios) a todas las columnas de tipo string
-    for c in df.select_dtypes(include="object").columns:
-        df[c] = df[c].astype(str).str.strip()
+    # Aplica strip (quita espacios) a todas las columnas de texto; en `category` solo a las categorías
+    for c in df.select_dtypes(include=["object", "category"]).columns:
+        if _is_categorical(df[c]):
+            df[c] = strip_categories(df[c])
+        else:
+            df[c] = df[c].astype(str).str.strip()
 
     # Normaliza la columna objetivo (target) a 1/0
     if target not in df.columns:
@@ -45,31 +134,266 @@ def basic_clean(df: pd.DataFrame, target: str) -> pd.DataFrame:
     df = df.dropna(subset=[target])
 
     # Imputa valores faltantes en columnas numéricas con la mediana (por ejemplo, TotalCharges vacíos)
-    num_cols = df.select_dtypes(exclude="object").columns.drop(target, errors="ignore")
+    num_cols = df.select_dtypes(exclude=["object", "category", "string"]).columns.drop(target, errors="ignore")
     for c in num_cols:
-        df[c] = df[c].fillna(df[c].median())
+        fill = df[c].median() if medians is None else medians.get(c)
+        if fill is not None:
+            df[c] = df[c].fillna(fill)
 
     return df
 
+class MedianSketch:
+    """
+    Mediana en streaming para la prep por chunks. Guarda una muestra uniforme (reservoir sampling,
+    semilla fija) de a lo sumo `capacity` valores, así la memoria no depende del tamaño del archivo.
+    Mientras el total de valores no supere `capacity` la mediana es exacta; con capacity=None
+    se guardan todos los valores y siempre es exacta.
+    """
+
+    def __init__(self, capacity: int = None, seed: int = 0):
+        self.capacity = capacity
+        self.count = 0
+        self._rng = np.random.default_rng(seed)
+        self._parts = []
+        self._buf = np.empty(capacity, dtype=np.float64) if capacity else None
+        self._size = 0
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if self.capacity is None:
+            self._parts.append(values)
+            self.count += len(values)
+            return
+        # Primero se llena el buffer; después cada valor i (0-based en el stream) reemplaza
+        # una posición al azar j ∈ [0, i] si j cae dentro del buffer (algoritmo R, vectorizado)
+        fill = min(self.capacity - self._size, len(values))
+        self._buf[self._size:self._size + fill] = values[:fill]
+        self._size += fill
+        rest = values[fill:]
+        if len(rest):
+            j = self._rng.integers(0, self.count + fill + np.arange(len(rest)) + 1)
+            keep = j < self.capacity
+            self._buf[j[keep]] = rest[keep]
+        self.count += len(values)
+
+    def median(self) -> float:
+        sample = np.concatenate(self._parts) if self.capacity is None else self._buf[:self._size]
+        return float(np.median(sample)) if len(sample) else np.nan
+
+def iter_raw(path: str, chunksize: int):
+    # Lee el CSV crudo por chunks con el esquema compacto (incluye los IDs, que se usan para el split);
+    # un crudo Arrow se recorre por lotes de sus row groups
+    if arrow_format(path):
+        yield from iter_frames(path, chunksize)
+        return
+    try:
+        reader = read_csv(path, dtype=RAW_SCHEMA, na_values=RAW_NA_VALUES, chunksize=chunksize)
+        first = next(reader)
+    except (ValueError, TypeError):
+        reader = read_csv(path, chunksize=chunksize)
+        first = next(reader)
+    yield first
+    yield from reader
+
+def row_hash(df: pd.DataFrame, seed: int, row_offset: int = 0) -> pd.Series:
+    # Hash (uint64) con la semilla del ID de cada fila, o de su número de fila global si no hay ID
+    key = next((c for c in ID_COLS if c in df.columns), None)
+    keys = df[key].astype(str) if key else pd.Series(np.arange(row_offset, row_offset + len(df)), index=df.index)
+    h = pd.util.hash_pandas_object(keys, index=False, hash_key=f"{seed:016d}"[-16:])
+    return pd.Series(h.to_numpy(), index=df.index)
+
+class StratifiedHashSplit:
+    """
+    Split train/valid estratificado fuera de memoria: cada clase deja exactamente round(test_size · n)
+    de sus filas en validación, como train_test_split(stratify=...), sin tener el archivo en memoria.
+
+    - Pasada 1 (`count`): por clase, un histograma de los bits altos del hash de cada fila.
+    - `finalize`: en cada clase busca el bucket frontera, donde se completa la cuota de validación.
+    - Pasada 2 (`split`): las filas de buckets menores van a validación y las de mayores a train.
+      Dentro de la frontera (~n / 2^bits filas) se toman las que faltan, repartidas en el orden del
+      archivo con un contador por clase.
+    La decisión depende solo del hash y del orden de las filas, no del tamaño de los chunks.
+    """
+
+    def __init__(self, test_size: float, bits: int = 16):
+        self.test_size = test_size
+        self.bits = bits
+        self.hist = {}
+        self._bounds = {}
+
+    def _bucket(self, hashes) -> np.ndarray:
+        return (np.asarray(hashes, dtype=np.uint64) >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    def count(self, labels, hashes):
+        labels, buckets = np.asarray(labels), self._bucket(hashes)
+        for c in np.unique(labels):
+            hist = self.hist.setdefault(c, np.zeros(2**self.bits, dtype=np.int64))
+            hist += np.bincount(buckets[labels == c], minlength=len(hist))
+
+    def finalize(self) -> "StratifiedHashSplit":
+        # Por clase: (bucket frontera, filas a tomar dentro de él, filas del bucket, vistas hasta ahora)
+        for c, hist in self.hist.items():
+            target = int(np.floor(hist.sum() * self.test_size + 0.5))
+            cum = np.cumsum(hist)
+            b = int(np.searchsorted(cum, target, side="left"))
+            below = int(cum[b - 1]) if b else 0
+            self._bounds[c] = [b, target - below, int(hist[b]), 0]
+        return self
+
+    def split(self, labels, hashes) -> np.ndarray:
+        # Máscara True = validación para un chunk, en el mismo orden de filas que la pasada 1
+        labels, buckets = np.asarray(labels), self._bucket(hashes)
+        is_valid = np.zeros(len(labels), dtype=bool)
+        for c in np.unique(labels):
+            b, take, size, seen = self._bounds[c]
+            rows = np.flatnonzero(labels == c)
+            is_valid[rows] = buckets[rows] < b
+            edge = rows[buckets[rows] == b]
+            if len(edge):
+                # La fila j de la frontera entra si floor((j+1)·take/size) > floor(j·take/size)
+                j = seen + np.arange(len(edge))
+                is_valid[edge] = (j + 1) * take // size > j * take // size
+                self._bounds[c][3] = seen + len(edge)
+        return is_valid
+
+def _reset_output(path: str):
+    # Borra una salida anterior (archivo del modo normal o carpeta del modo streaming)
+    p = Path(path)
+    if p.is_dir():
+        shutil.rmtree(p)
+    elif p.exists():
+        p.unlink()
+
+@instrument.run("prep")
+def main_stream(chunksize: int, exact_median: bool = False):
+    """
+    Prep fuera de memoria en dos pasadas sobre el CSV crudo:
+    1) limpia cada chunk sin imputar, acumula un MedianSketch por columna numérica y cuenta el hash de
+       cada fila por clase (StratifiedHashSplit);
+    2) vuelve a leer, imputa con esas medianas, separa con el split estratificado y escribe cada chunk
+       como un part-XXXXX.parquet dentro de train.parquet/ y valid.parquet/ (datasets particionados).
+    """
+    target = CFG.target
+    sketches, dtypes = {}, {}
+    splitter, offset = StratifiedHashSplit(CFG.test_size), 0
+    for chunk in timed_iter("pass1/read", iter_raw(CFG.data_raw, chunksize)):
+        with stage("pass1/clean", rows=len(chunk)):
+            cl = basic_clean(chunk, target, medians={})
+        with stage("pass1/split", rows=len(cl)):
+            splitter.count(cl[target].to_numpy(), row_hash(chunk, CFG.seed, offset).loc[cl.index])
+        offset += len(chunk)
+        with stage("pass1/sketch", rows=len(cl)):
+            for c in cl.select_dtypes(exclude=["object", "category", "string"]).columns.drop(target, errors="ignore"):
+                if c not in sketches:
+                    sketches[c] = MedianSketch(None if exact_median else CFG.prep_sketch_size, CFG.seed)
+                sketches[c].update(cl[c].to_numpy(dtype=np.float64, na_value=np.nan))
+                # Tipo común entre chunks (p. ej. int en uno y float en otro): cada part debe tener el mismo esquema
+                dtypes[c] = np.result_type(dtypes.get(c, cl[c].dtype), cl[c].dtype)
+    medians = {c: sk.median() for c, sk in sketches.items()}
+    splitter.finalize()
+
+    _reset_output(CFG.data_train_out)
+    _reset_output(CFG.data_valid_out)
+    offset, n_train, n_valid = 0, 0, 0
+    for part, chunk in enumerate(timed_iter("pass2/read", iter_raw(CFG.data_raw, chunksize))):
+        hashes = row_hash(chunk, CFG.seed, offset)
+        offset += len(chunk)
+        with stage("pass2/clean", rows=len(chunk)):
+            cl = basic_clean(chunk, target, medians).astype(dtypes)
+        with stage("pass2/split", rows=len(cl)):
+            is_valid = pd.Series(splitter.split(cl[target].to_numpy(), hashes.loc[cl.index]), index=cl.index)
+        with stage("pass2/write", rows=len(cl)):
+            for out_dir, rows in ((CFG.data_train_out, cl[~is_valid]), (CFG.data_valid_out, cl[is_valid])):
+                if len(rows):
+                    to_parquet(rows, f"{out_dir}/part-{part:05d}.parquet", use_dictionary=True)
+        n_train += int((~is_valid).sum())
+        n_valid += int(is_valid.sum())
+    print(
+        f"[OK] (streaming, chunksize={chunksize}) train -> {CFG.data_train_out}, valid -> {CFG.data_valid_out}, "
+        f"filas train={n_train}, valid={n_valid} | medianas: {medians}"
+    )
+
+@instrument.run("prep")
 def main():
-    # Lee el dataset crudo usando la ruta definida en la config
-    df = read_csv(CFG.data_raw)
+    # Si el modo streaming dejó carpetas en las rutas de salida, se borran para escribir el archivo único
+    _reset_output(CFG.data_train_out)
+    _reset_output(CFG.data_valid_out)
+    # Lee el dataset crudo usando la ruta definida en la config, con tipos compactos
+    with stage("read") as st:
+        df = load_raw(CFG.data_raw)
+        st.rows = len(df)
     # Aplica limpieza básica
-    df = basic_clean(df, CFG.target)
+    with stage("clean", rows=len(df)):
+        df = basic_clean(df, CFG.target)
 
     # Divide el dataset en entrenamiento y validación, estratificando por el target
-    train_df, valid_df = train_test_split(
-        df, test_size=CFG.test_size, random_state=CFG.seed, stratify=df[CFG.target]
-    )
+    # (sklearn se importa solo aquí: un cache hit de la prep no lo necesita)
+    from sklearn.model_selection import train_test_split
 
-    # Guarda los datasets procesados en formato parquet
-    to_parquet(train_df, CFG.data_train_out)
-    to_parquet(valid_df, CFG.data_valid_out)
+    with stage("split", rows=len(df)):
+        train_df, valid_df = train_test_split(
+            df, test_size=CFG.test_size, random_state=CFG.seed, stratify=df[CFG.target]
+        )
+
+    # Guarda los datasets procesados en formato parquet; las `category` quedan con codificación
+    # de diccionario y se vuelven a leer como `category` en train
+    with stage("write", rows=len(df)):
+        to_parquet(train_df, CFG.data_train_out, use_dictionary=True)
+        to_parquet(valid_df, CFG.data_valid_out, use_dictionary=True)
     print(
         f"[OK] train -> {CFG.data_train_out}, valid -> {CFG.data_valid_out}, "
         f"shape train={train_df.shape}, valid={valid_df.shape}"
     )
 
+def prep_cache_key(mode: dict) -> str:
+    # La clave combina: huella del crudo, campos de la config que cambian el resultado, el modo de prep
+    # y la versión del código de limpieza (hash de este archivo: cualquier cambio invalida la caché)
+    return cache_key(
+        file_fingerprint(CFG.data_raw, content_hash=CFG.cache_hash_content),
+        {"target": CFG.target, "test_size": CFG.test_size, "seed": CFG.seed},
+        mode,
+        hashlib.sha256(Path(__file__).read_bytes()).hexdigest(),
+    )
+
+@instrument.run("prep")
+def run(chunksize: int = None, exact_median: bool = False, use_cache: bool = None):
+    """
+    Punto de entrada de `make prep`: corre main() o main_stream() pasando por la caché.
+    En un hit copia los parquet guardados a data_train_out/data_valid_out sin releer el crudo.
+    """
+    if chunksize:
+        mode = {"stream": True, "chunksize": chunksize, "exact_median": exact_median,
+                "sketch_size": CFG.prep_sketch_size}
+        build = lambda: main_stream(chunksize, exact_median)  # noqa: E731
+    else:
+        mode, build = {"stream": False}, main
+    if not cache_enabled(CFG.prep_cache if use_cache is None else use_cache):
+        build()
+        return
+
+    outputs = {"train": CFG.data_train_out, "valid": CFG.data_valid_out}
+    key = prep_cache_key(mode)
+    entry = cache_get(CFG.prep_cache_dir, key)
+    if entry is not None:
+        with stage("cache_restore"):
+            cache_restore(entry, outputs)
+        print(f"[CACHE] prep reutilizada ({key}) -> {CFG.data_train_out}, {CFG.data_valid_out}")
+        return
+    build()
+    cache_put(CFG.prep_cache_dir, key, outputs, {"raw": CFG.data_raw, "mode": mode}, CFG.cache_max_entries)
+
 if __name__ == "__main__":
     # Si corres este archivo directamente, ejecuta el flujo de limpieza y partición
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunksize", type=int, default=None,
+                    help="filas por chunk; activa la prep fuera de memoria (dos pasadas)")
+    ap.add_argument("--exact-median", action="store_true",
+                    help="en modo streaming, mediana exacta (guarda todas las numéricas) en vez de muestra")
+    ap.add_argument("--no-cache", action="store_true", help="ignora la caché y rehace la prep")
+    ap.add_argument("--instrument", action="store_true",
+                    help="mide cada etapa (wall, CPU, RSS, filas/s) y la exporta (ver src.instrument)")
+    args = ap.parse_args()
+    if args.instrument:
+        CFG.instrument = True
+    run(args.chunksize, args.exact_median, use_cache=False if args.no_cache else None)
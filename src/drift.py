@@ -0,0 +1,209 @@
+# Monitor de drift: compara lo que llega a inferencia contra train sin volver a leer train.parquet.
+# src.train guarda una referencia compacta (CFG.drift_ref_path) con:
+#   - numéricas: histograma con bordes fijos (cuantiles de train) + conteo de faltantes
+#   - categóricas: frecuencia de cada categoría de train + "otras" (no vistas) + faltantes
+#   - churn_proba: histograma de las probabilidades de validación (scores fuera de muestra, como en producción)
+# src.inference arma un sketch vacío con los mismos bordes y lo actualiza lote a lote (searchsorted +
+# bincount, una pasada). La memoria no depende del tamaño de la entrada: solo se guardan conteos.
+# Al final se reporta, por feature y para churn_proba:
+#   PSI = sum((cur - ref) * ln(cur / ref)) sobre las proporciones por bin (faltantes/otras incluidos)
+#   KS  = máxima diferencia entre las CDF acumuladas por bin (solo numéricas y score, sin faltantes)
+# Regla usual del PSI: < 0.1 estable, 0.1–0.25 cambio moderado, > 0.25 cambio fuerte.
+
+import json
+import numpy as np
+import pandas as pd
+from src.config import CFG
+from src.instrument import stage
+from src.utils_io import save_json
+
+# Piso de las proporciones para el PSI (un bin vacío en un lado daría log(0))
+PSI_EPS = 1e-4
+PSI_WARN, PSI_ALERT = 0.1, 0.25
+SCORE = "churn_proba"
+
+def quantile_edges(values, bins: int) -> np.ndarray:
+    # Bordes interiores en los cuantiles de `values` (sin repetidos: con muchos empates quedan menos bins)
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values) or bins < 2:
+        return np.array([], dtype=np.float64)
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+
+def _numeric(s) -> np.ndarray:
+    # Valores como float64 (NaN = faltante); el texto no numérico (p. ej. " " en TotalCharges) queda NaN
+    s = pd.Series(s)
+    if isinstance(s.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(s.dtype) \
+            or pd.api.types.is_bool_dtype(s.dtype):
+        s = pd.to_numeric(s.astype(object), errors="coerce")
+    return s.to_numpy(dtype=np.float64, na_value=np.nan)
+
+def psi(ref_counts, cur_counts) -> float:
+    ref, cur = np.asarray(ref_counts, dtype=np.float64), np.asarray(cur_counts, dtype=np.float64)
+    if not ref.sum() or not cur.sum():
+        return float("nan")
+    p = np.maximum(ref / ref.sum(), PSI_EPS)
+    q = np.maximum(cur / cur.sum(), PSI_EPS)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+def ks(ref_counts, cur_counts) -> float:
+    ref, cur = np.asarray(ref_counts, dtype=np.float64), np.asarray(cur_counts, dtype=np.float64)
+    if not ref.sum() or not cur.sum():
+        return float("nan")
+    return float(np.max(np.abs(np.cumsum(ref) / ref.sum() - np.cumsum(cur) / cur.sum())))
+
+class DriftSketch:
+    """
+    Conteos por bin de un conjunto de filas. `numeric[col]` = {"edges", "counts", "missing"},
+    `categorical[col]` = {"categories", "counts", "other", "missing"} y `score` = {"edges", "counts"}.
+    Los bordes y categorías se fijan en train (reference); en inferencia `empty_like` copia la
+    estructura con conteos en cero y `update` suma cada lote.
+    """
+
+    def __init__(self, numeric: dict, categorical: dict, score: dict, rows: int = 0):
+        self.numeric = numeric
+        self.categorical = categorical
+        self.score = score
+        self.rows = int(rows)
+
+    @classmethod
+    def reference(cls, df: pd.DataFrame, num_cols: list, cat_cols: list, scores=None,
+                  bins: int = None) -> "DriftSketch":
+        # Referencia de train: bordes por cuantiles (numéricas y score) y categorías observadas
+        bins = bins or CFG.drift_bins
+        numeric = {c: {"edges": quantile_edges(_numeric(df[c]), bins)} for c in num_cols}
+        categorical = {}
+        for c in cat_cols:
+            cats = pd.Series(df[c]).dropna().astype(str).unique()
+            categorical[c] = {"categories": sorted(cats.tolist())}
+        score = {"edges": quantile_edges(scores, bins) if scores is not None else np.array([], dtype=np.float64)}
+        sketch = cls(numeric, categorical, score).empty_like()
+        sketch.update(df)
+        if scores is not None:
+            sketch.update_scores(scores)
+        return sketch
+
+    def with_scores(self, scores, bins: int = None) -> "DriftSketch":
+        # La misma referencia de features con el histograma de `scores` (bordes por cuantiles): train
+        # guarda las features en la caché de matrices y agrega los scores de validación de cada modelo
+        edges = quantile_edges(scores, bins or CFG.drift_bins)
+        score = {"edges": edges, "counts": np.zeros(len(edges) + 1, dtype=np.int64)}
+        return DriftSketch(self.numeric, self.categorical, score, self.rows).update_scores(scores)
+
+    def empty_like(self) -> "DriftSketch":
+        numeric = {c: {"edges": h["edges"], "counts": np.zeros(len(h["edges"]) + 1, dtype=np.int64), "missing": 0}
+                   for c, h in self.numeric.items()}
+        categorical = {c: {"categories": h["categories"], "counts": np.zeros(len(h["categories"]), dtype=np.int64),
+                           "other": 0, "missing": 0}
+                       for c, h in self.categorical.items()}
+        score = {"edges": self.score["edges"], "counts": np.zeros(len(self.score["edges"]) + 1, dtype=np.int64)}
+        return DriftSketch(numeric, categorical, score)
+
+    def update(self, df: pd.DataFrame, scores=None) -> "DriftSketch":
+        # Suma un lote. Las columnas que no vienen en el lote cuentan como faltantes
+        n = len(df)
+        for c, h in self.numeric.items():
+            if c not in df.columns:
+                h["missing"] += n
+                continue
+            v = _numeric(df[c])
+            nan = np.isnan(v)
+            h["missing"] += int(nan.sum())
+            h["counts"] += np.bincount(np.searchsorted(h["edges"], v[~nan], side="right"),
+                                       minlength=len(h["counts"]))
+        for c, h in self.categorical.items():
+            if c not in df.columns:
+                h["missing"] += n
+                continue
+            s = pd.Series(df[c])
+            if s.dtype.name not in ("object", "string", "category"):
+                s = s.astype(str).where(s.notna(), None)
+            nan = s.isna().to_numpy()
+            # Códigos contra las categorías de train: -1 son faltantes o categorías no vistas
+            codes = pd.Categorical(s, categories=h["categories"]).codes
+            known = codes >= 0
+            h["counts"] += np.bincount(codes[known], minlength=len(h["counts"]))
+            h["missing"] += int(nan.sum())
+            h["other"] += int((~known & ~nan).sum())
+        if scores is not None:
+            self.update_scores(scores)
+        self.rows += n
+        return self
+
+    def update_scores(self, scores) -> "DriftSketch":
+        v = np.asarray(scores, dtype=np.float64)
+        v = v[~np.isnan(v)]
+        self.score["counts"] += np.bincount(np.searchsorted(self.score["edges"], v, side="right"),
+                                            minlength=len(self.score["counts"]))
+        return self
+
+    def tap(self, batches, proba_col: str = SCORE):
+        # Deja pasar los lotes puntuados (igual que TopK.tap) sumando features y churn_proba de cada uno
+        for out in batches:
+            with stage("drift", rows=len(out)):
+                self.update(out, out[proba_col] if proba_col in out.columns else None)
+            yield out
+
+    def compare(self, cur: "DriftSketch") -> pd.DataFrame:
+        """
+        PSI/KS de `cur` contra esta referencia, una fila por feature más churn_proba, ordenado por PSI.
+        Columnas: feature, kind, psi, ks, missing_ref, missing_cur (proporción de faltantes) y
+        unseen (proporción de categorías no vistas en train), y status según PSI_WARN/PSI_ALERT.
+        """
+        rows = []
+        for c, h in self.numeric.items():
+            g = cur.numeric[c]
+            rows.append({"feature": c, "kind": "numeric",
+                         "psi": psi(np.r_[h["counts"], h["missing"]], np.r_[g["counts"], g["missing"]]),
+                         "ks": ks(h["counts"], g["counts"]),
+                         "missing_ref": _share(h["missing"], self.rows), "missing_cur": _share(g["missing"], cur.rows),
+                         "unseen": 0.0})
+        for c, h in self.categorical.items():
+            g = cur.categorical[c]
+            rows.append({"feature": c, "kind": "categorical",
+                         "psi": psi(np.r_[h["counts"], h["other"], h["missing"]],
+                                    np.r_[g["counts"], g["other"], g["missing"]]),
+                         "ks": float("nan"),
+                         "missing_ref": _share(h["missing"], self.rows), "missing_cur": _share(g["missing"], cur.rows),
+                         "unseen": _share(g["other"], cur.rows)})
+        if self.score["counts"].sum():
+            rows.append({"feature": SCORE, "kind": "score",
+                         "psi": psi(self.score["counts"], cur.score["counts"]),
+                         "ks": ks(self.score["counts"], cur.score["counts"]),
+                         "missing_ref": 0.0, "missing_cur": 0.0, "unseen": 0.0})
+        out = pd.DataFrame(rows, columns=["feature", "kind", "psi", "ks", "missing_ref", "missing_cur", "unseen"])
+        out["status"] = np.select([out["psi"] > PSI_ALERT, out["psi"] > PSI_WARN], ["alert", "warn"], "ok")
+        return out.sort_values("psi", ascending=False, na_position="last", kind="stable").reset_index(drop=True)
+
+    def to_dict(self) -> dict:
+        plain = lambda h: {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in h.items()}  # noqa: E731
+        return {"rows": self.rows, "numeric": {c: plain(h) for c, h in self.numeric.items()},
+                "categorical": {c: plain(h) for c, h in self.categorical.items()}, "score": plain(self.score)}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DriftSketch":
+        arrays = lambda h: {k: np.asarray(v, dtype=np.float64 if k == "edges" else np.int64)  # noqa: E731
+                            if k in ("edges", "counts") else v for k, v in h.items()}
+        return cls({c: arrays(h) for c, h in d["numeric"].items()},
+                   {c: arrays(h) for c, h in d["categorical"].items()}, arrays(d["score"]), d["rows"])
+
+    def save(self, path: str = None):
+        save_json(self.to_dict(), path or CFG.drift_ref_path)
+
+    @classmethod
+    def load(cls, path: str = None) -> "DriftSketch":
+        with open(path or CFG.drift_ref_path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+def _share(count, total) -> float:
+    return float(count) / total if total else float("nan")
+
+def write_report(report: pd.DataFrame, cur: DriftSketch, path: str):
+    # Reporte JSON: filas puntuadas, resumen por feature y los conteos del sketch (para acumular entre corridas)
+    save_json({"rows": cur.rows, "features": report.to_dict(orient="records"), "sketch": cur.to_dict()}, path)
+
+def print_report(report: pd.DataFrame, top: int = 5):
+    flagged = report[report["status"] != "ok"]
+    print(f"[DRIFT] {len(flagged)} de {len(report)} con PSI > {PSI_WARN}"
+          + (f": {', '.join(flagged['feature'])}" if len(flagged) else ""))
+    print(report.head(top).to_string(index=False, float_format=lambda x: f"{x:.4f}"))
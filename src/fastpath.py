@@ -0,0 +1,335 @@
+# Predictor "compilado" para puntuar pocos registros sin pasar por pandas ni por el ColumnTransformer.
+# Se construye una vez desde el Pipeline entrenado (pre + modelo) y guarda como arrays planos
+# las medias/escalas del StandardScaler, el mapa categoría → columna del OneHot y el layout de salida.
+# Así, un dict (o tupla) se convierte directo en una fila NumPy y va al booster.
+#
+# También define el artefacto liviano (CFG.lean_dir): el booster en UBJSON nativo de XGBoost y los
+# parámetros del preprocesamiento en JSON. Se carga sin des-serializar objetos de sklearn.
+# Incluye además los árboles como arrays de NumPy (src.forest): con CFG.lean_engine="numpy" (o "auto"
+# en un host sin xgboost) se puntúa solo con numpy y pandas.
+#
+# Uso (exportar el artefacto liviano de un modelo ya entrenado):
+#   python -m src.fastpath --export
+
+import argparse
+import json
+import math
+import os
+import numpy as np
+from src.config import CFG
+from src.features import is_sparse
+
+# Archivos del artefacto liviano dentro de CFG.lean_dir
+LEAN_BOOSTER = "booster.ubj"
+LEAN_PARAMS = "preprocess.json"
+LEAN_FOREST = "forest.npz"
+
+class CompiledPredictor:
+    """
+    Reproduce `pipe.predict_proba(X)[:, 1]` a partir de registros planos.
+
+    - `num_cols`, `means`, `scales`: columnas numéricas y parámetros del StandardScaler.
+    - `cat_cols`, `categories`: columnas categóricas y sus categorías en el orden del OneHot.
+    - `base_cols`: orden esperado de las columnas cuando se pasan tuplas en vez de dicts.
+    - `clf`: el modelo final del pipeline (XGBClassifier o cualquier estimador con predict_proba).
+    - `sparse`: el pipeline se entrenó con OneHot disperso (ver features.build_preprocessor).
+      XGBoost toma las celdas no almacenadas de una CSR como faltantes: transform arma la CSR
+      directamente (solo los valores no nulos); con el motor numpy, que necesita una matriz densa,
+      esas celdas van como NaN.
+    - `num_dtype`: tipo en que el StandardScaler vio las numéricas ("num_dtype" de metadata.json).
+      Con float32 se redondea igual que sklearn: los cortes de los árboles son valores exactos
+      de los datos y una diferencia de 1e-7 puede cambiar de rama.
+    - `booster`, `iteration_range`: booster nativo de XGBoost cuando no hay `clf` (artefacto liviano).
+    - `forest`: árboles como arrays (src.forest.ArrayForest), en lugar del booster con el motor numpy.
+    - `column_plan`: plan de columnas del modelo (ver features.column_plan), para align_columns.
+    """
+
+    def __init__(self, num_cols, means, scales, cat_cols, categories, base_cols, clf=None, sparse=False,
+                 num_dtype="float64", booster=None, iteration_range=(0, 0), column_plan=None, forest=None):
+        self.num_cols = list(num_cols)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.cat_cols = list(cat_cols)
+        self.categories = [list(cats) for cats in categories]
+        self.base_cols = list(base_cols)
+        self.column_plan = column_plan
+        # Offset de cada categórica en la matriz de salida y su mapa valor → índice
+        self.cat_offsets = []
+        self.cat_maps = []
+        offset = len(self.num_cols)
+        for cats in categories:
+            self.cat_offsets.append(offset)
+            self.cat_maps.append({v: i for i, v in enumerate(cats)})
+            offset += len(cats)
+        self.n_features = offset
+        # Posiciones de cada columna dentro de una tupla ordenada según base_cols
+        pos = {c: i for i, c in enumerate(self.base_cols)}
+        self.num_pos = [pos[c] for c in self.num_cols]
+        self.cat_pos = [pos[c] for c in self.cat_cols]
+        self.clf = clf
+        self.sparse = sparse
+        self.num_dtype = np.dtype(num_dtype)
+        self._booster = booster
+        self._iteration_range = tuple(iteration_range)
+        self._forest = forest
+        if hasattr(clf, "get_booster"):
+            self._booster = clf.get_booster()
+            best = getattr(clf, "best_iteration", None)
+            if best is not None:
+                self._iteration_range = (0, best + 1)
+        # Fila preasignada para el caso de un solo cliente (el más común en el servidor).
+        # No es thread-safe: cada hilo que puntúe debe tener su propio predictor.
+        self._row = np.zeros((1, self.n_features), dtype=np.float64)
+
+    @classmethod
+    def from_pipeline(cls, pipe, num_dtype="float64", column_plan=None):
+        # Extrae los parámetros del ColumnTransformer ajustado (ver src.features.build_preprocessor)
+        pre = pipe.named_steps["pre"]
+        scaler = pre.named_transformers_["num"]
+        ohe = pre.named_transformers_["cat"]
+        cols = {name: list(c) for name, _, c in pre.transformers_ if name in ("num", "cat")}
+        num_cols, cat_cols = cols.get("num", []), cols.get("cat", [])
+        means = scaler.mean_ if getattr(scaler, "mean_", None) is not None else np.zeros(len(num_cols))
+        scales = scaler.scale_ if getattr(scaler, "scale_", None) is not None else np.ones(len(num_cols))
+        return cls(
+            num_cols, means, scales, cat_cols, [c.tolist() for c in ohe.categories_],
+            list(pre.feature_names_in_), pipe.steps[-1][1], sparse=is_sparse(pre), num_dtype=num_dtype,
+            column_plan=column_plan,
+        )
+
+    @classmethod
+    def load(cls, model_path: str, meta_path: str):
+        # Carga el pipeline con joblib y toma num_dtype y el plan de los metadatos guardados por src.train
+        import joblib
+
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        return cls.from_pipeline(
+            joblib.load(model_path), num_dtype=meta.get("num_dtype", "float64"), column_plan=meta.get("column_plan")
+        )
+
+    def save_lean(self, out_dir: str):
+        """
+        Guarda el artefacto liviano: booster en UBJSON, los mismos árboles como arrays de NumPy y
+        parámetros del preprocesamiento en JSON. Solo para modelos XGBoost (sin booster no hay formato
+        nativo que guardar). Si los árboles no entran en los arrays (p. ej. más profundos que
+        forest.MAX_DEPTH) se guarda igual, sin el motor numpy.
+        """
+        from src.forest import ArrayForest
+
+        if self._booster is None:
+            raise ValueError("el artefacto liviano solo soporta modelos XGBoost")
+        os.makedirs(out_dir, exist_ok=True)
+        self._booster.save_model(os.path.join(out_dir, LEAN_BOOSTER))
+        forest_path = os.path.join(out_dir, LEAN_FOREST)
+        try:
+            ArrayForest.from_booster(self._booster, self._iteration_range).save(forest_path)
+        except ValueError as e:
+            # Sin forest.npz (tampoco uno anterior): LEAN_ENGINE=numpy falla al cargar, xgboost funciona igual
+            print(f"[WARN] artefacto liviano sin motor numpy: {e}")
+            if os.path.exists(forest_path):
+                os.remove(forest_path)
+        params = {
+            "num_cols": self.num_cols,
+            "means": self.means.tolist(),
+            "scales": self.scales.tolist(),
+            "cat_cols": self.cat_cols,
+            "categories": self.categories,
+            "base_cols": self.base_cols,
+            "sparse": self.sparse,
+            "num_dtype": self.num_dtype.name,
+            "iteration_range": list(self._iteration_range),
+            "column_plan": self.column_plan,
+        }
+        with open(os.path.join(out_dir, LEAN_PARAMS), "w", encoding="utf-8") as f:
+            json.dump(params, f, ensure_ascii=False)
+
+    @classmethod
+    def load_lean(cls, lean_dir: str, engine: str = None):
+        # Carga el artefacto liviano: un JSON y el booster nativo (sin joblib ni objetos de sklearn), o
+        # con engine="numpy" los árboles como arrays (no importa xgboost). Por defecto CFG.lean_engine
+        engine = engine or CFG.lean_engine
+        if engine == "auto":
+            import importlib.util
+
+            engine = "xgboost" if importlib.util.find_spec("xgboost") is not None else "numpy"
+        if engine not in ("xgboost", "numpy"):
+            raise ValueError(f"motor desconocido: {engine} (xgboost, numpy o auto)")
+        with open(os.path.join(lean_dir, LEAN_PARAMS), encoding="utf-8") as f:
+            params = json.load(f)
+        if engine == "numpy":
+            from src.forest import ArrayForest
+
+            path = os.path.join(lean_dir, LEAN_FOREST)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"falta {path}: re-exportar con python -m src.fastpath --export (los "
+                                        f"árboles más profundos que forest.MAX_DEPTH solo corren con xgboost)")
+            return cls(forest=ArrayForest.load(path), **params)
+        import xgboost
+
+        booster = xgboost.Booster()
+        booster.load_model(os.path.join(lean_dir, LEAN_BOOSTER))
+        return cls(booster=booster, **params)
+
+    @classmethod
+    def from_paths(cls, paths: dict):
+        # Rutas de una versión (registry.artifact_paths): el artefacto liviano si existe, si no el joblib
+        if cls.lean_exists(paths["lean_dir"]):
+            return cls.load_lean(paths["lean_dir"])
+        return cls.load(paths["model_path"], paths["meta_path"])
+
+    @staticmethod
+    def lean_exists(lean_dir: str) -> bool:
+        return all(os.path.exists(os.path.join(lean_dir, f)) for f in (LEAN_BOOSTER, LEAN_PARAMS))
+
+    @property
+    def engine(self) -> str:
+        # Qué predice: "xgboost" (booster nativo), "numpy" (src.forest) o "sklearn" (clf del pipeline)
+        if self._booster is not None:
+            return "xgboost"
+        return "numpy" if self._forest is not None else "sklearn"
+
+    def set_threads(self, n: int):
+        # Hilos del booster (1 en los procesos worker de inferencia, para no sobre-suscribir la CPU)
+        if self._booster is not None:
+            self._booster.set_param({"nthread": n})
+        elif self._forest is not None:
+            pass  # el evaluador de numpy corre en un solo hilo
+        elif "n_jobs" in self.clf.get_params():
+            self.clf.set_params(n_jobs=n)
+
+    def _columns(self, records):
+        # Devuelve una función col(name, pos) que extrae la columna de un DataFrame, de dicts o de tuplas
+        if hasattr(records, "columns"):
+            return lambda name, _: records[name].to_numpy()
+        if isinstance(records[0], dict):
+            return lambda name, _: [r.get(name) for r in records]
+        return lambda _, pos: [r[pos] for r in records]
+
+    @staticmethod
+    def _to_float(values) -> np.ndarray:
+        # Igual que pd.to_numeric(errors="coerce"): lo que no es número queda como NaN
+        try:
+            return np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            out = np.empty(len(values), dtype=np.float64)
+            for i, v in enumerate(values):
+                try:
+                    out[i] = float(v)
+                except (TypeError, ValueError):
+                    out[i] = math.nan
+            return out
+
+    def _cat_index(self, values, j: int) -> np.ndarray:
+        # Índice de cada valor dentro de las categorías de la columna j (-1 si no se vio en train)
+        if isinstance(values, np.ndarray) and len(values) > 64:
+            import pandas as pd
+
+            try:
+                return pd.Categorical(values, categories=self.categories[j]).codes.astype(np.int64)
+            except (TypeError, ValueError):
+                pass  # p. ej. NaN entre las categorías: se usa el mapa
+        cmap = self.cat_maps[j]
+        return np.fromiter((cmap.get(v, -1) for v in values), dtype=np.int64, count=len(values))
+
+    @property
+    def _csr(self) -> bool:
+        # transform devuelve CSR: OneHot disperso y un modelo que la acepta (no el motor numpy)
+        return self.sparse and self._forest is None
+
+    def transform(self, records, out: np.ndarray = None):
+        """
+        Convierte uno o varios registros (dicts, tuplas en el orden de base_cols o un DataFrame ya
+        alineado) en la matriz que produciría el ColumnTransformer. Categorías desconocidas quedan
+        en 0, igual que OneHotEncoder(handle_unknown="ignore").
+        Con `sparse` devuelve una CSR armada desde el bloque numérico y los pares (fila, columna) del
+        OneHot, sin pasar por la matriz densa (ver _csr); `out` solo se usa en el caso denso.
+        """
+        if isinstance(records, (dict, tuple)):
+            records = [records]
+        n = len(records)
+        col = self._columns(records)
+        num = np.empty((n, len(self.num_cols)), dtype=np.float64)
+        for j, (name, pos) in enumerate(zip(self.num_cols, self.num_pos)):
+            # Igual que StandardScaler.transform (X -= mean_; X /= scale_ sobre X en num_dtype):
+            # cada operación se hace en float64 y se redondea a num_dtype. El astype explícito evita
+            # que numpy opere en float32 al mezclar un array float32 con un escalar float64.
+            x = self._to_float(col(name, pos)).astype(self.num_dtype).astype(np.float64)
+            x = (x - self.means[j]).astype(self.num_dtype).astype(np.float64)
+            num[:, j] = (x / self.scales[j]).astype(self.num_dtype)
+        rows = np.arange(n)
+        hit_rows, hit_cols = [], []
+        for j, (name, pos, offset) in enumerate(zip(self.cat_cols, self.cat_pos, self.cat_offsets)):
+            idx = self._cat_index(col(name, pos), j)
+            hit = idx >= 0
+            hit_rows.append(rows[hit])
+            hit_cols.append(offset + idx[hit])
+        if self._csr:
+            import scipy.sparse as sp
+
+            # Ceros y NaN numéricos quedan sin almacenar (faltantes para XGBoost, igual que la CSR de sklearn)
+            nz = (num != 0.0) & ~np.isnan(num)
+            nz_rows, nz_cols = np.nonzero(nz)
+            data = np.concatenate([num[nz], np.ones(sum(len(r) for r in hit_rows))])
+            coords = (np.concatenate([nz_rows, *hit_rows]), np.concatenate([nz_cols, *hit_cols]))
+            return sp.csr_matrix((data, coords), shape=(n, self.n_features))
+        # Denso: OneHot en 0 (o NaN con `sparse`, para el motor numpy) y el bloque numérico encima
+        fill = np.nan if self.sparse else 0.0
+        if out is None:
+            out = np.full((n, self.n_features), fill, dtype=np.float64)
+        else:
+            out[:] = fill
+        if self.sparse:
+            num[num == 0.0] = np.nan  # solo el bloque numérico: el OneHot ya arranca en NaN
+        out[:, : len(self.num_cols)] = num
+        for r, c in zip(hit_rows, hit_cols):
+            out[r, c] = 1.0
+        return out
+
+    def predict_proba(self, records) -> np.ndarray:
+        # Probabilidad de churn (clase 1) para uno o varios registros
+        if (isinstance(records, (dict, tuple)) or len(records) == 1) and not self._csr:
+            X = self.transform(records, out=self._row)
+        else:
+            X = self.transform(records)
+        return self.predict_matrix(X)
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        # Probabilidad de churn para una matriz ya transformada (salida de transform)
+        if self._booster is not None:
+            return self._booster.inplace_predict(X, iteration_range=self._iteration_range)
+        if self._forest is not None:
+            return self._forest.predict_proba(X)
+        return self.clf.predict_proba(X)[:, 1]
+
+    def predict_contribs(self, X: np.ndarray, approx: bool = False) -> np.ndarray:
+        # Contribuciones por feature (log-odds) de una matriz transformada, la última columna es el sesgo.
+        # Cálculo nativo por lotes de XGBoost (TreeSHAP, o Saabas con approx=True); con el motor numpy
+        # solo Saabas, sobre los arrays del forest
+        if self._forest is not None:
+            if not approx:
+                raise ValueError("TreeSHAP exacto necesita el booster de XGBoost: usar REASON_APPROX=1 o "
+                                 "LEAN_ENGINE=xgboost")
+            return self._forest.contribs(X)
+        import xgboost
+
+        booster = self._booster if self._booster is not None else getattr(self.clf, "get_booster", lambda: None)()
+        if booster is None:
+            raise ValueError(f"las contribuciones necesitan un modelo XGBoost, no {type(self.clf).__name__}")
+        return booster.predict(xgboost.DMatrix(X), pred_contribs=True, approx_contribs=approx,
+                               iteration_range=self._iteration_range)
+
+def export_lean(model_path: str = None, meta_path: str = None, lean_dir: str = None) -> str:
+    # Genera el artefacto liviano a partir del pipeline joblib y los metadatos de src.train
+    lean_dir = lean_dir or CFG.lean_dir
+    CompiledPredictor.load(model_path or CFG.model_path, meta_path or CFG.meta_path).save_lean(lean_dir)
+    return lean_dir
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--export", action="store_true", help="exporta el artefacto liviano del modelo actual")
+    args = ap.parse_args()
+    if args.export:
+        print(f"[OK] artefacto liviano → {export_lean()}")
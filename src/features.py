@@ -1,27 +1,64 @@
+import numpy as np
 import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+# Tipos que se tratan como categóricos: texto plano (object), category de pandas y strings de pyarrow
+TEXT_DTYPES = ["object", "category", "string"]
 
 def split_cols(df: pd.DataFrame, target: str):
     # Separa las columnas en categóricas y numéricas, excluyendo la columna objetivo (target)
     X = df.drop(columns=[target])
-    cat_cols = X.select_dtypes(include=["object"]).columns.tolist()  # columnas tipo string/categoría
-    num_cols = X.select_dtypes(exclude=["object"]).columns.tolist()  # columnas numéricas
+    cat_cols = X.select_dtypes(include=TEXT_DTYPES).columns.tolist()  # columnas tipo string/categoría
+    num_cols = X.select_dtypes(exclude=TEXT_DTYPES).columns.tolist()  # columnas numéricas
     return cat_cols, num_cols
 
-def build_preprocessor(cat_cols, num_cols) -> ColumnTransformer:
-    # Construye un preprocesador que escala las numéricas y hace OneHot a las categóricas
+def build_preprocessor(cat_cols, num_cols, sparse: bool = False):
+    # Construye un preprocesador que escala las numéricas y hace OneHot a las categóricas.
+    # Con sparse=True el OneHot y la salida completa quedan en CSR (XGBoost la consume directo),
+    # así la memoria crece con los no-ceros y no con filas × niveles.
+    # sklearn se importa aquí: inferencia y el camino rápido usan este módulo sin cargarlo
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
     pre = ColumnTransformer(
         transformers=[
             ("num", StandardScaler(), num_cols),  # Escala columnas numéricas
-            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_cols),  # OneHot a categóricas
-        ]
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=sparse), cat_cols),  # OneHot a categóricas
+        ],
+        sparse_threshold=1.0 if sparse else 0.0,  # 1.0 fuerza salida CSR, 0.0 fuerza densa
     )
     return pre
 
-def get_feature_names(pre: ColumnTransformer, cat_cols, num_cols):
+def is_sparse(pre) -> bool:
+    # Indica si el preprocesador (ajustado o no) fue construido en modo disperso
+    ohe = dict((name, t) for name, t, _ in pre.transformers)["cat"]
+    return bool(getattr(ohe, "sparse_output", False))
+
+def get_feature_names(pre, cat_cols, num_cols):
     # Devuelve la lista de nombres de features después del preprocesamiento
     # (útil para saber cómo se llaman las columnas tras el OneHot)
     ohe = pre.named_transformers_["cat"]
     cat_names = list(ohe.get_feature_names_out(cat_cols))
     return num_cols + cat_names
+
+def numeric_dtype(X: pd.DataFrame, num_cols) -> str:
+    # Tipo en el que sklearn procesa el bloque numérico: el común de las columnas si es flotante
+    # (float32 cuando la prep compactó los tipos), o float64 si son enteros
+    dt = np.result_type(*X[num_cols].dtypes) if len(num_cols) else np.dtype("float64")
+    return str(dt if np.issubdtype(dt, np.floating) else np.dtype("float64"))
+
+def column_plan(X: pd.DataFrame, num_cols) -> dict:
+    """
+    Plan de columnas para inference.align_columns: columna base → dtype que debe tener al puntuar.
+    Las numéricas flotantes conservan su tipo de entrenamiento y las enteras pasan al tipo del bloque
+    numérico (así un NaN en inferencia no rompe el cast y sklearn ve el mismo tipo que en train);
+    las categóricas guardan su tipo de texto ("category", "object" o "string").
+    """
+    block = numeric_dtype(X, num_cols)
+    plan = {}
+    for c in X.columns:
+        dt = X[c].dtype
+        if c in num_cols:
+            plan[c] = str(dt) if np.issubdtype(dt, np.floating) else block
+        else:
+            plan[c] = dt.name
+    return plan
@@ -0,0 +1,231 @@
+# Evaluador de árboles sobre arrays planos de NumPy: puntúa sin importar xgboost ni sklearn.
+# Se exporta una vez desde el booster entrenado (ArrayForest.from_booster, lo hace save_lean) y se
+# guarda como forest.npz dentro del artefacto liviano. En el host de scoring alcanza con numpy.
+#
+# Layout: cada árbol se completa a un árbol binario lleno de profundidad `depth` y se guarda como heap
+# (nodo i → hijos 2i+1 y 2i+2), una fila por árbol:
+#   feature[t, i], threshold[t, i]  split "x < threshold → izquierda" (float32, igual que XGBoost)
+#   default_left[t, i]              rama de los faltantes (NaN)
+#   value[t, j]                     valor (log-odds) de la hoja j del último nivel
+#   node_value[t, i]                valor medio del nodo (hojas ponderadas por cover), para contribs
+# Una hoja de XGBoost que queda antes del último nivel se "estira": sus nodos de relleno comparan una
+# columna constante 0 < 1 (siempre a la izquierda) y su valor se copia a las hojas de abajo. Así no hace
+# falta guardar hijos: después de `depth` pasos todas las filas están en el último nivel.
+#
+# Evaluación por bloques de filas: un array (filas × árboles) de posiciones avanza un nivel por paso
+# para todos los árboles a la vez (gathers vectorizados con np.take, sin recorrer árbol por árbol).
+# Los arrays de trabajo se reservan una vez: crear temporales de ese tamaño en cada nivel duplica el tiempo.
+#
+# contribs reproduce pred_contribs con approx_contribs=True de XGBoost (Saabas): en cada paso del
+# recorrido, el cambio del valor medio entre el nodo y el hijo elegido se suma a la feature del split.
+
+import json
+import numpy as np
+from src.config import CFG
+
+# Profundidad máxima exportable: el heap tiene 2^depth hojas por árbol
+MAX_DEPTH = 16
+
+class ArrayForest:
+    """
+    Ensamble de árboles de XGBoost (binary:logistic) como arrays planos, ver el layout arriba.
+    `bias` es el margen inicial (base_score en log-odds) y `n_features` el ancho de la matriz de entrada.
+    """
+
+    def __init__(self, feature, threshold, default_left, value, bias: float, n_features: int, node_value=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.value = np.ascontiguousarray(value, dtype=np.float32)
+        self.node_value = None if node_value is None else np.ascontiguousarray(node_value, dtype=np.float64)
+        self.depth = int(np.log2(self.value.shape[1]))
+        self.bias = float(bias)
+        self.n_features = int(n_features)
+
+    def __len__(self) -> int:
+        return self.value.shape[0]
+
+    @classmethod
+    def from_booster(cls, booster, iteration_range=(0, 0)) -> "ArrayForest":
+        # Lee el JSON del booster (sin importar xgboost: es un método del objeto) y aplana los árboles
+        model = json.loads(booster.save_raw("json"))["learner"]
+        objective = model["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"solo se exportan modelos binary:logistic, no {objective}")
+        gbtree = model["gradient_booster"]["model"]
+        n_features = int(model["learner_model_param"]["num_feature"])
+        trees = gbtree["trees"]
+        # iteration_range (0, k): árboles de las primeras k rondas (XGBoost guarda el corte por ronda)
+        if iteration_range and iteration_range[1]:
+            trees = trees[: int(gbtree["iteration_indptr"][iteration_range[1]])]
+        if any(any(tree["split_type"]) for tree in trees):
+            raise ValueError("los splits categóricos nativos no están soportados (el modelo usa OneHot)")
+
+        def tree_depth(tree):
+            left, right = tree["left_children"], tree["right_children"]
+            stack, depth = [(0, 0)], 0
+            while stack:
+                node, d = stack.pop()
+                depth = max(depth, d)
+                if left[node] != -1:
+                    stack += [(left[node], d + 1), (right[node], d + 1)]
+            return depth
+
+        depth = max([1] + [tree_depth(tree) for tree in trees])
+        if depth > MAX_DEPTH:
+            raise ValueError(f"árboles de profundidad {depth}: el layout en heap admite hasta {MAX_DEPTH}")
+        n_inner = 2**depth - 1
+        feature = np.full((len(trees), n_inner), n_features, dtype=np.int32)
+        threshold = np.ones((len(trees), n_inner), dtype=np.float32)
+        default_left = np.ones((len(trees), n_inner), dtype=bool)
+        value = np.zeros((len(trees), n_inner + 1), dtype=np.float32)
+        node_value = np.zeros((len(trees), n_inner), dtype=np.float64)
+        for t, tree in enumerate(trees):
+            left, right = tree["left_children"], tree["right_children"]
+            split, cond = tree["split_indices"], tree["split_conditions"]
+            # Valor medio de cada nodo: el de la hoja, o el promedio de los hijos ponderado por cover
+            # (sum_hessian), igual que XGBoost para las contribuciones aproximadas
+            cover, mean, order = tree["sum_hessian"], [0.0] * len(left), [0]
+            for node in order:  # por niveles: cada padre antes que sus hijos
+                if left[node] != -1:
+                    order += [left[node], right[node]]
+            for node in reversed(order):
+                if left[node] == -1:
+                    mean[node] = cond[node]
+                else:
+                    l, r = left[node], right[node]
+                    mean[node] = (mean[l] * cover[l] + mean[r] * cover[r]) / cover[node]
+            # (nodo de XGBoost, posición en el heap); en el último nivel la posición es una hoja
+            stack = [(0, 0)]
+            while stack:
+                node, pos = stack.pop()
+                if pos >= n_inner:
+                    value[t, pos - n_inner] = cond[node]  # en las hojas split_conditions es el valor
+                    continue
+                node_value[t, pos] = mean[node]
+                if left[node] == -1:
+                    stack += [(node, 2 * pos + 1), (node, 2 * pos + 2)]  # relleno: queda la constante
+                else:
+                    feature[t, pos] = split[node]
+                    threshold[t, pos] = cond[node]
+                    default_left[t, pos] = bool(tree["default_left"][node])
+                    stack += [(left[node], 2 * pos + 1), (right[node], 2 * pos + 2)]
+
+        forest = cls(feature, threshold, default_left, value, 0.0, n_features, node_value)
+        # El margen inicial sale de comparar con el booster en una fila: no depende de cómo cada
+        # versión de XGBoost guarda base_score
+        row = np.zeros((1, n_features), dtype=np.float32)
+        native = booster.inplace_predict(row, predict_type="margin", iteration_range=tuple(iteration_range))
+        forest.bias = float(np.asarray(native).ravel()[0]) - float(forest.margin(row)[0])
+        return forest
+
+    def margin(self, X, block_rows: int = None) -> np.ndarray:
+        """
+        Log-odds de cada fila de la matriz transformada X (misma entrada que el booster). Los valores se
+        comparan en float32 como en XGBoost; los NaN siguen la rama por defecto de cada nodo.
+        """
+        X = np.asarray(X)
+        n, n_trees = X.shape[0], len(self)
+        rows = min(block_rows or CFG.forest_block_rows, max(n, 1))
+        out = np.empty(n, dtype=np.float64)
+        n_inner = self.feature.shape[1]
+        feature, threshold = self.feature.ravel(), self.threshold.ravel()
+        default_left, value = self.default_left.ravel(), self.value.ravel()
+        # Inicio de cada árbol en los arrays aplanados (nodos internos y hojas)
+        tree_inner = (np.arange(n_trees, dtype=np.int32) * n_inner)[None, :]
+        tree_leaf = (np.arange(n_trees, dtype=np.int32) * (n_inner + 1))[None, :]
+        # Bloque en float32 con la columna constante 0 de los nodos de relleno al final
+        buf = np.zeros((rows, self.n_features + 1), dtype=np.float32)
+        shape = (rows, n_trees)
+        pos_buf, idx_buf, col_buf = (np.empty(shape, dtype=np.int32) for _ in range(3))
+        x_buf, thr_buf = np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.float32)
+        left_buf = np.empty(shape, dtype=bool)
+        for start in range(0, n, rows):
+            stop = min(start + rows, n)
+            m = stop - start
+            block = buf[:m]
+            block[:, : self.n_features] = X[start:stop]
+            flat = block.ravel()
+            pos, idx, col, x, thr, go_left = (a[:m] for a in (pos_buf, idx_buf, col_buf, x_buf, thr_buf, left_buf))
+            row_start = (np.arange(m, dtype=np.int32) * block.shape[1])[:, None]
+            has_nan = bool(np.isnan(block).any())
+            # Nivel 0: todas las filas están en la raíz, alcanza con tomar las columnas de cada raíz
+            np.take(block, self.feature[:, 0], axis=1, out=x)
+            np.less(x, self.threshold[:, 0], out=go_left)
+            if has_nan:
+                go_left |= np.isnan(x) & self.default_left[:, 0]
+            pos.fill(2)
+            np.subtract(pos, go_left, out=pos)
+            for _ in range(1, self.depth):
+                np.add(pos, tree_inner, out=idx)
+                np.take(feature, idx, out=col, mode="clip")
+                col += row_start
+                np.take(flat, col, out=x, mode="clip")
+                np.take(threshold, idx, out=thr, mode="clip")
+                np.less(x, thr, out=go_left)
+                if has_nan:
+                    go_left |= np.isnan(x) & np.take(default_left, idx, mode="clip")
+                # Hijo izquierdo 2i+1, derecho 2i+2
+                pos *= 2
+                pos += 2
+                np.subtract(pos, go_left, out=pos)
+            pos += tree_leaf - n_inner
+            np.take(value, pos, out=thr, mode="clip")
+            out[start:stop] = thr.sum(axis=1, dtype=np.float64)
+        return out + self.bias
+
+    def contribs(self, X, block_rows: int = None) -> np.ndarray:
+        """
+        Contribuciones aproximadas (Saabas) por feature en log-odds, shape (filas, n_features + 1) con el
+        sesgo en la última columna: lo mismo que pred_contribs con approx_contribs=True. Cada fila suma
+        su margen.
+        """
+        if self.node_value is None:
+            raise ValueError("el forest no tiene valores por nodo: re-exportar con python -m src.fastpath --export")
+        X = np.asarray(X)
+        n, n_trees = X.shape[0], len(self)
+        rows = min(block_rows or CFG.forest_block_rows, max(n, 1))
+        n_inner, width = self.feature.shape[1], self.n_features + 1
+        out = np.zeros((n, width), dtype=np.float32)
+        # Sesgo: valor medio de cada raíz más el margen inicial, igual para todas las filas
+        out[:, -1] = self.node_value[:, 0].sum() + self.bias
+        trees = np.arange(n_trees)[None, :]
+        for start in range(0, n, rows):
+            stop = min(start + rows, n)
+            m = stop - start
+            # Columna constante 0 al final (nodos de relleno); su delta es 0 y se descarta con ella
+            block = np.zeros((m, width), dtype=np.float32)
+            block[:, : self.n_features] = X[start:stop]
+            row_start = (np.arange(m) * width)[:, None]
+            acc = np.zeros(m * width, dtype=np.float64)
+            pos = np.zeros((m, n_trees), dtype=np.int64)
+            mean = np.broadcast_to(self.node_value[:, 0], (m, n_trees))
+            for level in range(self.depth):
+                feat = self.feature[trees, pos]
+                x = np.take_along_axis(block, feat, axis=1)
+                go_left = (x < self.threshold[trees, pos]) | (np.isnan(x) & self.default_left[trees, pos])
+                pos = 2 * pos + 2 - go_left
+                if level == self.depth - 1:
+                    child = self.value[trees, pos - n_inner].astype(np.float64)
+                else:
+                    child = self.node_value[trees, pos]
+                acc += np.bincount((row_start + feat).ravel(), weights=(child - mean).ravel(), minlength=m * width)
+                mean = child
+            out[start:stop, : self.n_features] = acc.reshape(m, width)[:, : self.n_features]
+        return out
+
+    def predict_proba(self, X) -> np.ndarray:
+        # Probabilidad de la clase 1 (sigmoide del margen), como booster.inplace_predict
+        return 1.0 / (1.0 + np.exp(-self.margin(X)))
+
+    def save(self, path: str):
+        extra = {} if self.node_value is None else {"node_value": self.node_value}
+        np.savez(path, feature=self.feature, threshold=self.threshold, default_left=self.default_left,
+                 value=self.value, meta=np.array([self.bias, self.n_features], dtype=np.float64), **extra)
+
+    @classmethod
+    def load(cls, path: str) -> "ArrayForest":
+        with np.load(path) as z:
+            bias, n_features = z["meta"]
+            return cls(z["feature"], z["threshold"], z["default_left"], z["value"], float(bias), int(n_features),
+                       z["node_value"] if "node_value" in z else None)
@@ -0,0 +1,127 @@
+# Reentrenamiento incremental: sigue el boosting del modelo guardado solo sobre una partición nueva.
+# El preprocesador ajustado se conserva tal cual (mismas medias/escalas y categorías del OneHot): agregar
+# categorías movería las columnas de la matriz y los árboles existentes leerían features equivocadas.
+# Las categorías nuevas se reportan (el OneHot las ignora) como señal de que conviene un retrain completo.
+#
+# Uso:
+#   python -m src.train --incremental data/processed/2024-06.parquet
+#   python -m src.incremental --new data/processed/2024-06.parquet --rounds 100 --no-compare
+
+import argparse
+import time
+import joblib
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from xgboost import XGBClassifier
+from src.config import CFG
+from src.features import build_preprocessor, split_cols
+from src.inference import align_columns, load_column_plan
+from src.metrics import ThresholdCurve, summary
+from src.train import drift_reference, load_parquet, save_artifacts, split_xy
+
+def unseen_categories(pre, X: pd.DataFrame) -> dict:
+    # Filas por columna categórica con valores que el OneHot no vio en el entrenamiento original
+    ohe = pre.named_transformers_["cat"]
+    cat_cols = dict((name, cols) for name, _, cols in pre.transformers_)["cat"]
+    out = {}
+    for col, cats in zip(cat_cols, ohe.categories_):
+        s = X[col]
+        n = int((~s.isin(cats) & s.notna()).sum())
+        if n:
+            out[col] = n
+    return out
+
+def evaluate(pipe, X: pd.DataFrame, y) -> dict:
+    s = summary(y, pipe.predict_proba(X)[:, 1])
+    return {"auc": s["auc"], "f1": s["f1"]}
+
+def continue_boosting(clf: XGBClassifier, Xt, y, rounds: int) -> XGBClassifier:
+    """
+    Devuelve un XGBClassifier con los árboles de `clf` más `rounds` nuevos ajustados sobre (Xt, y).
+    Si el modelo viene de early stopping se parte de su mejor iteración (los árboles posteriores
+    no se usaban al predecir).
+    """
+    booster = clf.get_booster()
+    best = getattr(clf, "best_iteration", None)
+    if best is not None:
+        booster = booster[: best + 1]
+    params = {k: v for k, v in clf.get_params().items() if k not in ("n_estimators", "early_stopping_rounds")}
+    model = XGBClassifier(**params, n_estimators=rounds)
+    model.fit(Xt, y, xgb_model=booster)
+    return model
+
+def full_retrain(clf: XGBClassifier, history: pd.DataFrame, new: pd.DataFrame):
+    # Referencia: mismo modelo desde cero sobre historia + partición nueva, con preprocesador re-ajustado
+    df = pd.concat([history, new], ignore_index=True)
+    cat_cols, num_cols = split_cols(df, CFG.target)
+    X, y = split_xy(df)
+    params = {k: v for k, v in clf.get_params().items() if k != "early_stopping_rounds"}
+    pipe = Pipeline([("pre", build_preprocessor(cat_cols, num_cols, sparse=CFG.sparse_onehot)),
+                     ("clf", XGBClassifier(**params))])
+    return pipe.fit(X, y)
+
+def main(new_path: str, rounds: int = None, compare: bool = True, save: bool = True) -> dict:
+    """
+    Carga el pipeline guardado, agrega `rounds` árboles entrenados solo con la partición `new_path`
+    (parquet limpio, mismo esquema que train.parquet) y evalúa en CFG.data_valid_out contra el
+    modelo anterior y, con `compare`, contra un retrain completo sobre train + nueva.
+    """
+    rounds = rounds or CFG.incremental_rounds
+    pipe = joblib.load(CFG.model_path)
+    pre, clf = pipe.named_steps["pre"], pipe.named_steps["clf"]
+    if not isinstance(clf, XGBClassifier):
+        raise ValueError(f"el modo incremental necesita un modelo XGBoost, el guardado es {type(clf).__name__}")
+    base_cols, plan = list(pre.feature_names_in_), load_column_plan()
+
+    new_df = load_parquet(new_path)
+    valid_df = load_parquet(CFG.data_valid_out)
+    # La partición nueva se alinea con el plan del modelo: mismas columnas y tipos que en el entrenamiento
+    X_new, y_new = align_columns(new_df, base_cols, plan), new_df[CFG.target].values
+    X_valid, y_valid = align_columns(valid_df, base_cols, plan), valid_df[CFG.target].values
+
+    unseen = unseen_categories(pre, X_new)
+    if unseen:
+        print(f"[WARN] categorías no vistas en el entrenamiento (filas por columna, el OneHot las ignora): {unseen}")
+
+    report = {"rows_new": len(new_df), "rounds": rounds, "unseen_categories": unseen,
+              "previous": evaluate(pipe, X_valid, y_valid)}
+    start = time.perf_counter()
+    model = continue_boosting(clf, pre.transform(X_new), y_new, rounds)
+    new_pipe = Pipeline([("pre", pre), ("clf", model)])
+    report["incremental"] = {**evaluate(new_pipe, X_valid, y_valid),
+                             "wall_s": time.perf_counter() - start}
+    if compare:
+        start = time.perf_counter()
+        full = full_retrain(clf, load_parquet(CFG.data_train_out), new_df)
+        report["full_retrain"] = {**evaluate(full, valid_df.drop(columns=[CFG.target]), y_valid),
+                                  "wall_s": time.perf_counter() - start}
+
+    for name in ("previous", "incremental", "full_retrain"):
+        if name in report:
+            r = report[name]
+            wall = f" | {r['wall_s']:.2f}s" if "wall_s" in r else ""
+            print(f"{name:<13} ROC-AUC: {r['auc']:.4f} | F1: {r['f1']:.4f}{wall}")
+
+    if save:
+        cols = {name: c for name, _, c in pre.transformers_}
+        n_trees = model.get_booster().num_boosted_rounds()
+        proba = new_pipe.predict_proba(X_valid)[:, 1]
+        # La referencia de drift suma la partición nueva: el modelo ya la vio
+        save_artifacts(
+            new_pipe, X_new.iloc[:0], list(cols["cat"]), list(cols["num"]),
+            extra_meta={"incremental": {"new": new_path, "rows": len(new_df), "rounds": rounds, "trees": n_trees,
+                                        "auc_valid": report["incremental"]["auc"]}},
+            curve=ThresholdCurve.from_scores(y_valid, proba),
+            drift=drift_reference(list(cols["num"]), list(cols["cat"]), proba, X_new),
+        )
+        print(f"[OK] modelo incremental ({n_trees} árboles) guardado en {CFG.model_path}")
+    return report
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--new", required=True, help="parquet limpio con la partición nueva (con target)")
+    ap.add_argument("--rounds", type=int, default=None, help="árboles a agregar (INCREMENTAL_ROUNDS)")
+    ap.add_argument("--no-compare", action="store_true", help="no entrena el retrain completo de referencia")
+    ap.add_argument("--no-save", action="store_true", help="solo evalúa, no sobrescribe el modelo")
+    args = ap.parse_args()
+    main(args.new, args.rounds, compare=not args.no_compare, save=not args.no_save)
@@ -1,49 +1,418 @@
 import argparse
-import joblib
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+from src import instrument, registry
 from src.config import CFG
+from src.fastpath import CompiledPredictor
+from src.features import TEXT_DTYPES
+from src.instrument import stage, timed_iter
+from src.utils_io import iter_frames, parse_filter, read_frame, to_parquet
 
 # Variable para el nombre de la columna objetivo (no se usa directamente, pero queda como referencia)
 target = "Churn"
 
-def align_columns(df: pd.DataFrame, base_cols: list) -> pd.DataFrame:
+def load_model(lean: bool = False, model_path: str = None, cols_path: str = None, meta_path: str = None,
+               lean_dir: str = None) -> tuple:
+    """
+    Devuelve (modelo, columnas base, plan de columnas). Con `lean` carga el artefacto liviano
+    (CompiledPredictor desde CFG.lean_dir, sin des-serializar objetos de sklearn); si no, el Pipeline de joblib.
+    """
+    if lean:
+        cp = CompiledPredictor.load_lean(lean_dir or CFG.lean_dir)
+        return cp, cp.base_cols, cp.column_plan
+    import joblib
+
+    pipe = joblib.load(model_path or CFG.model_path)
+    return pipe, joblib.load(cols_path or CFG.cols_path), load_column_plan(meta_path)
+
+def load_paths(paths: dict, lean: bool = None) -> tuple:
+    # load_model sobre las rutas de una versión (registry.artifact_paths); lean=None usa el liviano si existe
+    if lean is None:
+        lean = CompiledPredictor.lean_exists(paths["lean_dir"])
+    return load_model(lean, paths["model_path"], paths["cols_path"], paths["meta_path"], paths["lean_dir"])
+
+# Modelos cargados por versión del registro (LRU); se comparte entre llamadas del mismo proceso
+_MODELS = None
+
+def load_version(version: str = None) -> tuple:
+    """
+    Devuelve (versión, modelo, columnas base, plan) de `version` o de la activa del registro. Sigue al
+    puntero CURRENT: después de un train (o de `python -m src.registry activate`) la próxima llamada
+    devuelve la versión nueva sin reiniciar el proceso. Sin registro usa las rutas planas de CFG.
+    """
+    global _MODELS
+    if _MODELS is None:
+        _MODELS = registry.ModelCache(load_paths)
+    version, (model, base_cols, plan) = _MODELS.get(version)
+    return version, model, base_cols, plan
+
+def transform_matrix(model, X: pd.DataFrame):
+    # Matriz que ve el modelo (salida del ColumnTransformer o de CompiledPredictor.transform)
+    with stage("preprocess", rows=len(X)):
+        return model.transform(X) if isinstance(model, CompiledPredictor) else model[:-1].transform(X)
+
+def predict_matrix(model, Xt):
+    with stage("predict", rows=Xt.shape[0]):
+        return model.predict_matrix(Xt) if isinstance(model, CompiledPredictor) else model[-1].predict_proba(Xt)[:, 1]
+
+def predict_churn(model, X: pd.DataFrame):
+    """
+    Probabilidad de churn para un DataFrame alineado, con el Pipeline o con el artefacto liviano.
+    Es lo mismo que pipe.predict_proba(X)[:, 1], en dos pasos para medir por separado el
+    preprocesador y el modelo.
+    """
+    return predict_matrix(model, transform_matrix(model, X))
+
+def reason_codes(model, Xt, top_n: int = 3, approx: bool = None) -> pd.DataFrame:
+    """
+    Motivos de riesgo por cliente: las `top_n` columnas base que más suben la probabilidad de churn.
+    Usa las contribuciones nativas de XGBoost sobre la matriz ya transformada (todo el lote en una
+    llamada) y suma las de cada OneHot en su columna base (Contract_Month-to-month, Contract_Two year...
+    → Contract). Devuelve reason_1..N (columna, None si no suma riesgo) y reason_k_contrib (log-odds).
+    Con `approx` (CFG.reason_approx, por defecto) usa la aproximación de Saabas: el mismo recorrido por
+    árbol que una predicción; approx=False da TreeSHAP exacto, mucho más caro con árboles profundos.
+    """
+    cp = model if isinstance(model, CompiledPredictor) else CompiledPredictor.from_pipeline(model)
+    approx = CFG.reason_approx if approx is None else approx
+    with stage("reasons", rows=Xt.shape[0]):
+        contribs = cp.predict_contribs(Xt, approx=approx)[:, :-1]
+        # Las features de cada columna base son contiguas: numéricas (una cada una) y después los
+        # bloques del OneHot, así que basta un reduceat por los inicios de cada bloque
+        names = cp.num_cols + cp.cat_cols
+        starts = np.r_[np.arange(len(cp.num_cols)), np.asarray(cp.cat_offsets, dtype=np.int64)]
+        folded = np.add.reduceat(contribs, starts, axis=1)
+        k = min(top_n, len(names))
+        top = np.argpartition(-folded, k - 1, axis=1)[:, :k]
+        values = np.take_along_axis(folded, top, axis=1)
+        order = np.argsort(-values, axis=1, kind="stable")
+        top, values = np.take_along_axis(top, order, axis=1), np.take_along_axis(values, order, axis=1)
+        labels = np.asarray(names, dtype=object)[top]
+        labels[values <= 0] = None
+        out = {}
+        for i in range(k):
+            out[f"reason_{i + 1}"] = labels[:, i]
+            out[f"reason_{i + 1}_contrib"] = values[:, i].astype(np.float32)
+        return pd.DataFrame(out)
+
+def load_column_plan(meta_path: str = None) -> dict:
+    # Plan de columnas guardado por src.train en metadata.json (None en modelos anteriores al plan)
+    path = meta_path or CFG.meta_path
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("column_plan")
+
+def align_columns(df: pd.DataFrame, base_cols: list, plan: dict = None) -> pd.DataFrame:
     """
     Esta función asegura que el DataFrame de entrada tenga exactamente las columnas que espera el modelo,
     en el mismo orden y con los mismos nombres. Si falta alguna columna, la rellena con NA.
-    Además, intenta convertir columnas a numérico si es posible.
-    """
-    # Crea un nuevo DataFrame solo con las columnas base (en el orden correcto)
-    X = pd.DataFrame({c: df[c] if c in df.columns else pd.NA for c in base_cols})
-    # Intenta convertir a numérico donde sea posible (ignora errores si no se puede)
-    for c in X.columns:
-        if X[c].dtype == "O":
-            try:
-                X[c] = pd.to_numeric(X[c])
-            except Exception:
-                pass
-    return X
 
-def main(input_path: str, output_path: str):
+    Con `plan` (columna → dtype, ver features.column_plan) hace un solo reindex y convierte solo lo
+    que no tiene ya el tipo de entrenamiento: las numéricas con to_numeric(errors="coerce") (un " "
+    queda NaN) y las categóricas que llegaron como números pasan a texto. Sin plan (modelos viejos),
+    intenta convertir a numérico cada columna de texto.
     """
-    Función principal de inferencia.
-    Lee el archivo de entrada (CSV o Parquet), carga el modelo y las columnas base,
-    alinea las columnas del DataFrame, predice la probabilidad de churn y guarda el resultado.
-    """
-    # Lee el archivo de entrada (soporta CSV o Parquet)
-    df = pd.read_parquet(input_path) if input_path.endswith(".parquet") else pd.read_csv(input_path)
+    if plan is None:
+        # Crea un nuevo DataFrame solo con las columnas base (en el orden correcto)
+        X = pd.DataFrame({c: df[c] if c in df.columns else pd.NA for c in base_cols})
+        # Intenta convertir a numérico donde sea posible (ignora errores si no se puede)
+        for c in X.columns:
+            if X[c].dtype == "O":
+                try:
+                    X[c] = pd.to_numeric(X[c])
+                except Exception:
+                    pass
+        return X
 
-    # Carga el pipeline entrenado y la lista de columnas base
-    pipe = joblib.load(CFG.model_path)
-    base_cols = joblib.load(CFG.cols_path)
+    # Las columnas faltantes quedan como NaN (float), que sirve tanto para numéricas como para el OneHot
+    X = df.reindex(columns=base_cols)
+    casts = {}
+    for c in base_cols:
+        s, dtype = X[c], plan.get(c)
+        if dtype is None or s.dtype.name == dtype:
+            continue
+        if dtype in TEXT_DTYPES:
+            if s.dtype.name not in TEXT_DTYPES:
+                # P. ej. un código numérico leído como int: el OneHot compara contra strings
+                X[c] = s.astype(str).where(s.notna(), None)
+        elif pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+            casts[c] = dtype
+        else:
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                s = s.astype(object)
+            X[c] = pd.to_numeric(s, errors="coerce")
+            casts[c] = dtype
+    return X.astype(casts, copy=False) if casts else X
 
+def score_frame(pipe, df: pd.DataFrame, base_cols: list, threshold: float = 0.5, plan: dict = None,
+                reasons: int = 0) -> pd.DataFrame:
+    """
+    Puntúa un DataFrame (completo o un lote) y devuelve una copia con churn_proba y churn_pred.
+    Es el mismo cálculo para el modo normal y el modo streaming, así las salidas coinciden.
+    `pipe` es el Pipeline de sklearn o el CompiledPredictor del artefacto liviano.
+    Con `reasons` > 0 agrega los motivos de riesgo (ver reason_codes) sobre la misma matriz transformada.
+    """
     # Elimina la columna objetivo si está presente y alinea las columnas
-    X = align_columns(df.drop(columns=[CFG.target] if CFG.target in df.columns else [], errors="ignore"), base_cols)
+    with stage("align", rows=len(df)):
+        X = align_columns(df.drop(columns=[CFG.target] if CFG.target in df.columns else [], errors="ignore"), base_cols, plan)
 
     # Predice la probabilidad de churn y la clase predicha
-    proba = pipe.predict_proba(X)[:, 1]
+    Xt = transform_matrix(pipe, X)
+    proba = predict_matrix(pipe, Xt)
     out = df.copy()
     out["churn_proba"] = proba
-    out["churn_pred"] = (proba >= 0.5).astype(int)
+    out["churn_pred"] = (proba >= threshold).astype(int)
+    if reasons:
+        codes = reason_codes(pipe, Xt, reasons)
+        codes.index = out.index
+        out = pd.concat([out, codes], axis=1)
+    return out
+
+# Columnas que normalmente son numéricas en el Telco (la app las fuerza a numérico antes de puntuar)
+NUMERIC_CANDIDATES = ["SeniorCitizen", "tenure", "MonthlyCharges", "TotalCharges"]
+
+def to_numeric_safe(df: pd.DataFrame, cols: list) -> pd.DataFrame:
+    # Convierte columnas candidatas a numérico sin romper si hay strings raros
+    for col in cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+def score_proba(df_in: pd.DataFrame, pipe, base_cols: list, plan: dict = None):
+    """
+    Probabilidades de churn de un archivo subido a la app (no modifica df_in). Con el plan de
+    columnas del modelo, la conversión la hace align_columns con los tipos de train; sin plan se
+    fuerzan a número las columnas numéricas del Telco.
+    """
+    if plan is None:
+        X = to_numeric_safe(df_in[base_cols].copy(), NUMERIC_CANDIDATES)
+    else:
+        X = align_columns(df_in, base_cols, plan)
+    return predict_churn(pipe, X)
+
+def score_upload(df_in: pd.DataFrame, pipe, base_cols: list, threshold: float = 0.5, plan: dict = None) -> pd.DataFrame:
+    # Puntúa un archivo subido y devuelve una copia con churn_proba y churn_pred (ver score_proba)
+    proba = score_proba(df_in, pipe, base_cols, plan)
+    df_out = df_in.copy()
+    df_out["churn_proba"] = proba
+    df_out["churn_pred"] = (proba >= threshold).astype(int)
+    return df_out
+
+def input_columns(base_cols: list, segment: str = None) -> list:
+    # Columnas que se leen de la entrada con model_columns: las del modelo más las de CFG.infer_keep_cols
+    # (IDs), el target y el segmento del top-k. El resto de una tabla ancha no se lee ni llega a la salida
+    keep = [c.strip() for c in CFG.infer_keep_cols.split(",") if c.strip()]
+    return list(dict.fromkeys([*keep, *base_cols, CFG.target, *([segment] if segment else [])]))
+
+def iter_batches(input_path: str, chunksize: int, columns: list = None, filters: list = None):
+    """
+    Lee el archivo de entrada por lotes de `chunksize` filas, sin cargarlo entero en memoria.
+    Parquet/Feather/Arrow IPC (o carpetas particionadas) se recorren con pyarrow leyendo solo
+    `columns` y las filas que cumplen `filters`; en CSV usa el lector por chunks de pandas.
+    """
+    yield from timed_iter("read", iter_frames(input_path, chunksize, columns, filters))
+
+# Estado por proceso worker: el pipeline se carga una sola vez en cada worker (ver _init_worker)
+_WORKER_PIPE = None
+_WORKER_COLS = None
+_WORKER_PLAN = None
+_WORKER_REASONS = 0
+
+def _init_worker(paths: dict, lean: bool = False, reasons: int = 0):
+    # Carga el modelo, las columnas base y el plan una vez por proceso. XGBoost queda en 1 hilo por
+    # worker para no sobre-suscribir la CPU: el paralelismo lo ponen los procesos.
+    global _WORKER_PIPE, _WORKER_COLS, _WORKER_PLAN, _WORKER_REASONS
+    _WORKER_PIPE, _WORKER_COLS, _WORKER_PLAN = load_paths(paths, lean)
+    _WORKER_REASONS = reasons
+    if isinstance(_WORKER_PIPE, CompiledPredictor):
+        _WORKER_PIPE.set_threads(1)
+    else:
+        clf = _WORKER_PIPE.steps[-1][1]
+        if "n_jobs" in clf.get_params():
+            clf.set_params(n_jobs=1)
+
+def _score_partition(df: pd.DataFrame) -> pd.DataFrame:
+    return score_frame(_WORKER_PIPE, df, _WORKER_COLS, plan=_WORKER_PLAN, reasons=_WORKER_REASONS)
+
+def score_parallel(batches, workers: int, lean: bool = False, reasons: int = 0, paths: dict = None):
+    """
+    Puntúa las particiones en `workers` procesos y las devuelve en el orden original.
+    Se mantienen como máximo 2 particiones en vuelo por worker, así la memoria sigue acotada.
+    `paths` son las rutas de la versión a usar (por defecto la activa, ver registry.artifact_paths).
+    """
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(paths or registry.artifact_paths(), lean, reasons)
+    ) as ex:
+        pending = deque()
+        for chunk in batches:
+            pending.append(ex.submit(_score_partition, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _conform(out: pd.DataFrame, schema):
+    """
+    Convierte un lote al esquema del primer lote escrito. En CSV por chunks pandas infiere tipos
+    por lote (p. ej. TotalCharges con blancos sale como texto en un chunk y numérico en otro),
+    y el ParquetWriter exige un esquema fijo.
+    """
+    import pyarrow as pa
+
+    arrays = []
+    for field in schema:
+        col = out[field.name]
+        try:
+            arrays.append(pa.array(col, type=field.type, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+                col = pd.to_numeric(col, errors="coerce")
+                field_type = field.type if pa.types.is_floating(field.type) else pa.float64()
+                arrays.append(pa.array(col, from_pandas=True).cast(field_type, safe=False))
+            else:
+                arrays.append(pa.array(col.astype(str).where(col.notna(), None), type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def write_batches(batches, output_path: str) -> tuple:
+    """
+    Escribe los lotes puntuados uno a uno (Parquet con ParquetWriter, CSV en modo append).
+    Devuelve (filas, columnas) del total escrito.
+    """
+    n_rows, n_cols = 0, 0
+    if output_path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for out in batches:
+                table = pa.Table.from_pandas(out, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema, compression=CFG.parquet_compression)
+                elif not table.schema.equals(writer.schema):
+                    table = _conform(out, writer.schema)
+                with stage("write", rows=len(out)):
+                    writer.write_table(table, row_group_size=CFG.parquet_row_group_size or None)
+                n_rows, n_cols = n_rows + len(out), out.shape[1]
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        for out in batches:
+            with stage("write", rows=len(out)):
+                out.to_csv(output_path, mode="w" if n_rows == 0 else "a", header=n_rows == 0, index=False)
+            n_rows, n_cols = n_rows + len(out), out.shape[1]
+    return n_rows, n_cols
+
+def _topk_output(output_path: str, k: int) -> str:
+    # Ruta por defecto de la lista top-k: junto a la salida, con sufijo _top<k>
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_top{k}{ext or '.csv'}"
+
+def _drift_output(output_path: str) -> str:
+    # Ruta del reporte de drift: CFG.drift_report_path o, por defecto, junto a la salida (<salida>.drift.json),
+    # así dos corridas con salidas distintas no pisan el mismo reporte
+    if CFG.drift_report_path:
+        return CFG.drift_report_path
+    root, _ = os.path.splitext(output_path.rstrip("/\\"))
+    return f"{root}.drift.json"
+
+@instrument.run("inference")
+def main(input_path: str, output_path: str = None, chunksize: int = None, workers: int = 1, lean: bool = False,
+         topk: int = None, segment: str = None, topk_output: str = None, filters: list = None,
+         model_columns: bool = False, reasons: int = 0, drift: bool = None, version: str = None):
+    """
+    Función principal de inferencia.
+    Lee el archivo de entrada (CSV o Parquet), carga el modelo y las columnas base,
+    alinea las columnas del DataFrame, predice la probabilidad de churn y guarda el resultado.
+    Con `chunksize` trabaja en modo streaming: la memoria depende del tamaño del lote, no del archivo.
+    Con `workers` > 1 reparte los lotes entre procesos y une el resultado en el orden original
+    (con la instrumentación activa, align/preprocess/predict corren en los workers y no se miden).
+    Con `lean` usa el artefacto liviano (CFG.lean_dir) en vez del Pipeline de joblib.
+    Con `topk` guarda además en `topk_output` los K clientes de mayor riesgo (por `segment` si se
+    indica, ver src.topk); sin `output_path` solo se escribe esa lista, sin la tabla completa.
+    La salida conserva todas las columnas de la entrada; con `model_columns` solo se leen (y se devuelven)
+    las del modelo más IDs/target/segmento (input_columns). En Parquet/Feather/Arrow IPC se leen solo las
+    filas que cumplen `filters` (p. ej. [("region", "==", "norte")]).
+    Con `reasons` agrega a cada fila sus N motivos de riesgo principales (ver reason_codes).
+    Con `drift` (CFG.drift_monitor, apagado por defecto) y la referencia de train guardada, actualiza los
+    histogramas por lote y al final escribe el PSI/KS por feature y de churn_proba en <salida>.drift.json
+    (o CFG.drift_report_path si está fijado, ver src.drift).
+    Usa la versión activa del registro (o `version`, ver src.registry); sin registro, las rutas de CFG.
+    """
+    paths = registry.artifact_paths(version)
+    acc = None
+    if topk:
+        from src.topk import TopK, write_frame
+
+        if not (topk_output or output_path):
+            raise ValueError("con topk hace falta topk_output o output_path")
+        acc = TopK(topk, segment)
+        topk_output = topk_output or _topk_output(output_path, topk)
+
+    ref, monitor = None, None
+    if (CFG.drift_monitor if drift is None else drift) and os.path.exists(paths["drift_ref_path"]):
+        from src.drift import DriftSketch
+
+        ref = DriftSketch.load(paths["drift_ref_path"])
+        monitor = ref.empty_like()
+
+    def finish(batches, mode: str):
+        # Escribe los lotes puntuados (si hay salida) pasando por el acumulador top-k y el monitor de drift
+        batches = acc.tap(batches) if acc else batches
+        batches = monitor.tap(batches) if monitor else batches
+        if output_path:
+            n_rows, n_cols = write_batches(batches, output_path)
+            print(f"[OK] inferencia ({mode}) → {output_path}, shape={(n_rows, n_cols)}")
+        else:
+            for _ in batches:
+                pass
+        if acc:
+            top = acc.result()
+            write_frame(top, topk_output)
+            print(f"[OK] top {topk}{f' por {segment}' if segment else ''} → {topk_output}, filas={len(top)}")
+        if monitor:
+            report_drift()
+
+    def report_drift():
+        from src.drift import print_report, write_report
+
+        report = ref.compare(monitor)
+        path = _drift_output(output_path or topk_output)
+        write_report(report, monitor, path)
+        print_report(report)
+        print(f"[OK] drift → {path}")
+
+    # Carga el pipeline entrenado (o el artefacto liviano), la lista de columnas base y el plan
+    with stage("load_model"):
+        pipe, base_cols, plan = load_paths(paths, lean)
+    if reasons and not CFG.reason_approx and getattr(pipe, "engine", None) == "numpy":
+        # Antes de leer la entrada: el motor numpy solo tiene las contribuciones aproximadas
+        raise ValueError("--reasons con REASON_APPROX=0 (TreeSHAP exacto) necesita LEAN_ENGINE=xgboost")
+    columns = input_columns(base_cols, segment) if model_columns else None
+
+    if workers > 1:
+        chunksize = chunksize or CFG.infer_chunksize
+        finish(score_parallel(iter_batches(input_path, chunksize, columns, filters), workers, lean, reasons, paths),
+               f"workers={workers}, chunksize={chunksize}")
+        return
+
+    if chunksize:
+        # Modo streaming: lee, puntúa y escribe lote a lote manteniendo el orden de las filas
+        batches = (score_frame(pipe, chunk, base_cols, plan=plan, reasons=reasons)
+                   for chunk in iter_batches(input_path, chunksize, columns, filters))
+        finish(batches, f"streaming, chunksize={chunksize}")
+        return
+
+    # Lee el archivo de entrada (CSV, Parquet, Feather/Arrow IPC o carpeta particionada)
+    with stage("read") as st:
+        df = read_frame(input_path, columns, filters)
+        st.rows = len(df)
+    out = score_frame(pipe, df, base_cols, plan=plan, reasons=reasons)
 
     # Prints útiles para debug (puedes comentar si no los necesitas)
     print("Esperadas:", base_cols)
@@ -52,17 +421,53 @@ def main(input_path: str, output_path: str):
     print("Columnas en df:", list(df.columns))
     print("CFG.target:", CFG.target)
 
+    if acc or not output_path:
+        finish([out], "en memoria")
+        return
+
     # Guarda el resultado en el formato deseado (CSV o Parquet)
-    if output_path.endswith(".parquet"):
-        out.to_parquet(output_path, index=False)
-    else:
-        out.to_csv(output_path, index=False)
+    with stage("write", rows=len(out)):
+        if output_path.endswith(".parquet"):
+            to_parquet(out, output_path)
+        else:
+            out.to_csv(output_path, index=False)
     print(f"[OK] inferencia → {output_path}, shape={out.shape}")
+    if monitor:
+        with stage("drift", rows=len(out)):
+            monitor.update(out, out["churn_proba"])
+        report_drift()
 
 if __name__ == "__main__":
     # Si corres este archivo directamente, parsea los argumentos de entrada y salida
     ap = argparse.ArgumentParser()
-    ap.add_argument("--input", required=True, help="ruta CSV o Parquet")
-    ap.add_argument("--output", required=True, help="ruta CSV o Parquet")
+    ap.add_argument("--input", required=True, help="ruta CSV, Parquet, Feather/Arrow IPC o carpeta particionada")
+    ap.add_argument("--output", default=None, help="ruta CSV o Parquet (opcional con --topk)")
+    ap.add_argument("--chunksize", type=int, default=None,
+                    help="filas por lote; activa el modo streaming (memoria acotada)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="procesos para puntuar en paralelo (usa lotes de --chunksize o INFER_CHUNKSIZE)")
+    ap.add_argument("--instrument", action="store_true",
+                    help="mide cada etapa (wall, CPU, RSS, filas/s) y la exporta (ver src.instrument)")
+    ap.add_argument("--lean", action="store_true",
+                    help="usa el artefacto liviano (booster UBJSON + JSON, ver src.fastpath) en vez del joblib")
+    ap.add_argument("--topk", type=int, default=None, help="guarda los K clientes con mayor probabilidad")
+    ap.add_argument("--segment", default=None, help="con --topk, top K por valor de esta columna (p. ej. Contract)")
+    ap.add_argument("--topk-output", default=None, help="ruta de la lista top-k (por defecto <output>_top<K>)")
+    ap.add_argument("--filter", action="append", default=[], metavar="COL<op>VALOR",
+                    help="filtra filas al leer (Parquet/Arrow), p. ej. --filter region=norte --filter 'tenure<12'")
+    ap.add_argument("--model-columns", action="store_true",
+                    help="lee solo las columnas del modelo + INFER_KEEP_COLS, target y segmento (el resto no sale)")
+    ap.add_argument("--reasons", type=int, default=0, metavar="N",
+                    help="agrega los N motivos de riesgo principales por cliente (contribuciones de XGBoost)")
+    ap.add_argument("--version", default=None,
+                    help="versión del registro a usar (por defecto la activa, ver src.registry)")
+    ap.add_argument("--drift", action="store_true",
+                    help="monitor de drift: PSI/KS contra la referencia de train en <output>.drift.json (ver src.drift)")
     args = ap.parse_args()
-    main(args.input, args.output)
+    if not args.output and not (args.topk and args.topk_output):
+        ap.error("indica --output, o --topk con --topk-output")
+    if args.instrument:
+        CFG.instrument = True
+    main(args.input, args.output, args.chunksize, args.workers, args.lean, args.topk, args.segment, args.topk_output,
+         [parse_filter(f) for f in args.filter], args.model_columns, args.reasons, True if args.drift else None,
+         args.version)
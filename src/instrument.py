@@ -0,0 +1,187 @@
+# Instrumentación por etapa de los flujos de prep, train e inferencia.
+# Cada etapa (leer, limpiar, alinear, preprocesar, booster, escribir...) se envuelve en `stage()`, que
+# acumula wall, CPU, cuánto subió el pico de RSS y filas/s. Al terminar la corrida (`run()`) se escribe
+# una línea JSON por etapa en CFG.instrument_log y, si se configuró, un archivo de texto de Prometheus
+# (formato del textfile collector de node_exporter).
+#
+# Está apagada por defecto (INSTRUMENT=1 o --instrument para activarla): apagada, `stage()` solo
+# consulta CFG.instrument y devuelve un objeto vacío.
+
+import contextlib
+import json
+import os
+import sys
+import time
+from src.config import CFG
+from src.utils_io import ensure_parents
+
+try:
+    import resource  # no existe en Windows: ahí el delta de RSS queda en NaN
+except ImportError:
+    resource = None
+
+def rss_peak_mb() -> float:
+    # Pico de RSS del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+class Stage:
+    # Lo que ve el bloque `with stage(...) as st`: se puede fijar st.rows cuando se conoce al final
+    __slots__ = ("rows",)
+
+    def __init__(self, rows: int = None):
+        self.rows = rows
+
+# Objeto que se entrega cuando la instrumentación está apagada (asignar rows no tiene efecto)
+_NOOP = Stage()
+
+# Corrida activa: nombre, inicio y totales por etapa en orden de aparición
+_RUN = None
+
+def enabled() -> bool:
+    return CFG.instrument
+
+def _accumulate(name: str, wall: float, cpu: float, rss_delta: float, rows):
+    totals = _RUN["stages"].setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rss_delta_mb": 0.0, "rows": 0})
+    totals["calls"] += 1
+    totals["wall_s"] += wall
+    totals["cpu_s"] += cpu
+    totals["rss_delta_mb"] += rss_delta
+    totals["rows"] += rows or 0
+
+@contextlib.contextmanager
+def stage(name: str, rows: int = None):
+    """
+    Mide el bloque como la etapa `name`. Si se repite (un lote por vuelta) se suman los tiempos y las
+    filas. Fuera de una corrida activa, cada bloque se exporta solo como una corrida de una etapa.
+    """
+    if not CFG.instrument:
+        yield _NOOP
+        return
+    st = Stage(rows)
+    rss0 = rss_peak_mb()
+    t0, c0 = time.perf_counter(), time.process_time()
+    try:
+        yield st
+    finally:
+        wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+        if _RUN is None:
+            with run(name):
+                _accumulate(name, wall, cpu, rss_peak_mb() - rss0, st.rows)
+        else:
+            _accumulate(name, wall, cpu, rss_peak_mb() - rss0, st.rows)
+
+def timed_iter(name: str, iterable):
+    """
+    Recorre `iterable` midiendo cada next() como la etapa `name` (p. ej. lectura por lotes, donde el
+    trabajo ocurre al pedir el siguiente lote). Las filas son len() de cada elemento.
+    """
+    if not CFG.instrument:
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        with stage(name) as st:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            st.rows = len(item)
+        yield item
+
+@contextlib.contextmanager
+def run(name: str):
+    """
+    Delimita una corrida (p. ej. "train"). Al salir exporta los totales por etapa más una fila
+    "total" con la corrida completa. Si ya hay una corrida activa, se suma a esa. También sirve
+    como decorador: `@instrument.run("train")`.
+    """
+    global _RUN
+    if not CFG.instrument or _RUN is not None:
+        yield
+        return
+    _RUN = {"name": name, "stages": {}, "t0": time.perf_counter(), "c0": time.process_time(), "rss0": rss_peak_mb()}
+    try:
+        yield
+    finally:
+        current, _RUN = _RUN, None
+        _accumulate_total(current)
+        records = _records(current)
+        export_jsonl(records, CFG.instrument_log)
+        if CFG.instrument_prom:
+            export_prometheus(records, CFG.instrument_prom)
+        print_summary(records)
+
+def _accumulate_total(current: dict):
+    # La fila "total" es la corrida completa (incluye lo que no quedó dentro de ninguna etapa)
+    rows = max((t["rows"] for t in current["stages"].values()), default=0)
+    current["stages"]["total"] = {
+        "calls": 1,
+        "wall_s": time.perf_counter() - current["t0"],
+        "cpu_s": time.process_time() - current["c0"],
+        "rss_delta_mb": rss_peak_mb() - current["rss0"],
+        "rows": rows,
+    }
+
+def _records(current: dict) -> list:
+    ts = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return [
+        {"ts": ts, "run": current["name"], "stage": name, **t,
+         "rows_per_s": t["rows"] / t["wall_s"] if t["rows"] and t["wall_s"] > 0 else None}
+        for name, t in current["stages"].items()
+    ]
+
+def export_jsonl(records: list, path: str):
+    # Agrega las líneas al log (una por etapa), así se puede seguir el throughput entre corridas
+    ensure_parents(path)
+    with open(path, "a", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+# Métricas de Prometheus: nombre → (campo del registro, factor, ayuda)
+PROM_METRICS = {
+    "churn_stage_wall_seconds": ("wall_s", 1.0, "Tiempo de reloj de la etapa en la última corrida"),
+    "churn_stage_cpu_seconds": ("cpu_s", 1.0, "Tiempo de CPU del proceso durante la etapa"),
+    "churn_stage_rss_delta_bytes": ("rss_delta_mb", 1024**2, "Aumento del pico de RSS durante la etapa"),
+    "churn_stage_rows": ("rows", 1.0, "Filas procesadas por la etapa"),
+    "churn_stage_rows_per_second": ("rows_per_s", 1.0, "Throughput de la etapa"),
+    "churn_stage_calls": ("calls", 1.0, "Veces que se ejecutó la etapa (lotes)"),
+}
+
+def export_prometheus(records: list, path: str):
+    """
+    Escribe el archivo de texto de Prometheus con la última corrida de cada flujo: se conservan las
+    series de otros `run` que ya estaban en el archivo y se reemplazan las de esta corrida.
+    """
+    this_run = f'run="{records[0]["run"]}"'
+    samples = {m: [] for m in PROM_METRICS}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                metric = line.split("{", 1)[0]
+                if metric in samples and this_run not in line:
+                    samples[metric].append(line.rstrip("\n"))
+    for r in records:
+        for metric, (field, factor, _) in PROM_METRICS.items():
+            if r[field] is not None:
+                samples[metric].append(f'{metric}{{run="{r["run"]}",stage="{r["stage"]}"}} {r[field] * factor:.6g}')
+    lines = []
+    for metric, (_, _, help_text) in PROM_METRICS.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", *samples[metric]]
+    # Escritura atómica: el collector nunca lee un archivo a medio escribir
+    ensure_parents(path)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+def print_summary(records: list):
+    total = next(r for r in records if r["stage"] == "total")
+    print(f"[INSTRUMENT] {total['run']}: {total['wall_s']:.3f}s → {CFG.instrument_log}")
+    for r in records:
+        share = r["wall_s"] / total["wall_s"] if total["wall_s"] > 0 else 0.0
+        rps = f"{r['rows_per_s']:,.0f} filas/s" if r["rows_per_s"] else ""
+        print(f"  {r['stage']:<12} {r['wall_s']:9.3f}s ({share:6.1%}) cpu={r['cpu_s']:8.3f}s "
+              f"rss+={r['rss_delta_mb']:7.1f}MB x{r['calls']:<5} {rps}")
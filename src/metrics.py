@@ -0,0 +1,115 @@
+# Métricas por umbral calculadas en una sola pasada sobre las probabilidades de validación.
+# Se ordenan los scores una vez (descendente) y con sumas acumuladas se obtienen, para cada score
+# distinto usado como umbral, los verdaderos y falsos positivos (clientes marcados con proba >= umbral).
+# De esos conteos salen precision/recall/F1/lift/costo esperado de retención para todos los umbrales
+# a la vez, y el ROC-AUC.
+#
+# La curva (umbrales ascendentes + conteos) se guarda junto al modelo (CFG.curve_path); la app busca
+# las métricas de cualquier umbral con searchsorted (O(log n)) sin volver a llamar a sklearn.
+#
+# Costo esperado de una campaña que contacta a los marcados:
+#   marcados * costo_contacto + (no detectados + detectados no retenidos) * pérdida_por_baja
+
+import json
+import numpy as np
+from src.config import CFG
+from src.utils_io import save_json
+
+def _ratio(num, den):
+    # División elemento a elemento con 0 donde el denominador es 0 (p. ej. precision sin marcados)
+    num, den = np.asarray(num, dtype=np.float64), np.asarray(den, dtype=np.float64)
+    return np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den > 0)
+
+class ThresholdCurve:
+    """
+    Conteos por umbral de un set etiquetado. `threshold` es ascendente (scores distintos) y `tp[i]`,
+    `fp[i]` cuentan los clientes con proba >= threshold[i]. Las métricas se derivan de los conteos,
+    así los parámetros de costo se pueden cambiar sin recalcular la curva.
+    """
+
+    def __init__(self, threshold, tp, fp, n: int, positives: int):
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.tp = np.asarray(tp, dtype=np.int64)
+        self.fp = np.asarray(fp, dtype=np.int64)
+        self.n = int(n)
+        self.positives = int(positives)
+
+    @classmethod
+    def from_scores(cls, y, proba) -> "ThresholdCurve":
+        # Un sort estable + cumsum: el último índice de cada score distinto da los conteos con proba >= score
+        y, proba = np.asarray(y, dtype=np.int64), np.asarray(proba, dtype=np.float64)
+        order = np.argsort(-proba, kind="stable")
+        p, tp = proba[order], np.cumsum(y[order])
+        last = np.flatnonzero(np.r_[p[1:] != p[:-1], True]) if len(p) else np.array([], dtype=np.int64)
+        tp = tp[last]
+        fp = last + 1 - tp
+        return cls(p[last][::-1], tp[::-1], fp[::-1], len(y), int(y.sum()))
+
+    def __len__(self) -> int:
+        return len(self.threshold)
+
+    def auc(self) -> float:
+        # Área bajo la ROC por trapecios sobre los puntos (fpr, tpr) de umbral más alto a más bajo
+        negatives = self.n - self.positives
+        if not self.positives or not negatives:
+            return float("nan")
+        tpr = np.r_[0.0, self.tp[::-1] / self.positives]
+        fpr = np.r_[0.0, self.fp[::-1] / negatives]
+        return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+    def _metrics(self, tp, fp, contact_cost=None, churn_loss=None, success_rate=None) -> dict:
+        contact_cost = CFG.retention_contact_cost if contact_cost is None else contact_cost
+        churn_loss = CFG.retention_churn_loss if churn_loss is None else churn_loss
+        success_rate = CFG.retention_success_rate if success_rate is None else success_rate
+        tp, fp = np.asarray(tp, dtype=np.float64), np.asarray(fp, dtype=np.float64)
+        flagged, fn = tp + fp, self.positives - tp
+        precision = _ratio(tp, flagged)
+        return {
+            "flagged": flagged,
+            "flagged_share": _ratio(flagged, self.n),
+            "tp": tp,
+            "fp": fp,
+            "precision": precision,
+            "recall": _ratio(tp, self.positives),
+            "f1": _ratio(2 * tp, flagged + self.positives),
+            "lift": _ratio(precision, _ratio(self.positives, self.n)),
+            "expected_cost": flagged * contact_cost + (fn + tp * (1 - success_rate)) * churn_loss,
+        }
+
+    def metrics(self, **costs) -> dict:
+        # Todas las métricas para todos los umbrales (arrays alineados con self.threshold)
+        return {"threshold": self.threshold, **self._metrics(self.tp, self.fp, **costs)}
+
+    def at(self, threshold: float, **costs) -> dict:
+        # Métricas de un umbral cualquiera: el primer score >= umbral tiene los conteos de proba >= umbral
+        i = int(np.searchsorted(self.threshold, threshold, side="left"))
+        tp, fp = (self.tp[i], self.fp[i]) if i < len(self) else (0, 0)
+        return {"threshold": float(threshold), **{k: float(v) for k, v in self._metrics(tp, fp, **costs).items()}}
+
+    def best(self, metric: str = "f1", **costs) -> dict:
+        # Umbral que maximiza `metric` ("expected_cost" se minimiza)
+        values = self.metrics(**costs)[metric]
+        if not len(values):
+            return {}
+        i = int(np.argmin(values) if metric == "expected_cost" else np.argmax(values))
+        return self.at(float(self.threshold[i]), **costs)
+
+    def save(self, path: str = None):
+        path = path or CFG.curve_path
+        save_json(
+            {"n": self.n, "positives": self.positives, "auc": self.auc(), "threshold": self.threshold.tolist(),
+             "tp": self.tp.tolist(), "fp": self.fp.tolist()},
+            path,
+        )
+
+    @classmethod
+    def load(cls, path: str = None) -> "ThresholdCurve":
+        with open(path or CFG.curve_path, encoding="utf-8") as f:
+            d = json.load(f)
+        return cls(d["threshold"], d["tp"], d["fp"], d["n"], d["positives"])
+
+def summary(y, proba, threshold: float = 0.5) -> dict:
+    # ROC-AUC + métricas en `threshold` desde la misma curva (reemplaza roc_auc_score + f1_score)
+    curve = ThresholdCurve.from_scores(y, proba)
+    at = curve.at(threshold)
+    return {"auc": curve.auc(), "f1": at["f1"], "precision": at["precision"], "recall": at["recall"]}
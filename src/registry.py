@@ -0,0 +1,230 @@
+# Registro local de modelos: cada entrenamiento publica una versión inmutable y un puntero CURRENT
+# dice cuál se usa. Estructura en CFG.registry_dir:
+#   v0001/  model.joblib, columns.joblib, feature_names.joblib, metadata.json, lean/,
+#           threshold_curve.json, drift_reference.json y version.json (métricas, features, huella de datos)
+#   v0002/  ...
+#   CURRENT     nombre de la versión activa
+#
+# La versión se arma en una carpeta temporal y se renombra a vNNNN (rename atómico en el mismo disco):
+# nadie ve una versión a medias. CURRENT se reescribe con tmp + os.replace, así quien lo lee ve la
+# versión anterior o la nueva, nunca un archivo vacío. Volver atrás es solo mover el puntero (activate).
+# Cada versión es una copia completa, así que publish conserva solo las CFG.registry_keep más nuevas
+# (prune); la activa no se borra aunque sea vieja (después de un rollback).
+#
+# ModelCache lee CURRENT en cada get (un archivo de pocos bytes): si train publicó una versión nueva,
+# la siguiente llamada la carga sin reiniciar el proceso (app, inferencia, servidor y stream). Las versiones ya cargadas quedan en un LRU
+# acotado (CFG.registry_cache_size), para puntuar con dos versiones lado a lado sin recargarlas.
+#
+# Uso:
+#   python -m src.registry list
+#   python -m src.registry activate v0003
+#   python -m src.registry show v0003
+#   python -m src.registry prune --keep 5
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from src.config import CFG
+from src.utils_io import file_fingerprint, save_json
+
+# Artefactos de una versión: campo de CFG con la ruta plana que escribe train → nombre dentro de la versión
+ARTIFACTS = {
+    "model_path": "model.joblib",
+    "cols_path": "columns.joblib",
+    "feats_path": "feature_names.joblib",
+    "meta_path": "metadata.json",
+    "lean_dir": "lean",
+    "curve_path": "threshold_curve.json",
+    "drift_ref_path": "drift_reference.json",
+}
+VERSION_FILE = "version.json"
+POINTER = "CURRENT"
+# Nombre de la "versión" sin registro: las rutas planas de CFG
+LOCAL = "local"
+_VERSION_RE = re.compile(r"^v(\d+)$")
+
+def versions(registry_dir: str = None) -> list:
+    # Versiones publicadas, de la más vieja a la más nueva
+    root = Path(registry_dir or CFG.registry_dir)
+    if not root.is_dir():
+        return []
+    found = [p.name for p in root.iterdir() if p.is_dir() and _VERSION_RE.match(p.name)]
+    return sorted(found, key=lambda name: int(name[1:]))
+
+def current(registry_dir: str = None):
+    # Versión activa según CURRENT (None si no hay registro)
+    try:
+        with open(Path(registry_dir or CFG.registry_dir) / POINTER, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def active(registry_dir: str = None):
+    # Versión que se usa por defecto: la de CURRENT, o None con el registro apagado (REGISTRY=0). Así
+    # train escribe solo las rutas planas y nadie sigue puntuando con la última versión publicada
+    return current(registry_dir) if CFG.registry else None
+
+def activate(version: str, registry_dir: str = None):
+    # Cambia el puntero de forma atómica (también sirve para volver a una versión anterior)
+    root = Path(registry_dir or CFG.registry_dir)
+    if not (root / version / VERSION_FILE).exists():
+        raise ValueError(f"la versión {version} no existe en {root}")
+    tmp = root / f"{POINTER}.tmp"
+    tmp.write_text(version + "\n", encoding="utf-8")
+    os.replace(tmp, root / POINTER)
+
+def artifact_paths(version: str = None, registry_dir: str = None) -> dict:
+    """
+    Rutas de los artefactos ({campo de CFG: ruta}) de `version`, o de la versión activa si es None.
+    Sin registro (REGISTRY=0 o sin CURRENT, o con LOCAL) devuelve las rutas planas de CFG, las que
+    escribe train. Una versión explícita se resuelve igual aunque el registro esté apagado.
+    """
+    root = Path(registry_dir or CFG.registry_dir)
+    version = version or active(registry_dir)
+    if version is None or version == LOCAL:
+        return {field: getattr(CFG, field) for field in ARTIFACTS}
+    if not (root / version).is_dir():
+        raise ValueError(f"la versión {version} no existe en {root}")
+    return {field: str(root / version / name) for field, name in ARTIFACTS.items()}
+
+def version_info(version: str = None, registry_dir: str = None) -> dict:
+    version = version or current(registry_dir)
+    with open(Path(registry_dir or CFG.registry_dir) / version / VERSION_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+def publish(info: dict = None, registry_dir: str = None, make_current: bool = True) -> str:
+    """
+    Copia los artefactos planos de CFG (los que existan) a una versión nueva y, con `make_current`,
+    la activa. `info` (métricas, features...) se guarda en version.json junto con la huella de los
+    datos de train/valid. Se copian (no hard links) porque el próximo train reescribe las rutas planas.
+    Al final borra las versiones que exceden CFG.registry_keep (ver prune).
+    """
+    root = Path(registry_dir or CFG.registry_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=root))
+    try:
+        for field, name in ARTIFACTS.items():
+            src = Path(getattr(CFG, field))
+            if src.is_dir():
+                shutil.copytree(src, tmp / name)
+            elif src.exists():
+                shutil.copy2(src, tmp / name)
+        data = {}
+        for split, path in (("train", CFG.data_train_out), ("valid", CFG.data_valid_out)):
+            if Path(path).exists():
+                data[split] = file_fingerprint(path, content_hash=CFG.cache_hash_content)
+        meta = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "data": data, **(info or {})}
+        # Número siguiente; si otro proceso publicó en el medio, el rename falla y se prueba el próximo
+        published = versions(root)
+        n = int(published[-1][1:]) if published else 0
+        while True:
+            n += 1
+            version = f"v{n:04d}"
+            save_json({"version": version, **meta}, str(tmp / VERSION_FILE))
+            try:
+                os.rename(tmp, root / version)
+                break
+            except OSError:
+                if not (root / version).exists():
+                    raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if make_current:
+        activate(version, root)
+    prune(registry_dir=root)
+    return version
+
+def prune(keep: int = None, registry_dir: str = None) -> list:
+    # Borra las versiones más viejas y deja las `keep` más nuevas (CFG.registry_keep; 0 = no borra nada)
+    # más la activa. Devuelve las borradas
+    keep = CFG.registry_keep if keep is None else keep
+    if keep <= 0:
+        return []
+    root = Path(registry_dir or CFG.registry_dir)
+    active = current(root)
+    removed = []
+    for version in versions(root)[:-keep]:
+        if version == active:
+            continue
+        # Primero sale del listado con un rename atómico (nadie ve una versión a medio borrar)
+        trash = root / f".old-{version}"
+        try:
+            os.rename(root / version, trash)
+        except FileNotFoundError:
+            continue  # la borró otro proceso
+        shutil.rmtree(trash, ignore_errors=True)
+        removed.append(version)
+    return removed
+
+class ModelCache:
+    """
+    LRU de modelos cargados por versión. `loader(paths)` recibe artifact_paths(version) y devuelve lo
+    que se guarda (p. ej. (modelo, columnas base, plan)). get() sin versión sigue a CURRENT: cuando
+    el puntero cambia, la próxima llamada carga la versión nueva (hot reload, sin reiniciar).
+    Sin registro (o con REGISTRY=0), la clave es LOCAL (rutas planas de CFG, sin hot reload). Se puede compartir entre hilos (la app
+    atiende cada sesión en un hilo): la carga de una versión nueva se hace una sola vez.
+    """
+
+    def __init__(self, loader, max_entries: int = None, registry_dir: str = None):
+        self.loader = loader
+        self.max_entries = max_entries or CFG.registry_cache_size
+        self.registry_dir = registry_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: str = None) -> tuple:
+        # Devuelve (versión, objeto cargado)
+        version = version or active(self.registry_dir) or LOCAL
+        with self._lock:
+            if version in self._entries:
+                self._entries.move_to_end(version)
+                return version, self._entries[version]
+            obj = self.loader(artifact_paths(version, self.registry_dir))
+            self._entries[version] = obj
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return version, obj
+
+    def loaded(self) -> list:
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def print_versions(registry_dir: str = None):
+    active = current(registry_dir)
+    for v in versions(registry_dir):
+        info = version_info(v, registry_dir)
+        metrics = " | ".join(f"{k} {val:.4f}" for k, val in info.get("metrics", {}).items()
+                             if isinstance(val, float))
+        print(f"{'*' if v == active else ' '} {v}  {info.get('created', '')}  {info.get('model', '')}  {metrics}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["list", "activate", "show", "prune"])
+    ap.add_argument("version", nargs="?", default=None)
+    ap.add_argument("--registry", default=None, help="carpeta del registro (CFG.registry_dir)")
+    ap.add_argument("--keep", type=int, default=None, help="con prune, versiones a conservar (REGISTRY_KEEP)")
+    args = ap.parse_args()
+    if args.command == "list":
+        print_versions(args.registry)
+    elif args.command == "activate":
+        if not args.version:
+            ap.error("indica la versión a activar")
+        activate(args.version, args.registry)
+        print(f"[OK] versión activa: {args.version}")
+    elif args.command == "prune":
+        removed = prune(args.keep, args.registry)
+        print(f"[OK] {len(removed)} versiones borradas" + (f": {', '.join(removed)}" if removed else ""))
+    else:
+        print(json.dumps(version_info(args.version, args.registry), indent=2, ensure_ascii=False))
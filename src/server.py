@@ -0,0 +1,157 @@
+# Servidor de scoring local (solo librería estándar) con el modelo cargado en memoria.
+# Carga el pipeline una vez al arrancar y agrupa las peticiones concurrentes en micro-lotes
+# antes de llamar a predict_proba, así cada petición no paga el arranque en frío del CLI.
+# El modelo es la versión activa del registro (src.registry): cada lote mira el puntero CURRENT, y
+# después de un train o de `python -m src.registry activate` el siguiente lote ya usa la versión nueva.
+#
+# Uso:
+#   python -m src.server --port 8000
+#   curl -X POST localhost:8000/predict -d '{"tenure": 3, "Contract": "Month-to-month", ...}'
+
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src import registry
+from src.config import CFG
+from src.fastpath import CompiledPredictor
+
+class MicroBatcher:
+    """
+    Junta peticiones de un solo cliente en lotes de hasta `max_batch` registros, esperando como
+    mucho `max_wait_ms` desde que llega el primero. Un hilo de fondo hace el predict_proba
+    y resuelve el Future de cada petición con su probabilidad.
+    """
+
+    def __init__(self, score_fn, max_batch: int = None, max_wait_ms: float = None):
+        self.score_fn = score_fn
+        self.max_batch = max_batch or CFG.server_max_batch
+        self.max_wait = (CFG.server_max_wait_ms if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict) -> Future:
+        fut = Future()
+        self._queue.put((record, fut))
+        return fut
+
+    def _collect(self) -> list:
+        # Bloquea hasta el primer registro y luego junta hasta llenar el lote o vencer la espera
+        items = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            try:
+                proba = self.score_fn([rec for rec, _ in items])
+            except Exception:
+                # Un registro inválido hace fallar todo el lote: se puntúa cada uno por separado para que
+                # solo falle la petición que lo mandó, no las de otros clientes que compartían el lote
+                for rec, fut in items:
+                    try:
+                        fut.set_result(float(self.score_fn([rec])[0]))
+                    except Exception as e:
+                        fut.set_exception(e)
+                continue
+            for (_, fut), p in zip(items, proba):
+                fut.set_result(float(p))
+
+def make_handler(batcher: MicroBatcher, threshold: float = 0.5, version_fn=None):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 para que el cliente pueda reutilizar la conexión (keep-alive)
+        protocol_version = "HTTP/1.1"
+        # Sin Nagle: cabeceras y cuerpo salen en escrituras separadas y el delayed-ACK sumaría ~40 ms
+        disable_nagle_algorithm = True
+
+        def _send(self, code: int, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                # Con version_fn informa qué versión del modelo está sirviendo
+                self._send(200, {"status": "ok", **({"version": version_fn()} if version_fn else {})})
+            else:
+                self._send(404, {"error": "ruta no encontrada"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send(404, {"error": "ruta no encontrada"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"null")
+                records = payload if isinstance(payload, list) else [payload]
+                if not all(isinstance(r, dict) for r in records):
+                    raise ValueError("se espera un objeto JSON o una lista de objetos")
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            try:
+                # Cada registro entra al micro-batcher por separado; varios clientes comparten lote
+                futures = [batcher.submit(r) for r in records]
+                results = [
+                    {"churn_proba": p, "churn_pred": int(p >= threshold)}
+                    for p in (f.result() for f in futures)
+                ]
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            self._send(200, results if isinstance(payload, list) else results[0])
+
+        def log_message(self, format, *args):
+            # Silencia el log por petición: en latencias de milisegundos el print pesa
+            pass
+
+    return ScoringHandler
+
+def build_server(host: str = None, port: int = None, max_batch: int = None, max_wait_ms: float = None):
+    # Carga el modelo al arrancar y lo compila al camino rápido (sin pandas por petición); si train
+    # dejó el artefacto liviano se usa ese, que carga sin unpickle de sklearn. La versión sale del
+    # registro y se recarga cuando cambia CURRENT (server.models es el LRU de versiones cargadas).
+    # Solo el hilo del micro-batcher usa el predictor, así que su fila preasignada es segura.
+    models = registry.ModelCache(CompiledPredictor.from_paths)
+    models.get()
+    batcher = MicroBatcher(lambda records: models.get()[1].predict_proba(records), max_batch, max_wait_ms)
+    server = ThreadingHTTPServer(
+        (host or CFG.server_host, CFG.server_port if port is None else port),
+        make_handler(batcher, version_fn=lambda: models.get()[0]),
+    )
+    server.daemon_threads = True
+    server.models = models
+    return server
+
+def main(host: str = None, port: int = None, max_batch: int = None, max_wait_ms: float = None):
+    server = build_server(host, port, max_batch, max_wait_ms)
+    print(f"[OK] servidor de scoring en http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default=None, help="host de escucha (SERVER_HOST)")
+    ap.add_argument("--port", type=int, default=None, help="puerto de escucha (SERVER_PORT)")
+    ap.add_argument("--max-batch", type=int, default=None, help="máximo de registros por lote")
+    ap.add_argument("--max-wait-ms", type=float, default=None, help="espera máxima para llenar un lote")
+    args = ap.parse_args()
+    main(args.host, args.port, args.max_batch, args.max_wait_ms)
@@ -0,0 +1,407 @@
+# Scoring por eventos: consume registros JSON de un stream local y los puntúa en micro-lotes.
+# Fuentes: un archivo JSONL que va creciendo (como `tail -f`) o un socket TCP que recibe una línea
+# JSON por evento (sustituto local del bus de eventos). Cada evento entra a una cola asyncio acotada;
+# el consumidor arma lotes por tamaño (max_batch) o por tiempo (max_wait_ms desde el primer evento)
+# y los manda a un executor (un hilo, o procesos con --workers) que corre predict_proba.
+#
+# Backpressure: como mucho `max_inflight` lotes en el executor. Si el modelo se atrasa, el consumidor
+# deja de sacar de la cola, la cola se llena (max_queue) y las fuentes quedan bloqueadas en put():
+# se deja de leer el archivo o el socket (TCP frena al emisor). Así la espera de un evento queda
+# acotada por max_queue / throughput en vez de crecer sin límite en una ráfaga. Con la cola llena los
+# lotes salen completos sin esperar el timer.
+#
+# El modelo es la versión activa del registro (src.registry): cada lote mira CURRENT, así un train o un
+# rollback (`python -m src.registry activate`) llega al stream sin reiniciarlo.
+#
+# Salida append-only: JSONL (una línea por evento) o carpeta Parquet (part files que se rotan). Por
+# lote se registra tamaño, profundidad de la cola, espera, tiempo de scoring y latencia (CFG.stream_log).
+#
+# Errores: un evento que no es un objeto JSON se rechaza en put() (se cuenta en `rejected`). Si un lote
+# falla al puntuar (p. ej. un campo con un tipo imposible), se puntúa evento por evento y solo se
+# descartan los que fallan; cada falla queda en el log de lotes y en `failed`, y el stream sigue.
+#
+# Uso:
+#   python -m src.stream --tail data/events/eventos.jsonl --follow --sink data/scored/eventos.jsonl
+#   python -m src.stream --listen 127.0.0.1:9009 --sink data/scored/eventos --workers 2
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from src import registry
+from src.config import CFG
+from src.fastpath import CompiledPredictor
+from src.utils_io import ensure_parents
+
+# Marca de fin de stream en la cola (la fuente terminó)
+_END = object()
+# Tipos de las columnas de salida en el sink Parquet (el resto, IDs que se conservan, como texto)
+OUTPUT_TYPES = {"churn_proba": "float64", "churn_pred": "int8", "latency_ms": "float64"}
+
+def load_predictor(paths: dict = None) -> CompiledPredictor:
+    # Igual que el servidor: el artefacto liviano si existe, si no el camino rápido desde el joblib.
+    # `paths` son las rutas de una versión (por defecto la activa, ver registry.artifact_paths)
+    return CompiledPredictor.from_paths(paths or registry.artifact_paths())
+
+def _load_worker_predictor(paths: dict) -> CompiledPredictor:
+    predictor = load_predictor(paths)
+    predictor.set_threads(1)
+    return predictor
+
+# Modelos por proceso worker (executor de procesos): cada uno tiene su LRU y sigue a CURRENT
+_WORKER = None
+
+def _init_worker(registry_dir: str):
+    global _WORKER
+    _WORKER = registry.ModelCache(_load_worker_predictor, registry_dir=registry_dir)
+    _WORKER.get()
+
+def _score_worker(records: list) -> np.ndarray:
+    return _WORKER.get()[1].predict_proba(records)
+
+def _warmup_worker() -> bool:
+    # Fuerza el arranque del proceso (y la carga del modelo) antes del primer evento
+    return _WORKER is not None
+
+class JsonlSink:
+    # Una línea JSON por evento puntuado, en modo append (se puede seguir con tail -f)
+    def __init__(self, path: str):
+        ensure_parents(path)
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, rows: list):
+        self._f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows))
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+class ParquetSink:
+    """
+    Carpeta append-only de part files (part-<inicio>-<n>.parquet): se escribe un row group por lote
+    y se rota a un archivo nuevo cada `part_rows` filas. Un Parquet solo es legible al cerrarse (el
+    footer va al final), así que los archivos cerrados ya se pueden leer con utils_io.read_frame.
+    """
+
+    def __init__(self, out_dir: str, part_rows: int = None):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.part_rows = part_rows or CFG.stream_part_rows
+        self._prefix = f"part-{time.strftime('%Y%m%dT%H%M%S')}"
+        self._part, self._rows, self._writer, self._schema = 0, 0, None, None
+
+    def write(self, rows: list):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._schema is None:
+            self._schema = pa.schema([(k, pa.type_for_alias(OUTPUT_TYPES.get(k, "string"))) for k in rows[0]])
+        if self._writer is None:
+            path = self.out_dir / f"{self._prefix}-{self._part:05d}.parquet"
+            self._writer = pq.ParquetWriter(str(path), self._schema, compression=CFG.parquet_compression)
+        self._writer.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+        self._rows += len(rows)
+        if self._rows >= self.part_rows:
+            self.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer, self._rows, self._part = None, 0, self._part + 1
+
+def make_sink(path: str):
+    # .jsonl → JsonlSink; cualquier otra ruta es una carpeta Parquet
+    return JsonlSink(path) if path.endswith(".jsonl") else ParquetSink(path)
+
+class StreamScorer:
+    """
+    Cola acotada + consumidor que puntúa en micro-lotes. Las fuentes llaman `await put(record)`;
+    `run()` consume hasta que se llama `close()` y devuelve el resumen (ver stats()).
+    - score_fn(records) -> probabilidades; si es None se carga el predictor (hilo o `workers` procesos).
+    - keep: campos del evento que se copian a la salida (por defecto CFG.infer_keep_cols).
+    """
+
+    def __init__(self, sink, score_fn=None, workers: int = 1, max_batch: int = None, max_wait_ms: float = None,
+                 max_queue: int = None, max_inflight: int = None, threshold: float = 0.5, keep: list = None,
+                 log_path: str = None):
+        self.sink = sink
+        self.max_batch = max_batch or CFG.stream_max_batch
+        self.max_wait = (CFG.stream_max_wait_ms if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.workers = workers
+        self.max_inflight = max_inflight or max(CFG.stream_max_inflight, workers)
+        self.threshold = threshold
+        self.keep = keep if keep is not None else [c.strip() for c in CFG.infer_keep_cols.split(",") if c.strip()]
+        self.log_path = CFG.stream_log if log_path is None else log_path
+        self.queue = asyncio.Queue(maxsize=max_queue or CFG.stream_max_queue)
+        if score_fn is not None:
+            self._executor, self.score_fn = ThreadPoolExecutor(1), score_fn
+        elif workers > 1:
+            self._executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(CFG.registry_dir,))
+            self.score_fn = _score_worker
+        else:
+            # Un solo hilo: el predictor reutiliza su fila preasignada y no es seguro entre hilos
+            self.models = registry.ModelCache(CompiledPredictor.from_paths)
+            self.models.get()
+            self._executor = ThreadPoolExecutor(1)
+            self.score_fn = lambda records: self.models.get()[1].predict_proba(records)
+        self.batches = []
+        # Últimas latencias por evento (acotado: en un stream largo no crece sin límite)
+        self._latencies = deque(maxlen=100_000)
+        self._events, self._max_depth, self._t0, self._warm = 0, 0, None, False
+        self._rejected, self._failed = 0, 0
+
+    async def put(self, record: dict) -> bool:
+        # Solo objetos JSON, igual que el servidor: una lista o un número fallaría recién al puntuar.
+        # Bloquea si la cola está llena: es el punto donde se aplica el backpressure a la fuente
+        if not isinstance(record, dict):
+            self._rejected += 1
+            return False
+        await self.queue.put((time.perf_counter(), record))
+        self._max_depth = max(self._max_depth, self.queue.qsize())
+        return True
+
+    async def close(self):
+        await self.queue.put((time.perf_counter(), _END))
+
+    async def warmup(self):
+        # Arranca los procesos worker (cada uno carga el modelo) antes de abrir la fuente, así los
+        # primeros eventos no pagan esa carga en su latencia
+        if isinstance(self._executor, ProcessPoolExecutor) and not self._warm:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _warmup_worker) for _ in range(self.workers)))
+        self._warm = True
+
+    async def _collect(self) -> tuple:
+        # Espera el primer evento y junta hasta max_batch o hasta vencer max_wait. Lo que ya está en
+        # la cola se toma sin esperar: en una ráfaga los lotes salen llenos de inmediato
+        loop = asyncio.get_running_loop()
+        items, ended = [], False
+        first = await self.queue.get()
+        deadline = loop.time() + self.max_wait
+        pending = first
+        while True:
+            if pending[1] is _END:
+                ended = True
+                break
+            items.append(pending)
+            if len(items) >= self.max_batch:
+                break
+            try:
+                pending = self.queue.get_nowait()
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                pending = await asyncio.wait_for(self.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return items, ended
+
+    async def run(self) -> dict:
+        loop = asyncio.get_running_loop()
+        await self.warmup()
+        self._t0 = time.perf_counter()
+        slots = asyncio.Semaphore(self.max_inflight)
+        sent_q = asyncio.Queue()
+        writer = asyncio.create_task(self._write_loop(sent_q, slots))
+        try:
+            ended = False
+            while not ended:
+                items, ended = await self._collect()
+                if not items:
+                    continue
+                # Backpressure: sin lugar en el executor se espera aquí, sin sacar más eventos de la cola
+                await slots.acquire()
+                if writer.done():
+                    await writer  # un lote falló: se propaga el error
+                depth, sent = self.queue.qsize(), time.perf_counter()
+                fut = loop.run_in_executor(self._executor, self.score_fn, [r for _, r in items])
+                sent_q.put_nowait((items, fut, depth, sent))
+            sent_q.put_nowait(None)
+            await writer
+        finally:
+            writer.cancel()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self.sink.close()
+        return self.stats()
+
+    async def _write_loop(self, sent_q: asyncio.Queue, slots: asyncio.Semaphore):
+        # Escribe cada lote apenas termina, en el orden de envío (las salidas quedan en orden de llegada)
+        while (item := await sent_q.get()) is not None:
+            try:
+                await self._finish(*item)
+            except Exception as e:
+                # Un lote que falla (p. ej. al escribir el sink) no corta un consumidor que corre sin fin
+                self._failed += len(item[0])
+                self._log({"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "batch": len(item[0]), "error": repr(e)})
+            finally:
+                slots.release()
+
+    async def _score_each(self, items: list) -> tuple:
+        # Puntúa evento por evento (después de que falló el lote): devuelve los que salieron y sus scores
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, self.score_fn, [rec]) for _, rec in items), return_exceptions=True
+        )
+        ok, proba = [], []
+        for (t, rec), res in zip(items, results):
+            if isinstance(res, Exception):
+                self._failed += 1
+                self._log({"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "batch": 1, "error": repr(res),
+                           **{k: None if rec.get(k) is None else str(rec[k]) for k in self.keep}})
+            else:
+                ok.append((t, rec))
+                proba.append(res[0])
+        return ok, proba
+
+    async def _finish(self, items: list, fut, depth: int, sent: float):
+        try:
+            proba = await fut
+        except Exception:
+            # Un evento con un campo inválido hace fallar todo el lote: solo se descarta ese evento
+            items, proba = await self._score_each(items)
+            if not items:
+                return
+        done = time.perf_counter()
+        rows = []
+        for (t, rec), p in zip(items, proba):
+            rows.append({**{k: None if rec.get(k) is None else str(rec[k]) for k in self.keep},
+                         "churn_proba": float(p), "churn_pred": int(p >= self.threshold),
+                         "latency_ms": (done - t) * 1000})
+            self._latencies.append((done - t) * 1000)
+        self.sink.write(rows)
+        self._events += len(rows)
+        batch = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "batch": len(items), "queue_depth": depth,
+                 "wait_ms": (sent - items[0][0]) * 1000, "score_ms": (done - sent) * 1000,
+                 "latency_ms_max": rows[0]["latency_ms"]}
+        self.batches.append(batch)
+        self._log(batch)
+
+    def _log(self, entry: dict):
+        if self.log_path:
+            ensure_parents(self.log_path)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def stats(self) -> dict:
+        # Resumen de la corrida: eventos/s, lotes, profundidad máxima de la cola, percentiles de latencia y
+        # eventos rechazados (no son un objeto JSON) o que fallaron al puntuar
+        lat = np.asarray(self._latencies)
+        wall = time.perf_counter() - self._t0 if self._t0 else 0.0
+        return {
+            "events": self._events,
+            "batches": len(self.batches),
+            "events_per_s": self._events / wall if wall > 0 else None,
+            "mean_batch": self._events / len(self.batches) if self.batches else None,
+            "max_queue_depth": self._max_depth,
+            "rejected": self._rejected,
+            "failed": self._failed,
+            **{f"latency_ms_p{q}": float(np.percentile(lat, q)) if len(lat) else None for q in (50, 95, 99)},
+            "latency_ms_max": float(lat.max()) if len(lat) else None,
+        }
+
+async def tail_jsonl(path: str, scorer: StreamScorer, follow: bool = False, poll_s: float = 0.2):
+    """
+    Lee el JSONL desde el inicio y encola cada evento. Con `follow` sigue esperando líneas nuevas
+    (como tail -f; una línea a medio escribir se completa en la próxima lectura) hasta que se cancela.
+    """
+    bad, partial = 0, ""
+    with open(path, encoding="utf-8") as f:
+        while True:
+            line = f.readline()
+            if not line or not line.endswith("\n"):
+                partial += line
+                if not follow:
+                    line, partial = partial, ""
+                    if not line:
+                        break
+                else:
+                    await asyncio.sleep(poll_s)
+                    continue
+            line, partial = partial + line, ""
+            if not line.strip():
+                continue
+            try:
+                bad += not await scorer.put(json.loads(line))
+            except json.JSONDecodeError:
+                bad += 1
+    if bad:
+        print(f"[WARN] {bad} líneas ignoradas en {path} (JSON inválido o que no es un objeto)")
+
+async def serve_socket(scorer: StreamScorer, host: str, port: int):
+    # Servidor TCP: cada conexión manda una línea JSON por evento. Si la cola está llena no se lee
+    # más del socket, así el emisor queda frenado por TCP
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            async for line in reader:
+                if line.strip():
+                    try:
+                        await scorer.put(json.loads(line))
+                    except json.JSONDecodeError:
+                        pass
+        except asyncio.CancelledError:
+            pass  # el servidor se está cerrando: lo que ya está en la cola se puntúa igual
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+def print_stats(stats: dict, sink_path: str):
+    lat = " ".join(f"p{q}={stats[f'latency_ms_p{q}']:.1f}ms" for q in (50, 95, 99) if stats[f"latency_ms_p{q}"] is not None)
+    rate = f"{stats['events_per_s']:,.0f} eventos/s" if stats["events_per_s"] else ""
+    print(f"[OK] {stats['events']} eventos en {stats['batches']} lotes → {sink_path} | {rate} | "
+          f"cola máx={stats['max_queue_depth']} | {lat}")
+    if stats["rejected"] or stats["failed"]:
+        print(f"[WARN] {stats['rejected']} eventos rechazados, {stats['failed']} con error al puntuar (ver el log de lotes)")
+
+async def run(sink_path: str, tail: str = None, follow: bool = False, listen: str = None, **scorer_kwargs) -> dict:
+    # Arma el scorer y la fuente (archivo o socket) y corre hasta que la fuente termina o se cancela
+    scorer = StreamScorer(make_sink(sink_path), **scorer_kwargs)
+    await scorer.warmup()
+    consumer = asyncio.create_task(scorer.run())
+    try:
+        if tail:
+            await tail_jsonl(tail, scorer, follow)
+        else:
+            host, port = listen.rsplit(":", 1)
+            server = await serve_socket(scorer, host, int(port))
+            print(f"[OK] escuchando eventos en {listen}")
+            async with server:
+                await server.serve_forever()
+    finally:
+        # Fin de la fuente (o Ctrl+C): se puntúa lo que quedó en la cola, se cierra el sink y se
+        # imprime el resumen (con Ctrl+C asyncio.run no devuelve, por eso se imprime aquí)
+        await scorer.close()
+        stats = await consumer
+        print_stats(stats, sink_path)
+    return stats
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--tail", default=None, help="archivo JSONL de eventos (un objeto por línea)")
+    src.add_argument("--listen", default=None, metavar="HOST:PUERTO", help="socket TCP con una línea JSON por evento")
+    ap.add_argument("--follow", action="store_true", help="con --tail, sigue esperando eventos nuevos (Ctrl+C para cortar)")
+    ap.add_argument("--sink", required=True, help="salida: archivo .jsonl o carpeta Parquet")
+    ap.add_argument("--workers", type=int, default=1, help="procesos para predict_proba (1 = un hilo)")
+    ap.add_argument("--max-batch", type=int, default=None, help="máximo de eventos por lote (STREAM_MAX_BATCH)")
+    ap.add_argument("--max-wait-ms", type=float, default=None, help="espera máxima para llenar un lote")
+    ap.add_argument("--max-queue", type=int, default=None, help="eventos en cola antes de frenar a la fuente")
+    ap.add_argument("--max-inflight", type=int, default=None, help="lotes en el executor a la vez")
+    ap.add_argument("--threshold", type=float, default=0.5, help="umbral para churn_pred")
+    args = ap.parse_args()
+    try:
+        asyncio.run(run(
+            args.sink, tail=args.tail, follow=args.follow, listen=args.listen, workers=args.workers,
+            max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, max_queue=args.max_queue,
+            max_inflight=args.max_inflight, threshold=args.threshold,
+        ))
+    except KeyboardInterrupt:
+        pass
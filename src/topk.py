@@ -0,0 +1,97 @@
+# Selección de los K clientes con mayor probabilidad de baja (listas de campañas de retención),
+# global o por segmento (p. ej. Contract o PaymentMethod), sin ordenar la tabla puntuada completa.
+# Usa selección parcial (argpartition, O(n)) sobre el array de probabilidades y solo ordena los K
+# elegidos. En modo streaming se guardan a lo sumo K candidatos por segmento entre lotes, así la
+# memoria no depende del tamaño del archivo.
+#
+# Los empates se resuelven por orden de aparición (fila más temprana primero), igual que un sort
+# estable por probabilidad descendente: el resultado no depende del tamaño de los lotes.
+
+import numpy as np
+import pandas as pd
+
+def top_k_positions(proba: np.ndarray, k: int) -> np.ndarray:
+    """
+    Posiciones (en orden creciente) de los k valores más altos de `proba`. Entre valores iguales al
+    k-ésimo se eligen las posiciones más tempranas.
+    """
+    n = len(proba)
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if n <= k:
+        return np.arange(n)
+    kth = proba[np.argpartition(-proba, k - 1)[k - 1]]
+    above = np.flatnonzero(proba > kth)
+    ties = np.flatnonzero(proba == kth)[: k - len(above)]
+    return np.sort(np.concatenate([above, ties]))
+
+def _select(proba: np.ndarray, k: int, segments=None) -> np.ndarray:
+    # Top k global o por segmento (los NaN del segmento forman su propio grupo); posiciones crecientes
+    if segments is None:
+        return top_k_positions(proba, k)
+    codes, _ = pd.factorize(np.asarray(segments), use_na_sentinel=False)
+    groups = pd.Series(codes).groupby(codes, sort=False).indices
+    picked = [pos[top_k_positions(proba[pos], k)] for pos in groups.values()]
+    return np.sort(np.concatenate(picked)) if picked else np.array([], dtype=np.int64)
+
+class TopK:
+    """
+    Acumula el top `k` por probabilidad a lo largo de uno o varios lotes.
+
+    - `segment`: columna para el top k por grupo (None = top k global).
+    - `proba_col`: columna con la probabilidad cuando update recibe la salida de score_frame.
+
+    El resultado trae las filas elegidas con `churn_proba`, `rank` (1 = mayor riesgo dentro del
+    segmento) y `row` (posición de la fila en la entrada completa, para cruzar con el archivo).
+    """
+
+    def __init__(self, k: int, segment: str = None, proba_col: str = "churn_proba"):
+        self.k = k
+        self.segment = segment
+        self.proba_col = proba_col
+        self._best = None
+        self._offset = 0
+
+    def update(self, df: pd.DataFrame, proba=None) -> "TopK":
+        # Agrega un lote: `proba` explícito (app) o la columna proba_col del lote ya puntuado
+        proba = np.asarray(df[self.proba_col] if proba is None else proba, dtype=np.float64)
+        seg = df[self.segment].to_numpy() if self.segment else None
+        pos = _select(proba, self.k, seg)
+        cand = df.iloc[pos].copy()
+        cand[self.proba_col] = proba[pos]
+        cand["row"] = self._offset + pos
+        self._offset += len(df)
+        if self._best is None:
+            self._best = cand
+        else:
+            # Los candidatos previos son filas anteriores: al concatenar se mantiene el orden de aparición
+            best = pd.concat([self._best, cand])
+            seg = best[self.segment].to_numpy() if self.segment else None
+            self._best = best.iloc[_select(best[self.proba_col].to_numpy(), self.k, seg)]
+        return self
+
+    def tap(self, batches):
+        # Deja pasar los lotes puntuados (p. ej. hacia write_batches) acumulando el top k de cada uno
+        for out in batches:
+            self.update(out)
+            yield out
+
+    def result(self) -> pd.DataFrame:
+        if self._best is None:
+            return pd.DataFrame()
+        keys = ([self.segment] if self.segment else []) + [self.proba_col, "row"]
+        out = self._best.sort_values(keys, ascending=[True] * bool(self.segment) + [False, True], kind="stable")
+        group = out.groupby(self.segment, sort=False, dropna=False, observed=True) if self.segment else None
+        out["rank"] = (group.cumcount() if group is not None else pd.Series(np.arange(len(out)), index=out.index)) + 1
+        return out
+
+def top_k(df: pd.DataFrame, proba, k: int, segment: str = None) -> pd.DataFrame:
+    # Top k (global o por segmento) de un DataFrame y su array de probabilidades, en una pasada
+    return TopK(k, segment).update(df, proba).result()
+
+def write_frame(df: pd.DataFrame, path: str):
+    # Guarda la lista de campaña en CSV o Parquet según la extensión
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
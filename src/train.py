@@ -1,77 +1,297 @@
+import argparse
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
 import joblib
 import json
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
+import sklearn
+import xgboost
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import roc_auc_score, f1_score, classification_report
+from sklearn.metrics import classification_report
 from sklearn.linear_model import LogisticRegression
 from xgboost import XGBClassifier
+from src import features, instrument, registry
+from src import drift as drift_module
 from src.config import CFG
-from src.utils_io import to_parquet
-from src.features import build_preprocessor, get_feature_names, split_cols
+from src.drift import DriftSketch
+from src.fastpath import CompiledPredictor
+from src.instrument import stage
+from src.metrics import ThresholdCurve
+from src.utils_io import cache_enabled, cache_get, cache_key, cache_put, ensure_parents, file_fingerprint, read_frame, save_json
+from src.features import build_preprocessor, column_plan, get_feature_names, is_sparse, numeric_dtype, split_cols
 
-def load_parquet(path: str) -> pd.DataFrame:
-    # Función auxiliar para leer archivos parquet
-    return pd.read_parquet(path)
+def load_parquet(path: str, columns: list = None) -> pd.DataFrame:
+    # Función auxiliar para leer archivos parquet (o carpetas de parts) con la capa Arrow de utils_io
+    return read_frame(path, columns)
 
-def main():
-    # Carga los datasets de entrenamiento y validación ya procesados
-    train_df = load_parquet(CFG.data_train_out)
-    valid_df = load_parquet(CFG.data_valid_out)
+def split_xy(df: pd.DataFrame):
+    # Separa features y target (como arrays de numpy para el target)
+    return df.drop(columns=[CFG.target]), df[CFG.target].values
 
-    # Separa las columnas en categóricas y numéricas usando función utilitaria
+def drift_reference(num_cols: list, cat_cols: list, scores, *frames: pd.DataFrame,
+                    features: DriftSketch = None) -> DriftSketch:
+    # Referencia del monitor de drift: features de train.parquet (más `frames`, p. ej. una partición
+    # incremental) y los scores de validación. Con `features` (la referencia de features guardada en la
+    # caché de matrices) no se vuelve a leer train.parquet; si no, solo se leen las columnas del modelo
+    if features is not None and not frames:
+        return features.with_scores(scores)
+    cols = num_cols + cat_cols
+    df = load_parquet(CFG.data_train_out, cols)
+    if frames:
+        df = pd.concat([df, *(f[cols] for f in frames)], ignore_index=True)
+    return DriftSketch.reference(df, num_cols, cat_cols, scores)
+
+def save_artifacts(pipe: Pipeline, X_train: pd.DataFrame, cat_cols: list, num_cols: list, extra_meta: dict = None,
+                   curve: ThresholdCurve = None, drift: DriftSketch = None):
+    # Persistencia: guarda el pipeline entrenado, las columnas base, los nombres de las features y metadatos
+    # (y la curva de métricas por umbral de validación y la referencia de drift, si se pasan)
+    pre_fit = pipe.named_steps["pre"]
+    model = pipe.named_steps["clf"]
+    feat_names = get_feature_names(pre_fit, cat_cols, num_cols)
+    ensure_parents(CFG.model_path)
+    joblib.dump(pipe, CFG.model_path)
+    # columns.joblib guarda las columnas base (antes de OneHot), que es lo que lee inference.align_columns
+    joblib.dump(X_train.columns.tolist(), CFG.cols_path)
+    joblib.dump(feat_names, CFG.feats_path)
+    num_dtype, plan = numeric_dtype(X_train, num_cols), column_plan(X_train, num_cols)
+    # Metadatos: con qué modo se construyó el preprocesador, para quien cargue el modelo después,
+    # y el plan de columnas (dtype por columna base) que usa inference.align_columns
+    save_json(
+        {"sparse_onehot": is_sparse(pre_fit), "n_features": len(feat_names), "model": type(model).__name__,
+         "num_dtype": num_dtype, "column_plan": plan, **(extra_meta or {})},
+        CFG.meta_path,
+    )
+    # Artefacto liviano (solo XGBoost). Si no se escribe, se borra uno anterior para que no quede
+    # un booster viejo junto a un joblib nuevo
+    if CFG.lean_artifact and hasattr(model, "get_booster"):
+        CompiledPredictor.from_pipeline(pipe, num_dtype=num_dtype, column_plan=plan).save_lean(CFG.lean_dir)
+    elif Path(CFG.lean_dir).exists():
+        shutil.rmtree(CFG.lean_dir)
+    # Igual con la curva: una curva de otro modelo mostraría métricas equivocadas en la app
+    if curve is not None:
+        curve.save(CFG.curve_path)
+    elif Path(CFG.curve_path).exists():
+        Path(CFG.curve_path).unlink()
+    if drift is not None:
+        drift.save(CFG.drift_ref_path)
+    elif Path(CFG.drift_ref_path).exists():
+        Path(CFG.drift_ref_path).unlink()
+    # Versión inmutable en el registro (copia de lo anterior + métricas y huella de los datos) y CURRENT
+    if CFG.registry:
+        metrics = {}
+        if curve is not None:
+            metrics = {"auc": curve.auc(), "f1": curve.at(0.5)["f1"],
+                       "best_f1_threshold": curve.best("f1")["threshold"],
+                       "min_cost_threshold": curve.best("expected_cost")["threshold"]}
+        version = registry.publish({"model": type(model).__name__, "metrics": metrics,
+                                    "features": X_train.columns.tolist(), "n_features": len(feat_names),
+                                    **(extra_meta or {})})
+        print(f"[OK] versión {version} publicada en {CFG.registry_dir} (activa)")
+    return feat_names
+
+def build_matrices() -> dict:
+    # Lee train/valid, ajusta el preprocesador en train y transforma ambos splits
+    with stage("read") as st:
+        train_df = load_parquet(CFG.data_train_out)
+        valid_df = load_parquet(CFG.data_valid_out)
+        st.rows = len(train_df) + len(valid_df)
     cat_cols, num_cols = split_cols(train_df, CFG.target)
-    # Construye el preprocesador (escalado + one-hot)
-    pre = build_preprocessor(cat_cols, num_cols)
+    X_train, y_train = split_xy(train_df)
+    X_valid, y_valid = split_xy(valid_df)
+    with stage("preprocess", rows=st.rows):
+        pre = build_preprocessor(cat_cols, num_cols, sparse=CFG.sparse_onehot).fit(X_train)
+        Xt_train, Xt_valid = pre.transform(X_train), pre.transform(X_valid)
+    with stage("drift_features", rows=len(X_train)):
+        drift_features = DriftSketch.reference(X_train, num_cols, cat_cols)
+    return {
+        "pre": pre,
+        # Frame de 0 filas con las columnas y dtypes de entrada (para columns.joblib y metadatos)
+        "head": X_train.iloc[:0],
+        "cat_cols": cat_cols,
+        "num_cols": num_cols,
+        "X_train": Xt_train,
+        "y_train": np.asarray(y_train),
+        "X_valid": Xt_valid,
+        "y_valid": np.asarray(y_valid),
+        # Histogramas de las features crudas de train (referencia de drift sin scores)
+        "drift": drift_features,
+    }
+
+def matrix_cache_key() -> str:
+    # Huella de los parquet procesados + modo del preprocesador + código de features + versiones de libs
+    return cache_key(
+        file_fingerprint(CFG.data_train_out, content_hash=CFG.cache_hash_content),
+        file_fingerprint(CFG.data_valid_out, content_hash=CFG.cache_hash_content),
+        {"target": CFG.target, "sparse_onehot": CFG.sparse_onehot, "drift_bins": CFG.drift_bins},
+        hashlib.sha256(Path(features.__file__).read_bytes()).hexdigest(),
+        hashlib.sha256(Path(drift_module.__file__).read_bytes()).hexdigest(),
+        sklearn.__version__,
+        xgboost.__version__,
+    )
+
+def _save_matrix(X, path: Path):
+    # Denso: un .npy. CSR: sus tres arrays por separado, así al cargar también se pueden mapear a memoria
+    if sp.issparse(X):
+        X = X.tocsr()
+        for part in ("data", "indices", "indptr"):
+            np.save(path.with_name(f"{path.name}.{part}.npy"), getattr(X, part))
+        np.save(path.with_name(f"{path.name}.shape.npy"), np.asarray(X.shape))
+    else:
+        np.save(path.with_name(f"{path.name}.npy"), np.ascontiguousarray(X))
+
+def _load_matrix(path: Path):
+    dense = path.with_name(f"{path.name}.npy")
+    if dense.exists():
+        return np.load(dense, mmap_mode="r")
+    parts = [np.load(path.with_name(f"{path.name}.{p}.npy"), mmap_mode="r") for p in ("data", "indices", "indptr")]
+    shape = tuple(np.load(path.with_name(f"{path.name}.shape.npy")))
+    return sp.csr_matrix(tuple(parts), shape=shape, copy=False)
+
+def save_matrices(m: dict, out_dir: Path):
+    # Guarda el preprocesador ajustado, los arrays transformados, las DMatrix binarias de XGBoost y la
+    # referencia de drift de las features
+    out_dir.mkdir(parents=True, exist_ok=True)
+    joblib.dump({k: m[k] for k in ("pre", "head", "cat_cols", "num_cols")}, out_dir / "pre.joblib")
+    m["drift"].save(str(out_dir / "drift.json"))
+    for split in ("train", "valid"):
+        _save_matrix(m[f"X_{split}"], out_dir / f"X_{split}")
+        np.save(out_dir / f"y_{split}.npy", m[f"y_{split}"])
+        xgboost.DMatrix(m[f"X_{split}"], label=m[f"y_{split}"]).save_binary(str(out_dir / f"{split}.dmatrix"))
+
+def load_matrices(entry_dir: Path) -> dict:
+    # Carga una entrada de la caché: arrays mapeados a memoria (no se copian a RAM hasta usarlos)
+    m = joblib.load(entry_dir / "pre.joblib")
+    for split in ("train", "valid"):
+        m[f"X_{split}"] = _load_matrix(entry_dir / f"X_{split}")
+        m[f"y_{split}"] = np.load(entry_dir / f"y_{split}.npy", mmap_mode="r")
+        m[f"dmatrix_{split}"] = str(entry_dir / f"{split}.dmatrix")
+    m["drift"] = DriftSketch.load(str(entry_dir / "drift.json"))
+    return m
+
+def load_or_build_matrices() -> tuple:
+    """
+    Devuelve (matrices, hit). En un hit no se leen los parquet ni se re-ajusta el ColumnTransformer:
+    todo sale de CFG.matrix_cache_dir/<clave>. En un miss se construyen, se guardan y se cargan de ahí.
+    """
+    key = matrix_cache_key()
+    entry = cache_get(CFG.matrix_cache_dir, key)
+    if entry is not None:
+        with stage("cache_load"):
+            return load_matrices(entry), True
+    m = build_matrices()
+    ensure_parents(str(Path(CFG.matrix_cache_dir) / key))
+    with stage("cache_save"), tempfile.TemporaryDirectory(dir=CFG.matrix_cache_dir) as tmp:
+        save_matrices(m, Path(tmp) / "m")
+        files = {p.name: str(p) for p in (Path(tmp) / "m").iterdir()}
+        entry = cache_put(CFG.matrix_cache_dir, key, files, {"train": CFG.data_train_out}, CFG.cache_max_entries,
+                          move=True)
+    return load_matrices(entry), False
+
+def fit_xgb_dmatrix(model: XGBClassifier, dmatrix_path: str) -> XGBClassifier:
+    # Entrena con la API nativa sobre la DMatrix binaria cacheada (sin reconstruirla desde arrays)
+    # y devuelve el booster envuelto en un XGBClassifier, que es lo que guarda el Pipeline
+    params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+    booster = xgboost.train(params, xgboost.DMatrix(dmatrix_path), num_boost_round=model.n_estimators)
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return model
+
+def default_model(**overrides) -> XGBClassifier:
+    # XGBoost con los hiperparámetros de train (también lo usa la validación cruzada de src.cv)
+    params = dict(n_estimators=300, max_depth=6, learning_rate=0.05, subsample=0.9, colsample_bytree=0.9,
+                  random_state=CFG.seed, eval_metric="logloss")
+    return XGBClassifier(**{**params, **overrides})
+
+@instrument.run("train")
+def main(use_cache: bool = None):
+    # Con la caché de matrices (CFG.matrix_cache) el preprocesador ajustado y los splits transformados
+    # se reusan entre corridas mientras no cambien los parquet ni el código de features
+    use_cache = cache_enabled(CFG.matrix_cache if use_cache is None else use_cache)
+    if use_cache:
+        m, hit = load_or_build_matrices()
+        print(f"[CACHE] matrices transformadas {'reutilizadas' if hit else 'guardadas'} en {CFG.matrix_cache_dir}")
+    else:
+        # Carga los datasets de entrenamiento y validación ya procesados, separa las columnas en
+        # categóricas y numéricas, y ajusta el preprocesador (escalado + one-hot, denso o disperso)
+        m = build_matrices()
+    pre, cat_cols, num_cols = m["pre"], m["cat_cols"], m["num_cols"]
 
     # Define dos modelos: uno simple (logreg) y uno potente (XGBoost)
     logreg = LogisticRegression(max_iter=200, n_jobs=None)
-    xgb = XGBClassifier(
-        n_estimators=300,
-        max_depth=6,
-        learning_rate=0.05,
-        subsample=0.9,
-        colsample_bytree=0.9,
-        random_state=CFG.seed,
-        eval_metric="logloss",
-    )
+    xgb = default_model()
 
     # Selecciona el modelo a usar (aquí XGBoost, pero puedes cambiar a logreg si quieres algo rápido)
     model = xgb
 
+    # Entrena sobre la matriz ya transformada (en caché, XGBoost usa directo la DMatrix binaria)
+    with stage("fit", rows=len(m["y_train"])):
+        if use_cache and isinstance(model, XGBClassifier):
+            fit_xgb_dmatrix(model, m["dmatrix_train"])
+        else:
+            model.fit(m["X_train"], m["y_train"])
+
     # Crea el pipeline completo: preprocesamiento + modelo
     pipe = Pipeline([
         ("pre", pre),
         ("clf", model),
     ])
 
-    # Separa features y target para entrenamiento y validación
-    X_train = train_df.drop(columns=[CFG.target])
-    y_train = train_df[CFG.target].values
-    X_valid = valid_df.drop(columns=[CFG.target])
-    y_valid = valid_df[CFG.target].values
-
-    # Entrena el pipeline completo
-    pipe.fit(X_train, y_train)
     # Predice probabilidades y clases sobre el set de validación
-    preds_proba = pipe.predict_proba(X_valid)[:,1]
-    preds = (preds_proba >= 0.5).astype(int)
+    y_valid = m["y_valid"]
+    with stage("evaluate", rows=len(y_valid)):
+        preds_proba = model.predict_proba(m["X_valid"])[:,1]
+        preds = (preds_proba >= 0.5).astype(int)
+
+        # Métricas para todos los umbrales en una pasada (un sort + sumas acumuladas): ROC-AUC, F1 en 0.5
+        # y los umbrales sugeridos salen de la misma curva, que se guarda para la app
+        curve = ThresholdCurve.from_scores(y_valid, preds_proba)
+        auc, at_05 = curve.auc(), curve.at(0.5)
+        best_f1, min_cost = curve.best("f1"), curve.best("expected_cost")
 
-    # Calcula métricas principales: ROC-AUC y F1
-    auc = roc_auc_score(y_valid, preds_proba)
-    f1 = f1_score(y_valid, preds)
+    # Referencia para el monitor de drift de la inferencia (histogramas de train + scores de validación)
+    with stage("drift_reference"):
+        drift = drift_reference(num_cols, cat_cols, preds_proba, features=m["drift"])
 
     # Imprime métricas y reporte de clasificación
-    print(f"ROC-AUC: {auc:.4f} | F1: {f1:.4f}")
+    print(f"ROC-AUC: {auc:.4f} | F1: {at_05['f1']:.4f}")
     print(classification_report(y_valid, preds, digits=4))
+    print(f"Umbral con mejor F1: {best_f1['threshold']:.3f} (F1 {best_f1['f1']:.4f}) | "
+          f"menor costo esperado: {min_cost['threshold']:.3f} ({min_cost['expected_cost']:,.0f})")
 
-    # Persistencia: guarda el pipeline entrenado y los nombres de las features
-    pre_fit = pipe.named_steps["pre"]
-    feat_names = get_feature_names(pre_fit, cat_cols, num_cols)
-    joblib.dump(pipe, CFG.model_path)
-    joblib.dump(feat_names, CFG.cols_path)
+    # Persistencia: guarda el pipeline entrenado, los nombres de las features, la curva por umbral y la
+    # referencia de drift
+    with stage("save"):
+        feat_names = save_artifacts(pipe, m["head"], cat_cols, num_cols, curve=curve, drift=drift)
     print(f"[OK] modelo guardado en {CFG.model_path} | {len(feat_names)} features")
 
 if __name__ == "__main__":
     # Si corres este archivo directamente, ejecuta el flujo de entrenamiento
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tune", action="store_true",
+                    help="búsqueda de hiperparámetros (successive halving + early stopping, ver src.tune)")
+    ap.add_argument("--incremental", default=None, metavar="PARQUET",
+                    help="sigue el boosting del modelo guardado solo con esta partición nueva (ver src.incremental)")
+    ap.add_argument("--cv", action="store_true",
+                    help="validación cruzada estratificada en paralelo (media/desvío por fold, ver src.cv)")
+    ap.add_argument("--folds", type=int, default=None, help="con --cv, cantidad de folds (CV_FOLDS)")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="no usa la caché de matrices transformadas (re-ajusta el preprocesador)")
+    ap.add_argument("--instrument", action="store_true",
+                    help="mide cada etapa (wall, CPU, RSS, filas/s) y la exporta (ver src.instrument)")
+    args = ap.parse_args()
+    if args.instrument:
+        CFG.instrument = True
+    if args.tune:
+        from src.tune import main as tune_main
+        tune_main(use_cache=False if args.no_cache else None)
+    elif args.cv:
+        from src.cv import main as cv_main
+        cv_main(args.folds, use_cache=False if args.no_cache else None)
+    elif args.incremental:
+        from src.incremental import main as incremental_main
+        incremental_main(args.incremental)
+    else:
+        main(use_cache=False if args.no_cache else None)
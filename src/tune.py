@@ -0,0 +1,181 @@
+# Búsqueda de hiperparámetros para XGBoost (y la logreg de referencia) con successive halving.
+# El ColumnTransformer se ajusta una sola vez: cada candidato entrena sobre la matriz ya transformada,
+# que se envía una vez a cada proceso worker. Los XGBoost usan early stopping sobre validación,
+# así ningún candidato gasta rondas cuando el logloss ya no mejora.
+# El ganador se elige por ROC-AUC en un holdout apartado de train (CFG.tune_holdout), no en validación:
+# elegir en el mismo split que cortó el boosting daría métricas optimistas. La curva de umbrales y
+# auc_valid del modelo guardado salen de validación (solo fijó el early stopping del ganador).
+#
+# Uso: python -m src.train --tune   (o python -m src.tune)
+
+import json
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import log_loss
+from sklearn.pipeline import Pipeline
+from xgboost import XGBClassifier
+from src.config import CFG
+from src.metrics import ThresholdCurve
+from src.train import build_matrices, drift_reference, load_or_build_matrices, save_artifacts
+from src.utils_io import cache_enabled, ensure_parents
+
+def sample_candidates(n: int, seed: int) -> list:
+    # Muestrea n configuraciones: ~1/6 logreg (solo C) y el resto XGBoost, en escalas log donde corresponde
+    rng = np.random.default_rng(seed)
+    n_logreg = max(1, n // 6)
+    candidates = []
+    for i in range(n):
+        if i < n_logreg:
+            candidates.append({"kind": "logreg", "C": float(10 ** rng.uniform(-2, 1))})
+        else:
+            candidates.append({
+                "kind": "xgb",
+                "max_depth": int(rng.integers(3, 9)),
+                "learning_rate": float(10 ** rng.uniform(-2, -0.5)),
+                "subsample": float(rng.uniform(0.6, 1.0)),
+                "colsample_bytree": float(rng.uniform(0.5, 1.0)),
+                "min_child_weight": float(10 ** rng.uniform(0, 1)),
+                "reg_lambda": float(10 ** rng.uniform(-1, 1)),
+            })
+    return candidates
+
+def build_model(params: dict, budget: int):
+    # Instancia el modelo del candidato. El presupuesto es nº de árboles (XGBoost) o de iteraciones (logreg)
+    hp = {k: v for k, v in params.items() if k != "kind"}
+    if params["kind"] == "logreg":
+        return LogisticRegression(max_iter=budget, **hp)
+    return XGBClassifier(
+        n_estimators=budget,
+        early_stopping_rounds=CFG.early_stopping_rounds,
+        eval_metric="logloss",
+        random_state=CFG.seed,
+        n_jobs=1,  # el paralelismo lo ponen los procesos
+        **hp,
+    )
+
+# Matrices transformadas del proceso worker (se reciben una vez en el initializer)
+_DATA = None
+
+def _init_worker(data):
+    global _DATA
+    _DATA = data
+
+def fit_candidate(params: dict, budget: int, data=None) -> dict:
+    # Entrena un candidato sobre la matriz ya transformada (early stopping en validación) y lo evalúa
+    # en el holdout de selección
+    X_tr, y_tr, X_va, y_va, X_sel, y_sel = data if data is not None else _DATA
+    start = time.perf_counter()
+    model = build_model(params, budget)
+    if params["kind"] == "xgb":
+        model.fit(X_tr, y_tr, eval_set=[(X_va, y_va)], verbose=False)
+        rounds = model.best_iteration + 1
+    else:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", ConvergenceWarning)
+            model.fit(X_tr, y_tr)
+        rounds = int(model.n_iter_[0])
+    proba = model.predict_proba(X_sel)[:, 1]
+    curve = ThresholdCurve.from_scores(y_sel, proba)
+    return {
+        "auc": curve.auc(),
+        "f1": curve.at(0.5)["f1"],
+        "logloss": log_loss(y_sel, proba),
+        "rounds": rounds,
+        "wall_s": time.perf_counter() - start,
+        "model": model,
+    }
+
+def successive_halving(candidates: list, data, workers: int):
+    """
+    Ronda 0: todos los candidatos con el presupuesto mínimo. En cada ronda sigue el mejor 1/eta
+    (por ROC-AUC del holdout de selección) con eta veces más presupuesto, hasta el máximo o un solo
+    candidato. `data` es (X_train, y_train, X_valid, y_valid, X_sel, y_sel), ver selection_split.
+    Devuelve (tabla de resultados por trial, mejor trial con su modelo entrenado).
+    """
+    rows, best = [], None
+    alive, budget, rung = list(range(len(candidates))), CFG.tune_min_budget, 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as ex:
+        while alive:
+            futures = {i: ex.submit(fit_candidate, candidates[i], budget) for i in alive}
+            results = {i: f.result() for i, f in futures.items()}
+            for i, res in results.items():
+                rows.append({
+                    "trial": i, "rung": rung, "budget": budget, "kind": candidates[i]["kind"],
+                    "params": json.dumps({k: v for k, v in candidates[i].items() if k != "kind"}),
+                    **{k: v for k, v in res.items() if k != "model"},
+                })
+                if best is None or res["auc"] > best["auc"]:
+                    best = {"trial": i, "params": candidates[i], **res}
+            if budget >= CFG.tune_max_budget or len(alive) == 1:
+                break
+            alive = sorted(alive, key=lambda i: -results[i]["auc"])[: max(1, len(alive) // CFG.tune_eta)]
+            budget = min(budget * CFG.tune_eta, CFG.tune_max_budget)
+            rung += 1
+    return pd.DataFrame(rows), best
+
+def selection_split(X, y, holdout: float = None, seed: int = None) -> tuple:
+    # Separa de train (estratificado) el holdout donde se comparan los candidatos: (X_fit, y_fit, X_sel, y_sel)
+    from sklearn.model_selection import train_test_split
+
+    fit_idx, sel_idx = train_test_split(
+        np.arange(len(y)), test_size=CFG.tune_holdout if holdout is None else holdout, stratify=y,
+        random_state=CFG.seed if seed is None else seed,
+    )
+    return X[fit_idx], y[fit_idx], X[sel_idx], y[sel_idx]
+
+def main(use_cache: bool = None):
+    start = time.perf_counter()
+    # El preprocesador se ajusta una sola vez (o sale de la caché de matrices de src.train);
+    # todos los candidatos comparten la matriz transformada
+    use_cache = cache_enabled(CFG.matrix_cache if use_cache is None else use_cache)
+    m = load_or_build_matrices()[0] if use_cache else build_matrices()
+    pre, cat_cols, num_cols = m["pre"], m["cat_cols"], m["num_cols"]
+    X_tr, y_tr, X_va, y_va = (
+        x if sp.issparse(x) else np.asarray(x) for x in (m["X_train"], m["y_train"], m["X_valid"], m["y_valid"])
+    )
+    X_fit, y_fit, X_sel, y_sel = selection_split(X_tr, y_tr)
+    data = (X_fit, y_fit, X_va, y_va, X_sel, y_sel)
+
+    candidates = sample_candidates(CFG.tune_trials, CFG.seed)
+    results, best = successive_halving(candidates, data, CFG.tune_workers)
+
+    ensure_parents(CFG.tune_results_path)
+    results.to_csv(CFG.tune_results_path, index=False)
+
+    # El mejor modelo ya está entrenado: se arma el pipeline con el preprocesador ajustado
+    model = best["model"]
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=None)
+    # Sin early_stopping_rounds: un fit posterior sin eval_set (p. ej. un reentrenamiento) fallaría
+    if "early_stopping_rounds" in model.get_params():
+        model.set_params(early_stopping_rounds=None)
+    pipe = Pipeline([("pre", pre), ("clf", model)])
+    params = {k: v for k, v in best["params"].items() if k != "kind"}
+    proba = model.predict_proba(X_va)[:, 1]
+    curve = ThresholdCurve.from_scores(y_va, proba)
+    feat_names = save_artifacts(
+        pipe, m["head"], cat_cols, num_cols,
+        extra_meta={"tuned": True, "params": params, "rounds": best["rounds"], "auc_select": best["auc"],
+                    "auc_valid": curve.auc(),
+                    "metrics_note": "auc_select: holdout de train donde se eligió el ganador; auc_valid y la "
+                                    "curva: validación, que también fijó el early stopping del ganador"},
+        curve=curve, drift=drift_reference(num_cols, cat_cols, proba, features=m["drift"]),
+    )
+    print(results.drop(columns="params").sort_values("auc", ascending=False).head(10).to_string(index=False))
+    print(
+        f"Mejor: trial {best['trial']} ({best['params']['kind']}) ROC-AUC selección: {best['auc']:.4f} | "
+        f"F1 selección: {best['f1']:.4f} | ROC-AUC validación: {curve.auc():.4f} | rondas: {best['rounds']} | {params}"
+    )
+    print(
+        f"[OK] {len(results)} entrenamientos en {time.perf_counter() - start:.1f}s → {CFG.tune_results_path} | "
+        f"modelo guardado en {CFG.model_path} | {len(feat_names)} features"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
+import hashlib
 import json
-import pandas as pd
+import os
+import shutil
+import time
 from pathlib import Path
+from src.config import CFG
 
 def ensure_parents(path: str):
     # Crea los directorios padres necesarios para la ruta dada, si no existen.
@@ -12,11 +16,227 @@ def save_json(obj, path: str):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(obj, f, indent=2, ensure_ascii=False)
 
-def read_csv(path: str) -> pd.DataFrame:
+# Formatos que se leen con pyarrow (por extensión); una carpeta es un dataset Parquet particionado
+ARROW_FORMATS = {".parquet": "parquet", ".pq": "parquet", ".feather": "feather", ".arrow": "ipc", ".ipc": "ipc"}
+# Operadores aceptados en los filtros escritos como texto (parse_filter), de más largo a más corto
+FILTER_OPS = ("==", "!=", ">=", "<=", ">", "<", "=")
+
+def arrow_format(path: str):
+    # "parquet" / "feather" / "ipc" si el archivo (o la carpeta particionada) se lee con Arrow, None si es CSV
+    p = Path(path)
+    if p.is_dir():
+        files = [f for f in p.rglob("*") if f.is_file() and not f.name.startswith((".", "_"))]
+        return next((ARROW_FORMATS[f.suffix] for f in files if f.suffix in ARROW_FORMATS), "parquet")
+    return ARROW_FORMATS.get(p.suffix.lower())
+
+def parse_filter(text: str) -> tuple:
+    """
+    Convierte "columna<op>valor" (p. ej. "region=norte", "fecha>=2024-06-01", "tenure<12") en la tupla
+    (columna, op, valor) de los filtros de pyarrow. El valor pasa a int o float si se puede.
+    """
+    for op in FILTER_OPS:
+        if op in text:
+            col, value = (x.strip() for x in text.split(op, 1))
+            for cast in (int, float):
+                try:
+                    value = cast(value)
+                    break
+                except ValueError:
+                    pass
+            return col, "==" if op == "=" else op, value
+    raise ValueError(f"filtro inválido: {text!r} (usa columna<op>valor con op en {FILTER_OPS})")
+
+def open_dataset(path: str, partitioning: str = "hive"):
+    """
+    Abre un archivo o una carpeta (Parquet/Feather/Arrow IPC) como dataset de pyarrow, sin leer datos.
+    Con CFG.io_memory_map los archivos se mapean a memoria: las páginas se leen del page cache en vez
+    de copiarse a buffers propios, y Feather/IPC sin compresión quedan zero-copy. Las carpetas con
+    subcarpetas "columna=valor" (p. ej. fecha=2024-06-01/region=norte) agregan esas columnas.
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    fmt = arrow_format(path)
+    if fmt is None:
+        raise ValueError(f"{path} no es Parquet/Feather/Arrow IPC")
+    filesystem = fs.LocalFileSystem(use_mmap=CFG.io_memory_map)
+    return ds.dataset(path, format="ipc" if fmt == "feather" else fmt, filesystem=filesystem,
+                      partitioning=partitioning)
+
+def _scan_args(dataset, columns, filters) -> dict:
+    # Proyección (las columnas pedidas que existen, en el orden del archivo como usecols en CSV; las
+    # faltantes las agrega align_columns) y
+    # filtros: lista de tuplas estilo pandas, se empujan al lector (row groups y particiones que no
+    # cumplen ni se leen)
+    import pyarrow.parquet as pq
+
+    args = {}
+    if columns is not None:
+        wanted = set(columns)
+        args["columns"] = [c for c in dataset.schema.names if c in wanted]
+    if filters:
+        args["filter"] = pq.filters_to_expression(filters)
+    return args
+
+def _csv_args(columns, filters, kwargs) -> dict:
+    # En CSV la proyección es usecols (el parser salta las demás columnas); los filtros no aplican
+    if filters:
+        raise ValueError("los filtros solo se aplican a Parquet/Feather/Arrow IPC")
+    if columns is not None:
+        wanted = set(columns)
+        kwargs["usecols"] = lambda c: c in wanted
+    return kwargs
+
+def read_frame(path: str, columns: list = None, filters: list = None, **csv_kwargs):
+    """
+    Lee un archivo o dataset particionado a pandas leyendo solo `columns` y las filas que cumplen
+    `filters` (p. ej. [("Contract", "==", "Month-to-month")]). Las `category` guardadas desde pandas
+    vuelven como `category`. Un CSV se lee con read_csv (con usecols si hay columnas; sin filtros).
+    """
+    if arrow_format(path) is None:
+        return read_csv(path, **_csv_args(columns, filters, csv_kwargs))
+    dataset = open_dataset(path)
+    table = dataset.to_table(**_scan_args(dataset, columns, filters))
+    # self_destruct libera cada columna de Arrow a medida que pasa a pandas (sin tener las dos copias)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def iter_frames(path: str, batch_size: int, columns: list = None, filters: list = None, **csv_kwargs):
+    """
+    Lee por lotes de a lo sumo `batch_size` filas (los lotes no cruzan row groups ni archivos), en
+    el orden del archivo, con la misma proyección y filtros que read_frame.
+    """
+    if arrow_format(path) is None:
+        yield from read_csv(path, chunksize=batch_size, **_csv_args(columns, filters, csv_kwargs))
+        return
+    dataset = open_dataset(path)
+    for batch in dataset.to_batches(batch_size=batch_size, **_scan_args(dataset, columns, filters)):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def dataset_columns(path: str) -> list:
+    # Columnas de un archivo/dataset sin leer datos (solo el esquema); en CSV, la fila de encabezado
+    if arrow_format(path) is None:
+        return list(read_csv(path, nrows=0).columns)
+    return open_dataset(path).schema.names
+
+def read_csv(path: str, **kwargs):
     # Lee un archivo CSV y lo devuelve como un DataFrame de pandas.
-    return pd.read_csv(path)
+    # Los kwargs (dtype, usecols, na_values, ...) pasan directo a pd.read_csv.
+    # pandas se importa al usarse: los helpers de caché y JSON no lo necesitan
+    import pandas as pd
 
-def to_parquet(df: pd.DataFrame, path: str):
+    return pd.read_csv(path, **kwargs)
+
+def to_parquet(df, path: str, compression: str = None, row_group_size: int = None, partition_cols: list = None,
+               **kwargs):
     # Guarda un DataFrame de pandas en formato Parquet en la ruta especificada.
+    # Compresión y filas por row group salen de CFG si no se pasan (row groups chicos = filtros más
+    # selectivos al leer; grandes = mejor compresión). Con partition_cols escribe una carpeta
+    # columna=valor/ por partición (p. ej. fecha/región), que read_frame lee y filtra por carpeta.
+    # Los kwargs pasan al writer de pyarrow (use_dictionary, ...).
     ensure_parents(path)  # Asegura que la carpeta exista antes de guardar
-    df.to_parquet(path, index=False)
+    kwargs["compression"] = compression or CFG.parquet_compression
+    row_group_size = row_group_size or CFG.parquet_row_group_size
+    if row_group_size:
+        kwargs["row_group_size"] = row_group_size
+    if partition_cols:
+        kwargs["partition_cols"] = partition_cols
+    df.to_parquet(path, index=False, **kwargs)
+
+def file_fingerprint(path: str, content_hash: bool = False) -> dict:
+    # Huella barata de un archivo (o carpeta de parts): tamaño y mtime; opcionalmente sha256 del contenido.
+    # Sin content_hash basta con un stat, así un cache hit no requiere leer el archivo.
+    p = Path(path)
+    files = sorted(f for f in p.rglob("*") if f.is_file()) if p.is_dir() else [p]
+    fp = {
+        "path": str(p),
+        "size": sum(f.stat().st_size for f in files),
+        "mtime_ns": max((f.stat().st_mtime_ns for f in files), default=0),
+        "n_files": len(files),
+    }
+    if content_hash:
+        h = hashlib.sha256()
+        for f in files:
+            h.update(str(f.relative_to(p) if p.is_dir() else f.name).encode("utf-8"))
+            with open(f, "rb") as fh:
+                for block in iter(lambda: fh.read(1 << 20), b""):
+                    h.update(block)
+        fp["sha256"] = h.hexdigest()
+    return fp
+
+def cache_key(*parts) -> str:
+    # Clave de caché: hash estable (JSON ordenado) de todo lo que influye en el resultado
+    payload = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:20]
+
+def _copy_path(src, dst):
+    # Copia un archivo o una carpeta (datasets particionados) reemplazando lo que haya en dst
+    src, dst = Path(src), Path(dst)
+    if dst.is_dir():
+        shutil.rmtree(dst)
+    elif dst.exists():
+        dst.unlink()
+    ensure_parents(str(dst))
+    if src.is_dir():
+        shutil.copytree(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+def _load_manifest(cache_dir: str) -> dict:
+    path = Path(cache_dir) / "manifest.json"
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(manifest: dict, cache_dir: str):
+    # Escritura atómica (tmp + replace) para no dejar un manifest a medias si se corta el proceso
+    path = Path(cache_dir) / "manifest.json"
+    tmp = path.with_suffix(".json.tmp")
+    save_json(manifest, str(tmp))
+    os.replace(tmp, path)
+
+def cache_get(cache_dir: str, key: str):
+    # Devuelve la carpeta de la entrada si existe (y marca el uso para el desalojo LRU), o None
+    manifest = _load_manifest(cache_dir)
+    entry_dir = Path(cache_dir) / key
+    if key not in manifest or not entry_dir.is_dir():
+        return None
+    manifest[key]["last_used"] = time.time()
+    _save_manifest(manifest, cache_dir)
+    return entry_dir
+
+def cache_enabled(flag: bool) -> bool:
+    # Con CACHE_MAX_ENTRIES <= 0 la caché está apagada aunque el flag diga que sí
+    return bool(flag) and CFG.cache_max_entries > 0
+
+def cache_put(cache_dir: str, key: str, files: dict, meta: dict, max_entries: int, move: bool = False) -> Path:
+    """
+    Guarda una entrada: `files` es {nombre: ruta} (archivos o carpetas) que se copian a cache_dir/key/
+    (o se mueven con move=True, para artefactos temporales grandes que no hace falta duplicar).
+    Registra la entrada en manifest.json con `meta` y desaloja las menos usadas si hay más de max_entries;
+    la que se acaba de guardar nunca se desaloja. Con max_entries <= 0 no guarda nada y devuelve None.
+    """
+    if max_entries <= 0:
+        return None
+    entry_dir = Path(cache_dir) / key
+    for name, src in files.items():
+        if move:
+            ensure_parents(str(entry_dir / name))
+            shutil.move(str(src), str(entry_dir / name))
+        else:
+            _copy_path(src, entry_dir / name)
+    manifest = _load_manifest(cache_dir)
+    now = time.time()
+    manifest[key] = {"created": now, "last_used": now, "files": sorted(files), **meta}
+    others = sorted((k for k in manifest if k != key), key=lambda k: manifest[k]["last_used"])
+    for old in others[: max(len(manifest) - max_entries, 0)]:
+        shutil.rmtree(Path(cache_dir) / old, ignore_errors=True)
+        del manifest[old]
+    _save_manifest(manifest, cache_dir)
+    return entry_dir
+
+def cache_restore(entry_dir, files: dict):
+    # Copia los archivos de una entrada de caché a sus rutas de destino ({nombre: ruta destino})
+    for name, dst in files.items():
+        _copy_path(Path(entry_dir) / name, dst)
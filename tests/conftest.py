@@ -0,0 +1,46 @@
+import joblib
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+from xgboost import XGBClassifier
+from src.config import CFG
+from src.data_prep import basic_clean
+from src.features import build_preprocessor, column_plan, numeric_dtype, split_cols
+from src.utils_io import save_json
+
+@pytest.fixture(scope="session")
+def telco_df():
+    # Muestra pequeña del Telco ya limpia, suficiente para entrenar un modelo de prueba
+    df = pd.read_csv("data/raw/telco_churn.csv", nrows=1500)
+    return basic_clean(df, target="Churn")
+
+@pytest.fixture(scope="session")
+def model_dir(tmp_path_factory, telco_df):
+    # Entrena un pipeline chico (pre + XGBoost) y lo guarda igual que src.train
+    out = tmp_path_factory.mktemp("models")
+    cat_cols, num_cols = split_cols(telco_df, "Churn")
+    X = telco_df.drop(columns=["Churn"])
+    pipe = Pipeline([
+        ("pre", build_preprocessor(cat_cols, num_cols)),
+        ("clf", XGBClassifier(n_estimators=20, max_depth=3, random_state=42)),
+    ])
+    pipe.fit(X, telco_df["Churn"].values)
+    joblib.dump(pipe, out / "model.joblib")
+    joblib.dump(X.columns.tolist(), out / "columns.joblib")
+    save_json(
+        {"sparse_onehot": False, "num_dtype": numeric_dtype(X, num_cols), "column_plan": column_plan(X, num_cols)},
+        str(out / "metadata.json"),
+    )
+    return out
+
+@pytest.fixture
+def trained_cfg(model_dir, monkeypatch):
+    # Apunta la configuración global a los artefactos de prueba
+    monkeypatch.setattr(CFG, "model_path", str(model_dir / "model.joblib"))
+    monkeypatch.setattr(CFG, "cols_path", str(model_dir / "columns.joblib"))
+    monkeypatch.setattr(CFG, "meta_path", str(model_dir / "metadata.json"))
+    monkeypatch.setattr(CFG, "lean_dir", str(model_dir / "lean"))  # sin artefacto liviano: se usa el joblib
+    monkeypatch.setattr(CFG, "curve_path", str(model_dir / "threshold_curve.json"))
+    monkeypatch.setattr(CFG, "drift_ref_path", str(model_dir / "drift_reference.json"))  # sin referencia
+    monkeypatch.setattr(CFG, "registry_dir", str(model_dir / "registry"))  # sin registro: rutas planas
+    return CFG
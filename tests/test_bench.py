@@ -0,0 +1,19 @@
+from src.bench import compare, run, synth_telco
+from src.data_prep import load_raw
+
+def test_synth_telco_schema():
+    df = synth_telco(2000, seed=1)
+    assert len(df) == 2000
+    # Mismas columnas y tipos compactos que el crudo leído con load_raw
+    assert df.dtypes.to_dict() == load_raw("data/raw/telco_churn.csv").dtypes.to_dict()
+
+def test_run_and_compare_flags_regression():
+    report = run([500], ["prep", "features", "infer", "app"], ref_rows=1000)
+    assert [r["stage"] for r in report["results"]] == ["prep", "features", "infer", "app"]
+    assert all(r["wall_s"] > 0 and r["rows"] == 500 for r in report["results"])
+
+    # La misma corrida como base no marca nada; con la base al doble de rápida, sí
+    assert not any(r["regression"] for r in compare(report, report))
+    faster = {"results": [{**r, "wall_s": r["wall_s"] / 2} for r in report["results"]]}
+    flagged = [r for r in compare(report, faster) if r["regression"]]
+    assert {r["metric"] for r in flagged} == {"wall_s"} and len(flagged) == 4
@@ -0,0 +1,32 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import StandardScaler
+from src.config import CFG
+from src.cv import main, scale_fold
+from src.features import build_preprocessor, split_cols
+
+def test_scale_fold_matches_scaler_fit_on_fold(telco_df):
+    # Re-escalar la matriz ya transformada con las estadísticas del fold = StandardScaler ajustado en el fold
+    cat_cols, num_cols = split_cols(telco_df, "Churn")
+    X = telco_df.drop(columns=["Churn"])
+    tr, te = np.arange(0, 1000), np.arange(1000, len(X))
+    expected = StandardScaler().fit(X.iloc[tr][num_cols]).transform(X.iloc[te][num_cols])
+    for sparse in (False, True):
+        Xt = build_preprocessor(cat_cols, num_cols, sparse=sparse).fit_transform(X)
+        _, X_te = scale_fold(Xt[tr], Xt[te], len(num_cols))
+        assert sp.issparse(X_te) == sparse
+        dense = X_te.toarray() if sparse else X_te
+        np.testing.assert_allclose(dense[:, :len(num_cols)], expected, rtol=1e-4, atol=1e-4)
+        np.testing.assert_array_equal(dense[:, len(num_cols):], (Xt.toarray() if sparse else Xt)[te, len(num_cols):])
+
+def test_cv_parallel_folds(telco_df, tmp_path, monkeypatch):
+    telco_df.to_parquet(tmp_path / "train.parquet", index=False)
+    telco_df.iloc[:200].to_parquet(tmp_path / "valid.parquet", index=False)
+    monkeypatch.setattr(CFG, "data_train_out", str(tmp_path / "train.parquet"))
+    monkeypatch.setattr(CFG, "data_valid_out", str(tmp_path / "valid.parquet"))
+    monkeypatch.setattr(CFG, "cv_results_path", str(tmp_path / "cv.csv"))
+    out = main(folds=3, workers=2, params={"n_estimators": 20, "max_depth": 3}, use_cache=False)
+    folds = out[out["fold"].isin([0, 1, 2])]
+    assert len(folds) == 3 and folds["n_test"].sum() == len(telco_df)
+    assert (folds["auc"] > 0.6).all() and (folds["wall_s"] > 0).all()
+    assert set(out["fold"]) >= {"mean", "std"} and (tmp_path / "cv.csv").exists()
@@ -1,4 +1,5 @@
 import pandas as pd
+import pytest
 from src.data_prep import basic_clean, normalize_target
 
 def test_normalize_target():
@@ -23,3 +24,88 @@ def test_basic_clean_telco():
     assert cl["TotalCharges"].isna().sum() == 0  # imputado con mediana
     # Verifica que la columna objetivo está normalizada a 0/1
     assert set(cl["Churn"].unique()) <= {0,1}
+
+def test_basic_clean_categorical():
+    # Con columnas `category` (como las deja load_raw) la limpieza opera sobre las categorías
+    df = pd.DataFrame({
+        "Contract": pd.Series([" Month-to-month", "Month-to-month", "One year"], dtype="category"),
+        "TotalCharges": pd.Series([10.0, None, 30.0], dtype="float32"),
+        "Churn": pd.Series(["Yes", "No", None], dtype="category"),
+    })
+    cl = basic_clean(df, target="Churn")
+    # Las dos variantes de "Month-to-month" quedan unidas en una sola categoría
+    assert list(cl["Contract"].cat.categories) == ["Month-to-month", "One year"]
+    assert cl["TotalCharges"].dtype == "float32" and cl["TotalCharges"].isna().sum() == 0
+    assert cl["Churn"].tolist() == [1, 0, 0]
+
+def test_main_stream_matches_in_memory(tmp_path, monkeypatch):
+    # La prep por chunks debe conservar todas las filas, separar ~test_size y ser determinística
+    from src.config import CFG
+    from src.data_prep import load_raw, main_stream
+
+    monkeypatch.setattr(CFG, "data_train_out", str(tmp_path / "train.parquet"))
+    monkeypatch.setattr(CFG, "data_valid_out", str(tmp_path / "valid.parquet"))
+    main_stream(chunksize=1000, exact_median=True)
+    train = pd.read_parquet(tmp_path / "train.parquet")
+    valid = pd.read_parquet(tmp_path / "valid.parquet")
+    full = basic_clean(load_raw(CFG.data_raw), CFG.target)
+
+    assert len(train) + len(valid) == len(full)
+    assert abs(len(valid) / len(full) - CFG.test_size) < 0.02
+    assert abs(valid[CFG.target].mean() - full[CFG.target].mean()) < 0.03
+    # Con mediana exacta la imputación coincide con la del modo en memoria
+    both = pd.concat([train, valid])
+    assert both["TotalCharges"].isna().sum() == 0
+    assert abs(both["TotalCharges"].sum() - full["TotalCharges"].sum()) / full["TotalCharges"].sum() < 1e-6
+
+    main_stream(chunksize=700, exact_median=True)
+    pd.testing.assert_frame_equal(valid.reset_index(drop=True),
+                                  pd.read_parquet(tmp_path / "valid.parquet").reset_index(drop=True))
+
+def test_run_reuses_cache(tmp_path, monkeypatch):
+    # Segunda corrida con el mismo crudo y config: no se rehace la prep, se copian los parquet guardados
+    import src.data_prep as dp
+    from src.config import CFG
+
+    monkeypatch.setattr(CFG, "data_train_out", str(tmp_path / "train.parquet"))
+    monkeypatch.setattr(CFG, "data_valid_out", str(tmp_path / "valid.parquet"))
+    monkeypatch.setattr(CFG, "prep_cache_dir", str(tmp_path / "cache"))
+    dp.run(use_cache=True)
+    first = pd.read_parquet(tmp_path / "train.parquet")
+    (tmp_path / "train.parquet").unlink()
+
+    def fail():
+        raise AssertionError("no debería rehacer la prep")
+    monkeypatch.setattr(dp, "main", fail)
+    dp.run(use_cache=True)
+    pd.testing.assert_frame_equal(first, pd.read_parquet(tmp_path / "train.parquet"))
+
+    # Cambiar un campo de la config cambia la clave: es un miss y se rehace la prep
+    monkeypatch.setattr(CFG, "seed", CFG.seed + 1)
+    with pytest.raises(AssertionError, match="no debería rehacer"):
+        dp.run(use_cache=True)
+
+def test_main_stream_split_is_stratified_per_class(tmp_path, monkeypatch):
+    # Entrada chica y desbalanceada: cada clase deja exactamente round(test_size · n) filas en validación,
+    # con cualquier tamaño de chunk
+    import numpy as np
+    from src.config import CFG
+    from src.data_prep import main_stream
+
+    raw = pd.read_csv(CFG.data_raw)
+    churn = raw["Churn"].astype(str).str.strip().str.lower().isin(["yes", "1", "true"])
+    small = pd.concat([raw[churn].head(23), raw[~churn].head(180)]).sample(frac=1, random_state=0)
+    small.to_csv(tmp_path / "small.csv", index=False)
+    monkeypatch.setattr(CFG, "data_raw", str(tmp_path / "small.csv"))
+    monkeypatch.setattr(CFG, "data_train_out", str(tmp_path / "train.parquet"))
+    monkeypatch.setattr(CFG, "data_valid_out", str(tmp_path / "valid.parquet"))
+    main_stream(chunksize=37)
+    train = pd.read_parquet(tmp_path / "train.parquet")
+    valid = pd.read_parquet(tmp_path / "valid.parquet")
+    n = pd.concat([train, valid])[CFG.target].value_counts()
+    expected = np.floor(n * CFG.test_size + 0.5).astype(int)
+    pd.testing.assert_series_equal(valid[CFG.target].value_counts().reindex(n.index), expected, check_names=False)
+
+    main_stream(chunksize=200)
+    pd.testing.assert_frame_equal(valid.reset_index(drop=True),
+                                  pd.read_parquet(tmp_path / "valid.parquet").reset_index(drop=True))
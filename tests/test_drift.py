@@ -0,0 +1,45 @@
+import numpy as np
+from src.drift import DriftSketch
+from src.features import split_cols
+
+def test_sketch_psi_ks_by_batches(telco_df, tmp_path):
+    # Lotes o todo junto dan los mismos conteos; misma población ≈ sin drift, población corrida = alerta
+    cat_cols, num_cols = split_cols(telco_df, "Churn")
+    train, new = telco_df.iloc[:1000], telco_df.iloc[1000:].copy()
+    scores = np.linspace(0, 1, len(train))
+    ref = DriftSketch.reference(train, num_cols, cat_cols, scores, bins=10)
+    ref.save(str(tmp_path / "ref.json"))
+    ref = DriftSketch.load(str(tmp_path / "ref.json"))
+    assert ref.rows == len(train) and ref.numeric["tenure"]["counts"].sum() + ref.numeric["tenure"]["missing"] == 1000
+
+    new_scores = scores[: len(new)]
+    whole = ref.empty_like().update(new, new_scores)
+    chunked = ref.empty_like()
+    for start in range(0, len(new), 128):
+        chunked.update(new.iloc[start:start + 128], new_scores[start:start + 128])
+    assert whole.to_dict() == chunked.to_dict()
+    report = ref.compare(whole).set_index("feature")
+    assert report.loc["tenure", "psi"] < 0.1 and report.loc["Contract", "status"] == "ok"
+
+    new["tenure"] = new["tenure"] + 40
+    new["Contract"] = "Otro"
+    drifted = ref.compare(ref.empty_like().update(new, new_scores ** 4)).set_index("feature")
+    assert drifted.loc["tenure", "status"] == "alert" and drifted.loc["tenure", "ks"] > 0.5
+    assert drifted.loc["Contract", "unseen"] == 1.0 and drifted.loc["Contract", "status"] == "alert"
+    assert drifted.loc["churn_proba", "psi"] > 0.25
+
+def test_inference_drift_report_is_opt_in(trained_cfg, telco_df, tmp_path, monkeypatch):
+    # Por defecto la inferencia no toca el monitor; con drift=True el reporte queda junto a la salida
+    import json
+    from src.inference import main
+
+    cat_cols, num_cols = ["Contract"], ["tenure", "MonthlyCharges"]
+    monkeypatch.setattr(trained_cfg, "drift_ref_path", str(tmp_path / "drift_reference.json"))
+    DriftSketch.reference(telco_df, num_cols, cat_cols).save()
+    src = tmp_path / "input.parquet"
+    telco_df.drop(columns=["Churn"]).to_parquet(src, index=False)
+    main(str(src), str(tmp_path / "plain.parquet"))
+    main(str(src), str(tmp_path / "monitored.parquet"), chunksize=500, drift=True)
+    assert not (tmp_path / "plain.drift.json").exists()
+    with open(tmp_path / "monitored.drift.json", encoding="utf-8") as f:
+        assert json.load(f)["rows"] == len(telco_df)
@@ -0,0 +1,61 @@
+import joblib
+import numpy as np
+from src.fastpath import CompiledPredictor
+from src.inference import align_columns
+
+def test_compiled_predictor_matches_pipeline(trained_cfg, telco_df):
+    # Dicts, tuplas y un registro suelto deben dar lo mismo que pipe.predict_proba
+    pipe = joblib.load(trained_cfg.model_path)
+    X = telco_df.drop(columns=["Churn"]).head(50).copy()
+    X.loc[X.index[0], "Contract"] = "Plan desconocido"  # categoría no vista → se ignora
+    expected = pipe.predict_proba(align_columns(X, joblib.load(trained_cfg.cols_path)))[:, 1]
+
+    cp = CompiledPredictor.from_pipeline(pipe)
+    np.testing.assert_allclose(cp.predict_proba(X.to_dict(orient="records")), expected, atol=1e-6)
+    tuples = list(X[cp.base_cols].itertuples(index=False, name=None))
+    np.testing.assert_allclose(cp.predict_proba(tuples), expected, atol=1e-6)
+    np.testing.assert_allclose(cp.predict_proba(X.iloc[0].to_dict()), expected[:1], atol=1e-6)
+
+def test_compiled_predictor_float32_inputs(telco_df):
+    # Con numéricas compactas (float32, como las deja la prep) el redondeo debe ser el mismo que sklearn
+    from sklearn.pipeline import Pipeline
+    from xgboost import XGBClassifier
+    from src.data_prep import compact_dtypes
+    from src.features import build_preprocessor, numeric_dtype, split_cols
+
+    df = compact_dtypes(telco_df.copy())
+    cat_cols, num_cols = split_cols(df, "Churn")
+    X, y = df.drop(columns=["Churn"]), df["Churn"].values
+    pipe = Pipeline([
+        ("pre", build_preprocessor(cat_cols, num_cols)),
+        ("clf", XGBClassifier(n_estimators=30, max_depth=4)),
+    ]).fit(X, y)
+    assert numeric_dtype(X, num_cols) == "float32"
+
+    cp = CompiledPredictor.from_pipeline(pipe, num_dtype=numeric_dtype(X, num_cols))
+    np.testing.assert_allclose(cp.predict_proba(X.to_dict(orient="records")), pipe.predict_proba(X)[:, 1], atol=1e-6)
+
+def test_lean_artifact_matches_pipeline(trained_cfg, telco_df, tmp_path):
+    # Booster UBJSON + JSON de parámetros: mismas probabilidades que el Pipeline de joblib
+    import pandas as pd
+    from src.inference import load_column_plan, score_frame
+
+    cp = CompiledPredictor.load(trained_cfg.model_path, trained_cfg.meta_path)
+    cp.save_lean(str(tmp_path / "lean"))
+    lean = CompiledPredictor.load_lean(str(tmp_path / "lean"))
+    assert lean.clf is None and lean.column_plan == load_column_plan(trained_cfg.meta_path)
+
+    raw = pd.read_csv("data/raw/telco_churn.csv", nrows=500)
+    base_cols = joblib.load(trained_cfg.cols_path)
+    expected = score_frame(joblib.load(trained_cfg.model_path), raw, base_cols, plan=lean.column_plan)
+    got = score_frame(lean, raw, lean.base_cols, plan=lean.column_plan)
+    np.testing.assert_allclose(got["churn_proba"], expected["churn_proba"], atol=1e-6)
+
+def test_inference_imports_without_sklearn():
+    # Importar inferencia / camino rápido no debe cargar sklearn (se importa solo donde se usa)
+    import subprocess
+    import sys
+
+    code = "import sys, src.inference, src.server; print('sklearn' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
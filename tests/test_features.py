@@ -0,0 +1,30 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.pipeline import Pipeline
+from xgboost import XGBClassifier
+from src.fastpath import CompiledPredictor
+from src.features import build_preprocessor, is_sparse, split_cols
+
+def test_sparse_preprocessor_end_to_end(telco_df, tmp_path):
+    # En modo disperso el preprocesador entrega CSR, el modelo la consume y el camino rápido coincide
+    cat_cols, num_cols = split_cols(telco_df, "Churn")
+    X, y = telco_df.drop(columns=["Churn"]), telco_df["Churn"].values
+    pipe = Pipeline([
+        ("pre", build_preprocessor(cat_cols, num_cols, sparse=True)),
+        ("clf", XGBClassifier(n_estimators=10, max_depth=3)),
+    ]).fit(X, y)
+    pre = pipe.named_steps["pre"]
+    assert is_sparse(pre)
+    assert sp.issparse(pre.transform(X)) and pre.transform(X).format == "csr"
+
+    cp = CompiledPredictor.from_pipeline(pipe)
+    expected = pipe.predict_proba(X.head(100))[:, 1]
+    np.testing.assert_allclose(cp.predict_proba(X.head(100).to_dict(orient="records")), expected, atol=1e-6)
+    # El camino rápido arma la CSR directo (los mismos valores almacenados que el preprocesador)
+    Xt = cp.transform(X.head(100))
+    assert sp.issparse(Xt) and Xt.nnz == pre.transform(X.head(100)).nnz
+    np.testing.assert_allclose(cp.predict_proba(X.iloc[0].to_dict()), expected[:1], atol=1e-6)
+    # Motor numpy: matriz densa con NaN en las celdas no almacenadas
+    cp.save_lean(str(tmp_path / "lean"))
+    lean = CompiledPredictor.load_lean(str(tmp_path / "lean"), engine="numpy")
+    np.testing.assert_allclose(lean.predict_proba(X.head(100).to_dict(orient="records")), expected, atol=1e-6)
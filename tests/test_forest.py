@@ -0,0 +1,89 @@
+import joblib
+import numpy as np
+import pandas as pd
+from src.fastpath import CompiledPredictor
+from src.forest import ArrayForest
+from src.inference import score_frame
+
+def test_forest_matches_booster(trained_cfg, telco_df, tmp_path):
+    # Los arrays reproducen el margen del booster, también con faltantes (rama por defecto de cada nodo)
+    cp = CompiledPredictor.load(trained_cfg.model_path, trained_cfg.meta_path)
+    X = cp.transform(telco_df.drop(columns=["Churn"]).head(300))
+    X[np.random.default_rng(0).random(X.shape) < 0.2] = np.nan
+    forest = ArrayForest.from_booster(cp._booster, cp._iteration_range)
+    expected = cp._booster.inplace_predict(X, iteration_range=cp._iteration_range)
+    np.testing.assert_allclose(forest.predict_proba(X), expected, atol=1e-6)
+    # Bloques más chicos que la matriz y vuelta por disco: mismo resultado
+    np.testing.assert_allclose(forest.margin(X, block_rows=7), forest.margin(X), atol=1e-9)
+    forest.save(str(tmp_path / "forest.npz"))
+    np.testing.assert_array_equal(ArrayForest.load(str(tmp_path / "forest.npz")).margin(X), forest.margin(X))
+
+def test_lean_numpy_engine_matches_pipeline(trained_cfg, tmp_path):
+    # Artefacto liviano con el motor numpy: sin booster, mismas probabilidades que el Pipeline de joblib
+    cp = CompiledPredictor.load(trained_cfg.model_path, trained_cfg.meta_path)
+    cp.save_lean(str(tmp_path / "lean"))
+    lean = CompiledPredictor.load_lean(str(tmp_path / "lean"), engine="numpy")
+    assert lean._booster is None and lean.clf is None
+    lean.set_threads(1)
+
+    raw = pd.read_csv("data/raw/telco_churn.csv", nrows=500)
+    base_cols = joblib.load(trained_cfg.cols_path)
+    expected = score_frame(joblib.load(trained_cfg.model_path), raw, base_cols, plan=lean.column_plan)
+    got = score_frame(lean, raw, lean.base_cols, plan=lean.column_plan)
+    np.testing.assert_allclose(got["churn_proba"], expected["churn_proba"], atol=1e-6)
+
+def test_numpy_engine_runs_without_xgboost(trained_cfg, tmp_path):
+    # En el host de scoring: cargar y puntuar con el motor numpy no importa xgboost ni sklearn
+    import subprocess
+    import sys
+
+    CompiledPredictor.load(trained_cfg.model_path, trained_cfg.meta_path).save_lean(str(tmp_path / "lean"))
+    code = (
+        "import sys; from src.fastpath import CompiledPredictor\n"
+        "cp = CompiledPredictor.load_lean(sys.argv[1], engine='numpy')\n"
+        "p = cp.predict_proba({'tenure': 3, 'Contract': 'Month-to-month', 'MonthlyCharges': 80.0})\n"
+        "print(0 <= p[0] <= 1, 'xgboost' in sys.modules, 'sklearn' in sys.modules)"
+    )
+    out = subprocess.run([sys.executable, "-c", code, str(tmp_path / "lean")], capture_output=True, text=True,
+                         check=True)
+    assert out.stdout.split() == ["True", "False", "False"]
+
+def test_numpy_engine_reason_codes(trained_cfg, telco_df, tmp_path, monkeypatch):
+    # inference --lean --reasons con el motor numpy: Saabas desde los arrays, igual que el booster
+    import pytest
+    from src.inference import main
+
+    lean_dir = str(tmp_path / "lean")
+    CompiledPredictor.load(trained_cfg.model_path, trained_cfg.meta_path).save_lean(lean_dir)
+    monkeypatch.setattr(trained_cfg, "lean_dir", lean_dir)
+    src = tmp_path / "input.parquet"
+    telco_df.drop(columns=["Churn"]).head(400).to_parquet(src, index=False)
+    monkeypatch.setattr(trained_cfg, "lean_engine", "xgboost")
+    main(str(src), str(tmp_path / "native.parquet"), lean=True, reasons=3)
+    monkeypatch.setattr(trained_cfg, "lean_engine", "numpy")
+    main(str(src), str(tmp_path / "numpy.parquet"), lean=True, reasons=3)
+    native, got = pd.read_parquet(tmp_path / "native.parquet"), pd.read_parquet(tmp_path / "numpy.parquet")
+    for col in native.filter(like="reason_").columns:
+        if col.endswith("_contrib"):
+            np.testing.assert_allclose(got[col], native[col], atol=1e-4)
+    np.testing.assert_allclose(got["churn_proba"], native["churn_proba"], atol=1e-6)
+    # TreeSHAP exacto no existe en el motor numpy: se rechaza antes de leer la entrada
+    monkeypatch.setattr(trained_cfg, "reason_approx", False)
+    with pytest.raises(ValueError, match="LEAN_ENGINE"):
+        main(str(src), str(tmp_path / "exact.parquet"), lean=True, reasons=3)
+    assert not (tmp_path / "exact.parquet").exists()
+
+def test_deep_trees_skip_numpy_engine(trained_cfg, tmp_path, monkeypatch):
+    # Árboles más profundos que MAX_DEPTH: el artefacto se guarda igual (booster), sin forest.npz
+    import pytest
+    from src import forest
+
+    lean_dir = tmp_path / "lean"
+    lean_dir.mkdir()
+    (lean_dir / "forest.npz").write_bytes(b"viejo")
+    monkeypatch.setattr(forest, "MAX_DEPTH", 2)
+    CompiledPredictor.load(trained_cfg.model_path, trained_cfg.meta_path).save_lean(str(lean_dir))
+    assert CompiledPredictor.lean_exists(str(lean_dir)) and not (lean_dir / "forest.npz").exists()
+    assert CompiledPredictor.load_lean(str(lean_dir), engine="xgboost").engine == "xgboost"
+    with pytest.raises(FileNotFoundError):
+        CompiledPredictor.load_lean(str(lean_dir), engine="numpy")
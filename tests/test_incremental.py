@@ -0,0 +1,31 @@
+import json
+import shutil
+import joblib
+from src.incremental import main
+
+def test_incremental_appends_trees(trained_cfg, telco_df, tmp_path, monkeypatch):
+    # El modelo de prueba tiene 20 árboles: se agregan 5 entrenados solo con la partición nueva.
+    # Se trabaja sobre una copia de los artefactos para no pisar los del fixture de sesión
+    shutil.copy(trained_cfg.model_path, tmp_path / "model.joblib")
+    shutil.copy(trained_cfg.meta_path, tmp_path / "metadata.json")
+    for name, file in (("model_path", "model.joblib"), ("cols_path", "columns.joblib"),
+                       ("feats_path", "feature_names.joblib"), ("meta_path", "metadata.json")):
+        monkeypatch.setattr(trained_cfg, name, str(tmp_path / file))
+    monkeypatch.setattr(trained_cfg, "lean_dir", str(tmp_path / "lean"))
+    monkeypatch.setattr(trained_cfg, "curve_path", str(tmp_path / "threshold_curve.json"))
+    monkeypatch.setattr(trained_cfg, "drift_ref_path", str(tmp_path / "drift_reference.json"))
+    monkeypatch.setattr(trained_cfg, "registry_dir", str(tmp_path / "registry"))
+    telco_df.iloc[:1000].to_parquet(tmp_path / "train.parquet", index=False)
+    telco_df.iloc[1000:1200].to_parquet(tmp_path / "new.parquet", index=False)
+    telco_df.iloc[1200:].to_parquet(tmp_path / "valid.parquet", index=False)
+    monkeypatch.setattr(trained_cfg, "data_train_out", str(tmp_path / "train.parquet"))
+    monkeypatch.setattr(trained_cfg, "data_valid_out", str(tmp_path / "valid.parquet"))
+
+    report = main(str(tmp_path / "new.parquet"), rounds=5)
+    assert {"previous", "incremental", "full_retrain"} <= report.keys()
+    assert 0.5 < report["incremental"]["auc"] <= 1.0
+    pipe = joblib.load(trained_cfg.model_path)
+    assert pipe.named_steps["clf"].get_booster().num_boosted_rounds() == 25
+    meta = json.loads((tmp_path / "metadata.json").read_text())
+    assert meta["incremental"]["trees"] == 25 and "column_plan" in meta
+    assert (tmp_path / "threshold_curve.json").exists() and (tmp_path / "drift_reference.json").exists()
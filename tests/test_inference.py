@@ -0,0 +1,81 @@
+import pandas as pd
+from src.inference import main
+
+def test_streaming_matches_in_memory(trained_cfg, telco_df, tmp_path):
+    # El modo streaming debe dar las mismas filas, columnas y probabilidades que el modo normal
+    src = tmp_path / "input.csv"
+    telco_df.drop(columns=["Churn"]).to_csv(src, index=False)
+    main(str(src), str(tmp_path / "full.parquet"))
+    main(str(src), str(tmp_path / "stream.parquet"), chunksize=400)
+    full = pd.read_parquet(tmp_path / "full.parquet")
+    stream = pd.read_parquet(tmp_path / "stream.parquet")
+    pd.testing.assert_frame_equal(full, stream)
+
+def test_parallel_workers_keep_order(trained_cfg, telco_df, tmp_path):
+    # Con varios procesos, el resultado unido debe respetar el orden original de las filas
+    src = tmp_path / "input.parquet"
+    telco_df.drop(columns=["Churn"]).to_parquet(src, index=False)
+    main(str(src), str(tmp_path / "full.parquet"))
+    main(str(src), str(tmp_path / "par.parquet"), chunksize=200, workers=2)
+    full = pd.read_parquet(tmp_path / "full.parquet")
+    par = pd.read_parquet(tmp_path / "par.parquet")
+    pd.testing.assert_frame_equal(full, par)
+
+def test_align_columns_with_plan_on_raw_csv(trained_cfg):
+    # El CSV crudo trae " " en TotalCharges y números como int64: con el plan quedan con los tipos de train
+    import joblib
+    import numpy as np
+    from src.fastpath import CompiledPredictor
+    from src.inference import align_columns, load_column_plan
+
+    raw = pd.read_csv("data/raw/telco_churn.csv", nrows=1000)
+    assert (raw["TotalCharges"] == " ").any()
+    plan = load_column_plan(trained_cfg.meta_path)
+    base_cols = joblib.load(trained_cfg.cols_path)
+    X = align_columns(raw.drop(columns=["tenure"]), base_cols, plan)
+    assert list(X.columns) == base_cols
+    assert {c: X[c].dtype.name for c in X.columns if plan[c].startswith("float")} == {
+        c: d for c, d in plan.items() if d.startswith("float")
+    }
+    assert X["TotalCharges"].isna().sum() == (raw["TotalCharges"] == " ").sum()
+    assert X["tenure"].isna().all()
+
+    # Mismo redondeo que el camino rápido, que usa el num_dtype de los metadatos
+    pipe = joblib.load(trained_cfg.model_path)
+    cp = CompiledPredictor.load(trained_cfg.model_path, trained_cfg.meta_path)
+    records = raw.drop(columns=["tenure"]).to_dict(orient="records")
+    np.testing.assert_allclose(pipe.predict_proba(X)[:, 1], cp.predict_proba(records), atol=1e-6)
+
+def test_reads_only_model_columns(trained_cfg, telco_df, tmp_path):
+    # Una tabla ancha: por defecto la columna extra llega a la salida; con model_columns no se lee
+    src = tmp_path / "wide.parquet"
+    telco_df.drop(columns=["Churn"]).assign(extra=1.0).to_parquet(src, index=False)
+    main(str(src), str(tmp_path / "all.parquet"))
+    assert "extra" in pd.read_parquet(tmp_path / "all.parquet").columns
+    main(str(src), str(tmp_path / "out.parquet"), filters=[("Contract", "==", "Month-to-month")], model_columns=True)
+    out = pd.read_parquet(tmp_path / "out.parquet")
+    assert "extra" not in out.columns and (out["Contract"] == "Month-to-month").all()
+
+def test_reason_codes_fold_onehot_to_base_columns(trained_cfg, telco_df, tmp_path):
+    # Motivos por columna base, ordenados por contribución; iguales en streaming y con TreeSHAP exacto
+    import joblib
+    import xgboost
+    from src.inference import align_columns, reason_codes, transform_matrix
+
+    src = tmp_path / "input.parquet"
+    telco_df.drop(columns=["Churn"]).to_parquet(src, index=False)
+    main(str(src), str(tmp_path / "full.parquet"), reasons=3)
+    main(str(src), str(tmp_path / "stream.parquet"), chunksize=300, reasons=3)
+    full = pd.read_parquet(tmp_path / "full.parquet")
+    pd.testing.assert_frame_equal(full, pd.read_parquet(tmp_path / "stream.parquet"))
+    base_cols = joblib.load(trained_cfg.cols_path)
+    assert set(full["reason_1"].dropna()) <= set(base_cols)
+    assert (full["reason_1_contrib"] >= full["reason_2_contrib"]).all()
+
+    pipe = joblib.load(trained_cfg.model_path)
+    Xt = transform_matrix(pipe, align_columns(telco_df.head(50), base_cols))
+    exact = reason_codes(pipe, Xt, top_n=len(base_cols), approx=False)
+    contribs = exact.filter(like="_contrib").to_numpy()
+    margin = pipe[-1].predict(Xt, output_margin=True)
+    bias = pipe[-1].get_booster().predict(xgboost.DMatrix(Xt), pred_contribs=True)[:, -1]
+    assert abs(contribs.sum(axis=1) + bias - margin).max() < 1e-4
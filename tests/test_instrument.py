@@ -0,0 +1,32 @@
+import json
+from src import instrument
+from src.config import CFG
+
+def _pipeline(n_batches=3):
+    with instrument.run("demo"):
+        for batch in instrument.timed_iter("read", [[0] * 10] * n_batches):
+            with instrument.stage("work", rows=len(batch)):
+                sum(batch)
+
+def test_stages_exported_to_jsonl_and_prometheus(tmp_path, monkeypatch):
+    log, prom = tmp_path / "stages.jsonl", tmp_path / "stages.prom"
+    monkeypatch.setattr(CFG, "instrument", True)
+    monkeypatch.setattr(CFG, "instrument_log", str(log))
+    monkeypatch.setattr(CFG, "instrument_prom", str(prom))
+    _pipeline()
+    _pipeline(n_batches=2)
+
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [r["stage"] for r in records] == ["read", "work", "total"] * 2
+    work = [r for r in records if r["stage"] == "work"]
+    assert [(r["calls"], r["rows"]) for r in work] == [(3, 30), (2, 20)]
+    # Prometheus guarda solo la última corrida de cada flujo
+    lines = [line for line in prom.read_text().splitlines() if line.startswith("churn_stage_rows{")]
+    assert lines[1] == 'churn_stage_rows{run="demo",stage="work"} 20'
+    assert len(lines) == 3
+
+def test_disabled_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(CFG, "instrument", False)
+    monkeypatch.setattr(CFG, "instrument_log", str(tmp_path / "stages.jsonl"))
+    _pipeline()
+    assert not (tmp_path / "stages.jsonl").exists()
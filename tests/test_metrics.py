@@ -0,0 +1,21 @@
+import numpy as np
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+from src.metrics import ThresholdCurve
+
+def test_curve_matches_sklearn_at_any_threshold(tmp_path):
+    # Scores redondeados (con empates): AUC y métricas por umbral iguales a sklearn, también tras guardar/cargar
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, 3000)
+    proba = (rng.random(3000) * 0.6 + y * 0.3).round(3)
+    curve = ThresholdCurve.from_scores(y, proba)
+    curve.save(str(tmp_path / "curve.json"))
+    curve = ThresholdCurve.load(str(tmp_path / "curve.json"))
+    assert np.isclose(curve.auc(), roc_auc_score(y, proba))
+    for t in (0.0, 0.25, 0.3, 0.5123, 0.899, 0.95):
+        pred = (proba >= t).astype(int)
+        m = curve.at(t)
+        assert np.isclose(m["f1"], f1_score(y, pred))
+        assert np.isclose(m["precision"], precision_score(y, pred, zero_division=0))
+        assert np.isclose(m["recall"], recall_score(y, pred))
+        assert m["flagged"] == pred.sum()
+    assert curve.best("f1")["f1"] == max(curve.metrics()["f1"])
@@ -0,0 +1,97 @@
+import pytest
+from src import registry
+from src.inference import load_paths
+
+def test_publish_activate_and_hot_reload(trained_cfg, tmp_path):
+    # Dos publicaciones de los mismos artefactos: versiones inmutables, CURRENT sigue a la última
+    reg = str(tmp_path / "registry")
+    assert registry.artifact_paths(registry_dir=reg)["model_path"] == trained_cfg.model_path
+    v1 = registry.publish({"metrics": {"auc": 0.8}}, registry_dir=reg)
+    v2 = registry.publish({"metrics": {"auc": 0.9}}, registry_dir=reg)
+    assert (v1, v2) == ("v0001", "v0002") and registry.versions(reg) == [v1, v2]
+    assert registry.current(reg) == v2 and registry.version_info(v1, reg)["metrics"]["auc"] == 0.8
+    assert registry.artifact_paths(registry_dir=reg)["model_path"].endswith("v0002/model.joblib")
+
+    loads = []
+    cache = registry.ModelCache(lambda paths: loads.append(paths["model_path"]) or load_paths(paths),
+                                max_entries=1, registry_dir=reg)
+    version, (model, base_cols, plan) = cache.get()
+    assert version == v2 and base_cols and len(loads) == 1
+    assert cache.get()[0] == v2 and len(loads) == 1
+    # Volver a v1 mueve solo el puntero: la próxima llamada la carga y el LRU (1 entrada) desaloja v2
+    registry.activate(v1, reg)
+    assert cache.get()[0] == v1 and cache.loaded() == [v1] and len(loads) == 2
+    with pytest.raises(ValueError):
+        registry.activate("v0009", reg)
+
+def test_prune_keeps_newest_and_current(trained_cfg, tmp_path, monkeypatch):
+    # Retención: cada publish deja las `keep` más nuevas, y la activa aunque sea vieja (rollback)
+    reg = str(tmp_path / "registry")
+    monkeypatch.setattr(trained_cfg, "registry_keep", 2)
+    for _ in range(3):
+        registry.publish(registry_dir=reg)
+    assert registry.versions(reg) == ["v0002", "v0003"]
+    registry.activate("v0002", reg)
+    registry.publish(registry_dir=reg, make_current=False)
+    registry.publish(registry_dir=reg, make_current=False)
+    assert registry.versions(reg) == ["v0002", "v0004", "v0005"] and registry.current(reg) == "v0002"
+    assert registry.prune(keep=1, registry_dir=reg) == ["v0004"]
+
+def test_server_follows_current(trained_cfg, tmp_path, monkeypatch):
+    # El servidor carga la versión activa y un activate (rollback) le llega sin reiniciarlo
+    import json
+    import threading
+    import urllib.request
+    from src.server import build_server
+
+    monkeypatch.setattr(trained_cfg, "registry_dir", str(tmp_path / "registry"))
+    v1, v2 = registry.publish(), registry.publish()
+    server = build_server(port=0, max_wait_ms=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    health = f"http://127.0.0.1:{server.server_address[1]}/health"
+    try:
+        with urllib.request.urlopen(health) as resp:
+            assert json.loads(resp.read())["version"] == v2
+        registry.activate(v1)
+        with urllib.request.urlopen(health) as resp:
+            assert json.loads(resp.read())["version"] == v1
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert server.models.loaded() == [v2, v1]
+
+def test_registry_off_serves_flat_paths(telco_df, tmp_path, monkeypatch):
+    # Train con registro y después con REGISTRY=0: la carga por defecto toma el modelo nuevo (rutas planas),
+    # no la última versión publicada
+    from sklearn.pipeline import Pipeline
+    from xgboost import XGBClassifier
+    from src import inference
+    from src.config import CFG
+    from src.features import build_preprocessor, split_cols
+    from src.train import save_artifacts
+
+    for field, name in registry.ARTIFACTS.items():
+        monkeypatch.setattr(CFG, field, str(tmp_path / name))
+    monkeypatch.setattr(CFG, "feats_path", str(tmp_path / "feature_names.joblib"))
+    monkeypatch.setattr(CFG, "registry_dir", str(tmp_path / "registry"))
+    monkeypatch.setattr(inference, "_MODELS", None)
+    cat_cols, num_cols = split_cols(telco_df, "Churn")
+    X, y = telco_df.drop(columns=["Churn"]), telco_df["Churn"].values
+
+    def train(n_estimators):
+        pipe = Pipeline([("pre", build_preprocessor(cat_cols, num_cols)),
+                         ("clf", XGBClassifier(n_estimators=n_estimators, max_depth=2))])
+        save_artifacts(pipe.fit(X, y), X, cat_cols, num_cols)
+
+    train(3)
+    assert registry.current() == "v0001" and inference.load_version()[0] == "v0001"
+    monkeypatch.setattr(CFG, "registry", False)
+    train(7)
+    assert registry.current() == "v0001" and registry.versions() == ["v0001"]
+    version, model, _, _ = inference.load_version()
+    assert version == registry.LOCAL
+    assert registry.artifact_paths()["model_path"] == CFG.model_path
+    model, _, _ = inference.load_paths(registry.artifact_paths(), lean=False)
+    assert model.named_steps["clf"].n_estimators == 7
+    # Una versión explícita se sigue pudiendo cargar
+    assert inference.load_version("v0001")[0] == "v0001"
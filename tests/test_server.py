@@ -0,0 +1,60 @@
+import json
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+from src.inference import align_columns
+from src.server import build_server
+
+def test_server_matches_pipeline(trained_cfg, telco_df):
+    # Peticiones concurrentes de un cliente cada una: deben dar lo mismo que predict_proba en lote
+    server = build_server(port=0, max_batch=8, max_wait_ms=5)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/predict"
+    X = telco_df.drop(columns=["Churn"]).head(20)
+
+    def post(record):
+        req = urllib.request.Request(url, data=json.dumps(record).encode("utf-8"), method="POST")
+        with urllib.request.urlopen(req) as resp:
+            return json.loads(resp.read())["churn_proba"]
+
+    try:
+        with ThreadPoolExecutor(8) as ex:
+            got = list(ex.map(post, X.to_dict(orient="records")))
+    finally:
+        server.shutdown()
+        server.server_close()
+    pipe = joblib.load(trained_cfg.model_path)
+    expected = pipe.predict_proba(align_columns(X, joblib.load(trained_cfg.cols_path)))[:, 1]
+    np.testing.assert_allclose(got, expected, rtol=1e-6)
+
+def test_bad_record_fails_only_its_request(trained_cfg, telco_df):
+    # Una petición válida y una inválida (categoría no hasheable) en el mismo micro-lote: solo falla la inválida
+    import urllib.error
+
+    server = build_server(port=0, max_batch=2, max_wait_ms=500)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/predict"
+    good = telco_df.drop(columns=["Churn"]).head(1).to_dict(orient="records")[0]
+    bad = {**good, "Contract": ["Month-to-month"]}
+
+    def post(record):
+        req = urllib.request.Request(url, data=json.dumps(record).encode("utf-8"), method="POST")
+        try:
+            with urllib.request.urlopen(req) as resp:
+                return resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    try:
+        with ThreadPoolExecutor(2) as ex:
+            (ok_code, ok), (bad_code, _) = ex.map(post, [good, bad])
+    finally:
+        server.shutdown()
+        server.server_close()
+    pipe = joblib.load(trained_cfg.model_path)
+    expected = pipe.predict_proba(align_columns(telco_df.drop(columns=["Churn"]).head(1),
+                                                joblib.load(trained_cfg.cols_path)))[0, 1]
+    assert (ok_code, bad_code) == (200, 500)
+    np.testing.assert_allclose(ok["churn_proba"], expected, rtol=1e-6)
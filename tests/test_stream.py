@@ -0,0 +1,41 @@
+import asyncio
+import json
+import joblib
+import numpy as np
+from src import stream
+from src.inference import align_columns
+
+def test_tail_jsonl_scores_in_order_with_bounded_queue(trained_cfg, telco_df, tmp_path):
+    # Cola chica para forzar el backpressure: el archivo se lee a medida que se puntúa, sin perder
+    # eventos, y la salida sale en el orden de llegada con las mismas probabilidades que el pipeline
+    events = telco_df.drop(columns=["Churn"]).head(500).reset_index(drop=True).assign(customerID=lambda d: d.index)
+    events.to_json(tmp_path / "events.jsonl", orient="records", lines=True)
+    stats = asyncio.run(stream.run(str(tmp_path / "out.jsonl"), tail=str(tmp_path / "events.jsonl"), max_batch=32,
+                                   max_wait_ms=5, max_queue=40, log_path=str(tmp_path / "stream.jsonl")))
+    out = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert stats["events"] == 500 and stats["max_queue_depth"] <= 40
+    assert [r["customerID"] for r in out] == [str(i) for i in range(500)]
+
+    pipe = joblib.load(trained_cfg.model_path)
+    expected = pipe.predict_proba(align_columns(events, joblib.load(trained_cfg.cols_path)))[:, 1]
+    np.testing.assert_allclose([r["churn_proba"] for r in out], expected, rtol=1e-6)
+    batches = [json.loads(line) for line in (tmp_path / "stream.jsonl").read_text().splitlines()]
+    assert max(b["batch"] for b in batches) <= 32 and sum(b["batch"] for b in batches) == 500
+
+def test_bad_event_does_not_stop_the_stream(trained_cfg, telco_df, tmp_path):
+    # Un evento que hace fallar su lote (categoría no hasheable) y una línea que no es un objeto: el
+    # stream sigue, solo se descarta ese evento y la falla queda en el log de lotes
+    events = telco_df.drop(columns=["Churn"]).head(100).reset_index(drop=True).assign(customerID=lambda d: d.index)
+    lines = events.to_json(orient="records", lines=True).splitlines()
+    bad = json.loads(lines[50])
+    bad["Contract"] = ["Month-to-month"]
+    lines[50] = json.dumps(bad)
+    lines.insert(20, "[1, 2, 3]")
+    (tmp_path / "events.jsonl").write_text("\n".join(lines) + "\n")
+    stats = asyncio.run(stream.run(str(tmp_path / "out.jsonl"), tail=str(tmp_path / "events.jsonl"), max_batch=16,
+                                   max_wait_ms=5, log_path=str(tmp_path / "stream.jsonl")))
+    out = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert (stats["events"], stats["rejected"], stats["failed"]) == (99, 1, 1)
+    assert [r["customerID"] for r in out] == [str(i) for i in range(100) if i != 50]
+    errors = [b for b in map(json.loads, (tmp_path / "stream.jsonl").read_text().splitlines()) if "error" in b]
+    assert len(errors) == 1 and errors[0]["customerID"] == "50"
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from src.topk import TopK, top_k
+
+def _full_sort(df, proba, k, segment=None):
+    # Referencia: sort estable completo por probabilidad descendente
+    ref = df.assign(churn_proba=proba, row=np.arange(len(df)))
+    ref = ref.iloc[np.argsort(-proba, kind="stable")]
+    if segment:
+        ref = ref.groupby(segment, sort=False, observed=True).head(k)
+        return ref.sort_values([segment, "churn_proba", "row"], ascending=[True, False, True], kind="stable")
+    return ref.head(k)
+
+def test_topk_matches_full_sort_across_chunks():
+    # Probabilidades redondeadas para forzar empates: el resultado no depende del tamaño de los lotes
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"seg": rng.choice(["a", "b", "c"], 5000), "x": np.arange(5000)})
+    proba = rng.random(5000).round(2)
+    for segment in (None, "seg"):
+        expected = _full_sort(df, proba, 25, segment)
+        assert top_k(df, proba, 25, segment)["row"].tolist() == expected["row"].tolist()
+        acc = TopK(25, segment)
+        for start in range(0, len(df), 700):
+            acc.update(df.iloc[start:start + 700], proba[start:start + 700])
+        got = acc.result()
+        assert got["row"].tolist() == expected["row"].tolist()
+        assert got["rank"].max() == 25 and (got["x"] == got["row"]).all()
+
+def test_inference_main_topk_only(trained_cfg, telco_df, tmp_path):
+    # Solo la lista top-k por segmento, en streaming, sin escribir la tabla completa
+    from src.inference import main
+
+    src = tmp_path / "input.csv"
+    telco_df.drop(columns=["Churn"]).to_csv(src, index=False)
+    main(str(src), chunksize=300, topk=5, segment="Contract", topk_output=str(tmp_path / "top.csv"))
+    top = pd.read_csv(tmp_path / "top.csv")
+    assert len(top) == 5 * telco_df["Contract"].nunique()
+    assert (top.groupby("Contract")["churn_proba"].diff().dropna() <= 0).all()
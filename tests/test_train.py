@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from src.config import CFG
+from src.train import drift_reference, load_or_build_matrices
+
+@pytest.fixture
+def processed(tmp_path, telco_df, monkeypatch):
+    # Splits procesados chicos en rutas temporales, con la caché de matrices también en tmp
+    telco_df.iloc[:1200].to_parquet(tmp_path / "train.parquet", index=False)
+    telco_df.iloc[1200:].to_parquet(tmp_path / "valid.parquet", index=False)
+    monkeypatch.setattr(CFG, "data_train_out", str(tmp_path / "train.parquet"))
+    monkeypatch.setattr(CFG, "data_valid_out", str(tmp_path / "valid.parquet"))
+    monkeypatch.setattr(CFG, "matrix_cache_dir", str(tmp_path / "cache"))
+    return tmp_path
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_matrix_cache_roundtrip(processed, monkeypatch, sparse):
+    # Primera corrida guarda, la segunda reusa: mismas matrices (mapeadas a memoria) y mismo preprocesador
+    monkeypatch.setattr(CFG, "sparse_onehot", sparse)
+    built, hit = load_or_build_matrices()
+    assert not hit
+    cached, hit = load_or_build_matrices()
+    assert hit and sp.issparse(cached["X_train"]) == sparse
+    dense = lambda X: X.toarray() if sp.issparse(X) else np.asarray(X)  # noqa: E731
+    np.testing.assert_array_equal(dense(cached["X_valid"]), dense(built["X_valid"]))
+    np.testing.assert_array_equal(cached["y_train"], built["y_train"])
+    assert cached["cat_cols"] == built["cat_cols"] and list(cached["head"].columns) == list(built["head"].columns)
+    # La referencia de drift sale de la caché (sin releer train.parquet) y es la misma que leyéndolo
+    scores = np.linspace(0, 1, 101)
+    expected = drift_reference(cached["num_cols"], cached["cat_cols"], scores).to_dict()
+    with monkeypatch.context() as mp:
+        mp.setattr("src.train.load_parquet", lambda *a, **k: pytest.fail("releyó train.parquet"))
+        got = drift_reference(cached["num_cols"], cached["cat_cols"], scores, features=cached["drift"])
+    assert got.to_dict() == expected
+
+    # Si cambian los datos procesados, la clave cambia y se reconstruye
+    (processed / "train.parquet").write_bytes((processed / "valid.parquet").read_bytes())
+    assert not load_or_build_matrices()[1]
@@ -0,0 +1,49 @@
+from src.features import build_preprocessor, split_cols
+from src.tune import sample_candidates, selection_split, successive_halving
+
+def test_successive_halving_keeps_best(telco_df, monkeypatch):
+    # Con presupuestos chicos: cada ronda descarta candidatos y el mejor trae su modelo entrenado
+    from src.config import CFG
+
+    monkeypatch.setattr(CFG, "tune_min_budget", 10)
+    monkeypatch.setattr(CFG, "tune_max_budget", 90)
+    monkeypatch.setattr(CFG, "tune_eta", 3)
+    cat_cols, num_cols = split_cols(telco_df, "Churn")
+    train, valid = telco_df.iloc[:1000], telco_df.iloc[1000:]
+    pre = build_preprocessor(cat_cols, num_cols)
+    X_fit, y_fit, X_sel, y_sel = selection_split(pre.fit_transform(train.drop(columns=["Churn"])),
+                                                 train["Churn"].values, holdout=0.25)
+    assert (len(y_fit), len(y_sel)) == (750, 250) and abs(y_sel.mean() - y_fit.mean()) < 0.01
+    data = (X_fit, y_fit, pre.transform(valid.drop(columns=["Churn"])), valid["Churn"].values, X_sel, y_sel)
+
+    results, best = successive_halving(sample_candidates(9, seed=0), data, workers=2)
+    assert list(results.groupby("rung")["trial"].count()) == [9, 3, 1]
+    assert best["auc"] == results["auc"].max()
+    assert best["model"].predict_proba(data[2]).shape == (len(valid), 2)
+
+def test_tuned_model_refits_without_eval_set(telco_df, tmp_path, monkeypatch):
+    # El modelo guardado por tune no arrastra early_stopping_rounds y los metadatos separan las métricas
+    import joblib
+    import json
+    from src import registry, tune
+    from src.config import CFG
+
+    telco_df.iloc[:1200].to_parquet(tmp_path / "train.parquet", index=False)
+    telco_df.iloc[1200:].to_parquet(tmp_path / "valid.parquet", index=False)
+    monkeypatch.setattr(CFG, "data_train_out", str(tmp_path / "train.parquet"))
+    monkeypatch.setattr(CFG, "data_valid_out", str(tmp_path / "valid.parquet"))
+    for field, name in {**registry.ARTIFACTS, "feats_path": "feature_names.joblib",
+                        "tune_results_path": "tuning_results.csv"}.items():
+        monkeypatch.setattr(CFG, field, str(tmp_path / name))
+    monkeypatch.setattr(CFG, "registry", False)
+    for field, value in (("tune_trials", 6), ("tune_workers", 1), ("tune_min_budget", 10), ("tune_max_budget", 30)):
+        monkeypatch.setattr(CFG, field, value)
+    tune.main(use_cache=False)
+
+    clf = joblib.load(CFG.model_path).named_steps["clf"]
+    assert clf.get_params().get("early_stopping_rounds") is None
+    meta = json.loads((tmp_path / "metadata.json").read_text())
+    assert {"auc_select", "auc_valid", "metrics_note"} <= set(meta)
+    assert hasattr(clf, "get_booster")  # con esta semilla gana un XGBoost
+    pre, train = joblib.load(CFG.model_path).named_steps["pre"], telco_df.iloc[:1200]
+    clf.fit(pre.transform(train.drop(columns=["Churn"])), train["Churn"].values)
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+from src.utils_io import cache_get, cache_put, iter_frames, parse_filter, read_frame, to_parquet
+
+def test_arrow_projection_filters_and_partitions(telco_df, tmp_path):
+    # Dataset particionado por Contract: proyección + filtro leen solo lo pedido, igual que filtrar en pandas
+    df = telco_df.reset_index(drop=True)
+    to_parquet(df, str(tmp_path / "snap"), partition_cols=["Contract"], row_group_size=100)
+    filters = [("Contract", "==", "Two year"), parse_filter("tenure>=24")]
+    got = read_frame(str(tmp_path / "snap"), ["tenure", "MonthlyCharges", "no_existe"], filters)
+    want = df.loc[(df["Contract"] == "Two year") & (df["tenure"] >= 24), ["tenure", "MonthlyCharges"]]
+    assert list(got.columns) == ["tenure", "MonthlyCharges"]
+    pd.testing.assert_frame_equal(got.sort_values(["tenure", "MonthlyCharges"]).reset_index(drop=True),
+                                  want.sort_values(["tenure", "MonthlyCharges"]).reset_index(drop=True))
+
+    # Feather (Arrow IPC) mapeado a memoria, por lotes en orden y con las `category` de pandas
+    df.to_feather(tmp_path / "snap.feather")
+    batches = list(iter_frames(str(tmp_path / "snap.feather"), 400, columns=["gender", "tenure"]))
+    pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), df[["gender", "tenure"]])
+    with pytest.raises(ValueError):
+        read_frame(str(tmp_path / "x.csv"), filters=filters)
+
+def test_cache_put_never_evicts_the_new_entry(tmp_path, monkeypatch):
+    # Con el mismo tick de last_used y max_entries=1 se desaloja la vieja, no la recién escrita;
+    # con max_entries=0 no se guarda nada
+    (tmp_path / "a.txt").write_text("a")
+    monkeypatch.setattr("src.utils_io.time.time", lambda: 1000.0)
+    cache = str(tmp_path / "cache")
+    for key in ("zz-vieja", "aa-nueva"):
+        assert cache_put(cache, key, {"a.txt": str(tmp_path / "a.txt")}, {}, max_entries=1) is not None
+    assert cache_get(cache, "aa-nueva") is not None and cache_get(cache, "zz-vieja") is None
+    assert cache_put(cache, "otra", {"a.txt": str(tmp_path / "a.txt")}, {}, max_entries=0) is None
+    assert cache_get(cache, "otra") is None and cache_get(cache, "aa-nueva") is not None